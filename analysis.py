@@ -0,0 +1,399 @@
+import csv
+import itertools
+import json
+import operator
+import os
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+HEADER_FIELDS = {
+    '文件名': 'file_name',
+    '培训/会议名称': 'training_name',
+    '开始时间': 'start_time',
+    '结束时间': 'end_time',
+    '学时(小时)': 'duration_hours',
+    '地点': 'location'
+}
+COLUMNS = ('file_name', 'training_name', 'start_time', 'end_time',
+           'duration_hours', 'location')
+
+EXCEL_MAX_ROWS = 1048575
+LOAD_CHUNK_ROWS = 100000
+_TIME_LENGTH = 16
+_DIGIT_POSITIONS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15]
+_SEPARATORS = {4: '-', 7: '-', 10: ' ', 13: ':'}
+
+Column = Tuple[np.ndarray, np.ndarray]
+Pairs = Tuple[np.ndarray, np.ndarray]
+
+
+def _column_positions(headers: Sequence[object]) -> List[Optional[int]]:
+    fields = [HEADER_FIELDS.get(h) for h in headers]
+    return [fields.index(c) if c in fields else None for c in COLUMNS]
+
+
+def _iter_xlsx(path: str) -> Iterator[Sequence[object]]:
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        positions = _column_positions(next(rows, ()))
+        for row in rows:
+            yield [row[p] if p is not None and p < len(row) else None
+                   for p in positions]
+    finally:
+        wb.close()
+
+
+def _iter_csv(path: str) -> Iterator[Sequence[object]]:
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        positions = _column_positions(next(reader, []))
+        if all(p is not None for p in positions):
+            getter = operator.itemgetter(*positions)
+            for row in reader:
+                yield getter(row) if len(row) > max(positions) else [
+                    row[p] if p < len(row) else None for p in positions
+                ]
+            return
+        for row in reader:
+            yield [row[p] if p is not None and p < len(row) else None
+                   for p in positions]
+
+
+def _iter_jsonl(path: str) -> Iterator[Sequence[object]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield [record.get(column) for column in COLUMNS]
+
+
+READERS = {'.xlsx': _iter_xlsx, '.csv': _iter_csv, '.jsonl': _iter_jsonl}
+
+
+class _Factorizer:
+
+    def __init__(self):
+        self.index: Dict[str, int] = {'': 0}
+        self.codes = array('q')
+
+    def extend(self, values: Sequence[object]):
+        index = self.index
+        codes = []
+        for value in values:
+            text = '' if value is None else str(value).strip()
+            code = index.get(text)
+            if code is None:
+                code = index[text] = len(index)
+            codes.append(code)
+        self.codes.extend(codes)
+
+    def column(self) -> Column:
+        return (np.frombuffer(self.codes, dtype=np.int64),
+                np.array(list(self.index), dtype=object))
+
+
+def to_float(values: np.ndarray) -> np.ndarray:
+    result = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        try:
+            result[i] = float(value)
+        except (TypeError, ValueError):
+            pass
+    return result
+
+
+def parse_times(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values, dtype=str)
+    result = np.full(values.shape, np.datetime64('NaT'), dtype='datetime64[m]')
+    if not values.size:
+        return result
+
+    codes = values.astype(f'U{_TIME_LENGTH}').view(np.uint32).reshape(
+        -1, _TIME_LENGTH).astype(np.int64)
+    digits = codes[:, _DIGIT_POSITIONS] - ord('0')
+    valid = (np.char.str_len(values) == _TIME_LENGTH) & (
+        (digits >= 0) & (digits <= 9)).all(axis=1)
+    for position, char in _SEPARATORS.items():
+        valid &= codes[:, position] == ord(char)
+
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + \
+        digits[:, 3]
+    month = digits[:, 4] * 10 + digits[:, 5]
+    day = digits[:, 6] * 10 + digits[:, 7]
+    hour = digits[:, 8] * 10 + digits[:, 9]
+    minute = digits[:, 10] * 10 + digits[:, 11]
+    valid &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31) & (
+        hour <= 23) & (minute <= 59)
+
+    months = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    dates = months.astype('datetime64[D]') + (day - 1)
+    valid &= dates.astype('datetime64[M]') == months
+    minutes = dates.astype('datetime64[m]') + (hour * 60 + minute)
+    result[valid] = minutes[valid]
+    return result
+
+
+def format_time(value: np.datetime64) -> str:
+    return '' if np.isnat(value) else str(value).replace('T', ' ')
+
+
+class ResultTable:
+
+    def __init__(self, columns: Dict[str, Column]):
+        self.file_name, self.file_names = columns['file_name']
+        self.name, self.names = columns['training_name']
+        self.location, self.locations = columns['location']
+
+        codes, categories = columns['start_time']
+        self.start = parse_times(categories)[codes]
+        codes, categories = columns['end_time']
+        self.end = parse_times(categories)[codes]
+        codes, categories = columns['duration_hours']
+        self.hours = to_float(categories)[codes]
+        self.ok = self.name != 0
+
+        derived = np.isnan(self.hours) & ~np.isnat(self.start) & ~np.isnat(
+            self.end) & (self.end > self.start)
+        self.hours[derived] = (self.end[derived] - self.start[derived]
+                               ).astype(np.int64) / 60
+
+        self.keys, self.key_span = self._lecture_keys()
+        self.unique = self._unique_mask()
+
+    @classmethod
+    def load(cls, paths: Sequence[str]) -> 'ResultTable':
+        factorizers = [_Factorizer() for _ in COLUMNS]
+        for path in paths:
+            ext = os.path.splitext(path)[1].lower()
+            if ext not in READERS:
+                raise ValueError(f"不支持的文件格式: {path}")
+            rows = READERS[ext](path)
+            while True:
+                chunk = list(itertools.islice(rows, LOAD_CHUNK_ROWS))
+                if not chunk:
+                    break
+                for factorizer, values in zip(factorizers, zip(*chunk)):
+                    factorizer.extend(values)
+        return cls({
+            column: factorizer.column()
+            for column, factorizer in zip(COLUMNS, factorizers)
+        })
+
+    def __len__(self) -> int:
+        return len(self.name)
+
+    def _lecture_keys(self) -> Tuple[np.ndarray, int]:
+        minutes = np.where(np.isnat(self.start), np.int64(-1),
+                           self.start.astype(np.int64))
+        valid = minutes[minutes >= 0]
+        base = valid.min() if valid.size else 0
+        span = (valid.max() - base + 2) if valid.size else 1
+        return self.name * span + np.where(minutes >= 0, minutes - base + 1,
+                                           0), span
+
+    def _unique_mask(self) -> np.ndarray:
+        mask = np.zeros(len(self), dtype=bool)
+        rows = np.flatnonzero(self.ok)
+        if rows.size:
+            _, first = np.unique(self.keys[rows], return_index=True)
+            mask[rows[first]] = True
+        return mask
+
+    def monthly_hours(self,
+                      dedupe: bool = True) -> List[Tuple[str, int, float]]:
+        mask = (self.unique if dedupe else self.ok) & ~np.isnat(
+            self.start)
+        months = self.start[mask].astype('datetime64[M]')
+        if not months.size:
+            return []
+        labels, inverse = np.unique(months, return_inverse=True)
+        counts = np.bincount(inverse)
+        hours = np.bincount(inverse, weights=np.nan_to_num(self.hours[mask]))
+        return [(str(label), int(count), round(float(total), 2))
+                for label, count, total in zip(labels, counts, hours)]
+
+    def duplicate_groups(self) -> List[Tuple[str, int, int, str]]:
+        rows = np.flatnonzero(self.ok)
+        if not rows.size:
+            return []
+        names = self.name[rows]
+        counts = np.bincount(names, minlength=len(self.names))
+        distinct = np.bincount(np.unique(self.keys[rows]) // self.key_span,
+                               minlength=len(self.names))
+        codes, first = np.unique(names, return_index=True)
+        first_row = np.zeros(len(self.names), dtype=np.int64)
+        first_row[codes] = rows[first]
+
+        repeated = np.flatnonzero(counts > 1)
+        repeated = repeated[np.argsort(-counts[repeated], kind='stable')]
+        return [(self.names[code], int(counts[code]), int(distinct[code]),
+                 self.file_names[self.file_name[first_row[code]]])
+                for code in repeated]
+
+    def overlaps(self, by_location: bool = False) -> Pairs:
+        mask = self.unique & ~np.isnat(self.start) & ~np.isnat(
+            self.end) & (self.end > self.start)
+        if by_location:
+            mask &= self.location != 0
+        rows = np.flatnonzero(mask)
+        if rows.size < 2:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        groups = self.location[rows] if by_location else None
+        return find_overlaps(self.start[rows].astype(np.int64),
+                             self.end[rows].astype(np.int64), groups, rows)
+
+
+def find_overlaps(start: np.ndarray,
+                  end: np.ndarray,
+                  groups: Optional[np.ndarray] = None,
+                  rows: Optional[np.ndarray] = None) -> Pairs:
+    if groups is None:
+        groups = np.zeros(start.size, dtype=np.int64)
+    if rows is None:
+        rows = np.arange(start.size)
+
+    order = np.lexsort((start, groups))
+    base = start.min()
+    span = end.max() - base + 1
+    offset = groups[order].astype(np.int64) * span
+    start = start[order] - base + offset
+    end = end[order] - base + offset
+
+    positions = np.arange(start.size)
+    counts = np.searchsorted(start, end, side='left') - positions - 1
+    earlier = np.repeat(positions, counts)
+    first = np.cumsum(counts) - counts
+    later = np.arange(counts.sum()) - np.repeat(first - positions - 1, counts)
+    return rows[order[later]], rows[order[earlier]]
+
+
+def _header_row(ws, headers: Sequence[str]) -> list:
+    fill = PatternFill(start_color="4472C4", end_color="4472C4",
+                       fill_type="solid")
+    font = Font(bold=True, color="FFFFFF")
+    cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.fill = fill
+        cell.font = font
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cells.append(cell)
+    return cells
+
+
+def _write_sheet(wb, title: str, headers: Sequence[str], rows, widths=None):
+    ws = wb.create_sheet(title)
+    for i, width in enumerate(widths or [], start=1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+    ws.append(_header_row(ws, headers))
+    written = 0
+    for row in rows:
+        if written >= EXCEL_MAX_ROWS:
+            print(f"  警告: {title} 超过Excel行数上限，已截断")
+            break
+        ws.append(row)
+        written += 1
+
+
+def _pair_rows(table: ResultTable, pairs: Pairs):
+    for i, j in zip(*pairs):
+        yield [
+            table.names[table.name[i]],
+            format_time(table.start[i]),
+            format_time(table.end[i]),
+            table.locations[table.location[i]],
+            table.names[table.name[j]],
+            format_time(table.start[j]),
+            format_time(table.end[j]),
+            table.locations[table.location[j]],
+            table.file_names[table.file_name[i]],
+            table.file_names[table.file_name[j]]
+        ]
+
+
+def write_report(table: ResultTable, output_path: str, dedupe: bool = True):
+    unique = table.unique
+    monthly = table.monthly_hours(dedupe)
+    duplicates = table.duplicate_groups()
+    overlaps = table.overlaps()
+    room_overlaps = table.overlaps(by_location=True)
+
+    summary = [
+        ['总记录数', len(table)],
+        ['成功记录', int(table.ok.sum())],
+        ['失败记录', int((~table.ok).sum())],
+        ['不重复讲座（名称+开始时间）', int(unique.sum())],
+        ['总学时', round(float(np.nansum(table.hours[unique if dedupe
+                                                    else table.ok])), 2)],
+        ['开始时间无法解析', int((table.ok & np.isnat(table.start)).sum())],
+        ['重复的讲座名称', len(duplicates)],
+        ['时间冲突', len(overlaps[0])],
+        ['同一地点时间冲突', len(room_overlaps[0])],
+    ]
+
+    pair_headers = [
+        '讲座', '开始时间', '结束时间', '地点', '冲突讲座', '开始时间', '结束时间', '地点', '文件名',
+        '冲突讲座文件名'
+    ]
+    pair_widths = [40, 18, 18, 20, 40, 18, 18, 20, 30, 30]
+
+    wb = openpyxl.Workbook(write_only=True)
+    _write_sheet(wb, '汇总', ['指标', '数值'], summary, [30, 15])
+    _write_sheet(wb, '月度学时', ['月份', '讲座数', '学时'], monthly, [12, 10, 10])
+    _write_sheet(wb, '重复讲座', ['培训/会议名称', '出现次数', '不同开始时间数', '首次出现文件'],
+                 duplicates, [50, 10, 15, 40])
+    _write_sheet(wb, '时间冲突', pair_headers, _pair_rows(table, overlaps),
+                 pair_widths)
+    _write_sheet(wb, '地点冲突', pair_headers, _pair_rows(table, room_overlaps),
+                 pair_widths)
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    wb.save(output_path)
+    return summary
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='对提取结果做汇总分析：月度学时、重复讲座、时间冲突')
+    parser.add_argument('-i',
+                        '--input',
+                        action='append',
+                        required=True,
+                        help='结果文件（.xlsx/.csv/.jsonl），可多次指定')
+    parser.add_argument('-o',
+                        '--output',
+                        default='output/analysis.xlsx',
+                        help='分析报告输出文件（默认: output/analysis.xlsx）')
+    parser.add_argument('--no-dedupe',
+                        action='store_true',
+                        help='统计学时时不对名称和开始时间相同的讲座去重')
+
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("提取结果分析工具")
+    print("=" * 50)
+
+    start = time.perf_counter()
+    table = ResultTable.load(args.input)
+    loaded = time.perf_counter()
+    print(f"读取 {len(table)} 条记录，用时 {loaded - start:.2f} 秒")
+
+    summary = write_report(table, args.output, not args.no_dedupe)
+    print(f"分析并写出报告，用时 {time.perf_counter() - loaded:.2f} 秒")
+    print(f"已保存: {args.output}")
+
+    print()
+    print("=" * 50)
+    for name, value in summary:
+        print(f"{name}: {value}")
+    print("=" * 50)
@@ -0,0 +1,291 @@
+import hashlib
+import io
+import os
+import re
+import signal
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Future
+from html import unescape
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from eml_parser import DEFAULT_MAX_ATTACHMENT_BYTES, has_schedule_details
+from metrics import metrics
+
+CACHE_FILE_NAME = 'attachments.sqlite'
+DEFAULT_TIMEOUT = 20.0
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+MAX_ATTACHMENT_CHARS = 6000
+LOOKAHEAD = 32
+CACHED_STATUSES = ('ok', 'empty', 'error', 'timeout')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attachments (
+    digest TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    text BLOB NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+_DOCX_PARAGRAPH_RE = re.compile(r'</w:p>|<w:br/>|<w:tab/>')
+_DOCX_TEXT_RE = re.compile(r'<w:t(?:\s[^>]*)?>([^<]*)</w:t>')
+_DOCX_PARTS_RE = re.compile(r'word/(?:document|header\d*|footer\d*)\.xml$')
+
+Result = Tuple[str, str]
+
+
+class AttachmentTimeout(BaseException):
+    pass
+
+
+def default_cache_path(output_file: str) -> str:
+    return os.path.join(os.path.dirname(output_file) or '.', CACHE_FILE_NAME)
+
+
+def _docx_text(data: bytes) -> str:
+    lines = []
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for name in sorted(archive.namelist()):
+            if not _DOCX_PARTS_RE.match(name):
+                continue
+            xml = archive.read(name).decode('utf-8', errors='ignore')
+            for block in _DOCX_PARAGRAPH_RE.split(xml):
+                line = ''.join(_DOCX_TEXT_RE.findall(block))
+                if line.strip():
+                    lines.append(unescape(line))
+    return '\n'.join(lines)
+
+
+def _xlsx_text(data: bytes) -> str:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    lines = []
+    size = 0
+    try:
+        for sheet in workbook.worksheets:
+            for row in sheet.iter_rows(values_only=True):
+                cells = [str(cell) for cell in row if cell not in (None, '')]
+                if not cells:
+                    continue
+                line = ' | '.join(cells)
+                lines.append(line)
+                size += len(line)
+                if size > MAX_ATTACHMENT_CHARS:
+                    return '\n'.join(lines)
+    finally:
+        workbook.close()
+    return '\n'.join(lines)
+
+
+def _pdf_text(data: bytes) -> str:
+    from pypdf import PdfReader
+
+    pages = []
+    size = 0
+    for page in PdfReader(io.BytesIO(data)).pages:
+        text = page.extract_text() or ''
+        pages.append(text)
+        size += len(text)
+        if size > MAX_ATTACHMENT_CHARS:
+            break
+    return '\n'.join(pages)
+
+
+_EXTRACTORS = {'pdf': _pdf_text, 'docx': _docx_text, 'xlsx': _xlsx_text}
+
+
+def _on_alarm(signum, frame):
+    raise AttachmentTimeout()
+
+
+def extract_text(kind: str, data: bytes, timeout: float) -> Result:
+    use_alarm = timeout and hasattr(signal, 'setitimer')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        text = _EXTRACTORS[kind](data)
+    except AttachmentTimeout:
+        return 'timeout', ''
+    except ImportError:
+        return 'unsupported', ''
+    except Exception:
+        return 'error', ''
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    lines = (' '.join(line.split()) for line in text.splitlines())
+    text = '\n'.join(line for line in lines if line)
+    return ('ok' if text else 'empty'), text[:MAX_ATTACHMENT_CHARS]
+
+
+class AttachmentExtractor:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pool = None
+        self._memo: Dict[str, Result] = {}
+        self._pending: Dict[str, Future] = {}
+        self.enabled = False
+        self.path: Optional[str] = None
+        self.workers = DEFAULT_WORKERS
+        self.max_bytes = DEFAULT_MAX_ATTACHMENT_BYTES
+        self.timeout = DEFAULT_TIMEOUT
+
+    def open(self,
+             cache_path: Optional[str],
+             workers: int = DEFAULT_WORKERS,
+             max_bytes: int = DEFAULT_MAX_ATTACHMENT_BYTES,
+             timeout: float = DEFAULT_TIMEOUT) -> 'AttachmentExtractor':
+        self.close()
+        conn = None
+        if cache_path:
+            import sqlite3
+
+            os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(cache_path,
+                                   timeout=30,
+                                   check_same_thread=False,
+                                   isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(_SCHEMA)
+        with self._lock:
+            self._conn = conn
+            self.path = cache_path
+            self.workers = max(1, workers)
+            self.max_bytes = max_bytes
+            self.timeout = timeout
+            self.enabled = True
+        return self
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            if self._conn is not None:
+                self._conn.close()
+            self._pool = None
+            self._conn = None
+            self._memo.clear()
+            self._pending.clear()
+            self.path = None
+            self.enabled = False
+
+    def count(self) -> int:
+        with self._lock:
+            if self._conn is None:
+                return 0
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM attachments').fetchone()[0]
+
+    def _cached(self, digest: str) -> Optional[Result]:
+        result = self._memo.get(digest)
+        if result is not None or self._conn is None:
+            return result
+        row = self._conn.execute(
+            'SELECT status, text FROM attachments WHERE digest = ?',
+            (digest, )).fetchone()
+        if row is None:
+            return None
+        result = self._memo[digest] = (row[0],
+                                       zlib.decompress(row[1]).decode('utf-8'))
+        return result
+
+    def _store(self, digest: str, kind: str, result: Result):
+        self._memo[digest] = result
+        if self._conn is None or result[0] not in CACHED_STATUSES:
+            return
+        self._conn.execute(
+            'INSERT OR REPLACE INTO attachments VALUES (?, ?, ?, ?, ?)',
+            (digest, kind, result[0],
+             zlib.compress(result[1].encode('utf-8'), 6), time.time()))
+
+    def _submit(self, kind: str, data: bytes) -> Future:
+        if self._pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._pool = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool.submit(extract_text, kind, data, self.timeout)
+
+    def _start(self, record: Dict) -> List[Tuple]:
+        attachments = record.pop('attachments', None)
+        if not attachments or record.get('error'):
+            return []
+        if has_schedule_details(f"{record.get('subject') or ''}\n"
+                                f"{record.get('body') or ''}"):
+            metrics.inc('attachments_total',
+                        len(attachments),
+                        status='not_needed')
+            return []
+
+        jobs = []
+        with self._lock:
+            for attachment in attachments:
+                data = attachment['data']
+                if len(data) > self.max_bytes:
+                    metrics.inc('attachments_total', status='too_large')
+                    continue
+                digest = hashlib.sha256(data).hexdigest()
+                cached = self._cached(digest)
+                if cached is not None:
+                    metrics.inc('attachments_total', status='cached')
+                    jobs.append((attachment, digest, cached))
+                    continue
+                future = self._pending.get(digest)
+                if future is None:
+                    future = self._pending[digest] = self._submit(
+                        attachment['kind'], data)
+                jobs.append((attachment, digest, future))
+        return jobs
+
+    def _finish(self, record: Dict, jobs: List[Tuple]) -> Dict:
+        parts = []
+        for attachment, digest, job in jobs:
+            if isinstance(job, Future):
+                try:
+                    with metrics.stage('attachments'):
+                        result = job.result()
+                except Exception:
+                    result = ('error', '')
+                with self._lock:
+                    if self._pending.pop(digest, None) is not None:
+                        self._store(digest, attachment['kind'], result)
+                        metrics.inc('attachments_total', status=result[0])
+                    else:
+                        metrics.inc('attachments_total', status='cached')
+            else:
+                result = job
+            if result[0] == 'ok':
+                parts.append(f"【{attachment['name']}】\n{result[1]}")
+
+        if parts:
+            record['attachment_text'] = '\n\n'.join(parts)[:MAX_ATTACHMENT_CHARS]
+            metrics.inc('attachment_emails_total')
+        return record
+
+    def iter_records(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        if not self.enabled:
+            yield from records
+            return
+
+        window = deque()
+        for record in records:
+            window.append((record, self._start(record)))
+            if len(window) > LOOKAHEAD:
+                yield self._finish(*window.popleft())
+        while window:
+            yield self._finish(*window.popleft())
+
+
+attachment_extractor = AttachmentExtractor()
@@ -0,0 +1,178 @@
+import os
+import random
+from datetime import datetime, timedelta
+from email.header import Header
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import format_datetime
+from typing import Dict, List
+
+CHARSETS = ('utf-8', 'gbk', 'gb2312')
+
+TOPICS_ZH = [
+    '深度学习在医学影像中的应用', '大语言模型的对齐与安全', '单细胞测序数据分析方法', '图神经网络前沿进展',
+    '科研论文写作与投稿技巧', '量子计算导论', '碳中和背景下的能源转型', '知识产权与专利检索',
+    'Web of Science 数据库检索与利用', 'AIGC赋能学术文献检索'
+]
+TOPICS_EN = [
+    'Understanding and Characterizing Regularization',
+    'Scaling Laws for Neural Language Models',
+    'Causal Inference in Observational Studies',
+    'Robust Optimization under Uncertainty',
+    'Single-Cell Multi-Omics Integration',
+    'Efficient Transformers for Long Sequences'
+]
+SPEAKERS = ['张伟 教授', '李娜 研究员', '王强 博士', 'Prof. John Smith', 'Dr. Emily Chen']
+LOCATIONS = ['F512会议室', 'A101报告厅', 'B203', '线上（腾讯会议）', '图书馆一楼讲堂', 'C区学术报告厅']
+SENDERS = ['研究生院 <gs@example.edu.cn>', '图书馆 <lib@example.edu.cn>',
+           'Seminar Office <seminar@example.edu>']
+
+
+def _lecture(rng: random.Random, base: datetime) -> Dict:
+    start = base + timedelta(days=rng.randint(0, 30),
+                             hours=rng.choice([9, 10, 14, 15, 16, 19]))
+    minutes = rng.choice([60, 90, 120])
+    topic = rng.choice(TOPICS_ZH + TOPICS_EN)
+    return {
+        'title': topic,
+        'speaker': rng.choice(SPEAKERS),
+        'location': rng.choice(LOCATIONS),
+        'start': start,
+        'end': start + timedelta(minutes=minutes)
+    }
+
+
+def _plain_body(lectures: List[Dict], filler: str) -> str:
+    lines = ['各位老师、同学：', '', '欢迎参加以下学术报告：', '']
+    for i, lec in enumerate(lectures, start=1):
+        lines.extend([
+            f"报告{i}：{lec['title']}",
+            f"报告人：{lec['speaker']}",
+            f"时间：{lec['start']:%Y年%m月%d日} {lec['start']:%H:%M}-{lec['end']:%H:%M}",
+            f"地点：{lec['location']}", ''
+        ])
+    lines.extend(['Welcome to join us!', '', filler])
+    return '\n'.join(lines)
+
+
+def _html_body(lectures: List[Dict], filler: str) -> str:
+    rows = ''.join(
+        f"<tr><td style=\"padding:4px\">{lec['start']:%Y-%m-%d %H:%M}&nbsp;&ndash;&nbsp;{lec['end']:%H:%M}</td>"
+        f"<td><a href=\"https://example.edu/seminar?id={i}&amp;lang=zh\">{lec['title']}</a></td>"
+        f"<td>{lec['speaker']}</td><td>{lec['location']}</td></tr>"
+        for i, lec in enumerate(lectures))
+    return (
+        "<html><head><meta charset=\"utf-8\"><style>td{font-family:Arial}</style>"
+        "<script>var tracking = '<p>ignore</p>';</script></head><body>"
+        "<div class=\"header\"><img src=\"logo.png\" alt=\"学术活动通知\"></div>"
+        "<p>各位老师、同学：</p><p>欢迎参加以下学术报告 &mdash; Seminar Series</p>"
+        f"<table><tr><th>时间</th><th>题目</th><th>报告人</th><th>地点</th></tr>{rows}</table>"
+        f"<div style=\"display:none\">preheader text</div><p>{filler}</p>"
+        "</body></html>")
+
+
+def build_message(rng: random.Random,
+                  index: int,
+                  lectures_per_email: int = 1,
+                  html_ratio: float = 0.6,
+                  attachment_ratio: float = 0.2,
+                  attachment_bytes: int = 2 * 1024 * 1024,
+                  filler_paragraphs: int = 3) -> bytes:
+    base = datetime(2025, 12, 1, 0, 0)
+    lectures = [
+        _lecture(rng, base) for _ in range(max(1, lectures_per_email))
+    ]
+    charset = rng.choice(CHARSETS)
+    filler = ' '.join(['本报告面向全校师生开放，欢迎感兴趣的老师和同学参加。'] *
+                      max(1, filler_paragraphs))
+
+    alternative = MIMEMultipart('alternative')
+    use_html = rng.random() < html_ratio
+    if not use_html or rng.random() < 0.5:
+        alternative.attach(
+            MIMEText(_plain_body(lectures, filler), 'plain', charset))
+    if use_html:
+        alternative.attach(
+            MIMEText(_html_body(lectures, filler), 'html', charset))
+
+    has_attachment = rng.random() < attachment_ratio
+    if has_attachment:
+        message = MIMEMultipart('mixed')
+        message.attach(alternative)
+        attachment = MIMEApplication(rng.randbytes(attachment_bytes),
+                                     Name=f'poster_{index}.pdf')
+        attachment['Content-Disposition'] = (
+            f'attachment; filename="poster_{index}.pdf"')
+        message.attach(attachment)
+    else:
+        message = alternative
+
+    first = lectures[0]
+    subject = f"【学术报告】{first['title']}（{first['start']:%m月%d日} {first['start']:%H:%M}，{first['location']}）"
+    message['Subject'] = Header(subject, charset).encode()
+    message['From'] = rng.choice(SENDERS)
+    message['Date'] = format_datetime(base - timedelta(days=rng.randint(1, 7)))
+    message['Message-ID'] = f"<bench-{index}@example.edu.cn>"
+    return message.as_bytes()
+
+
+def generate_corpus(output_dir: str,
+                    count: int = 1000,
+                    seed: int = 42,
+                    lectures_per_email: int = 1,
+                    html_ratio: float = 0.6,
+                    attachment_ratio: float = 0.2,
+                    attachment_bytes: int = 2 * 1024 * 1024,
+                    subdirs: int = 10,
+                    filler_paragraphs: int = 3) -> List[str]:
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+
+    paths = []
+    for i in range(count):
+        sub_dir = output_dir
+        if subdirs:
+            sub_dir = os.path.join(output_dir, f"batch_{i % subdirs:03d}")
+            os.makedirs(sub_dir, exist_ok=True)
+        path = os.path.join(sub_dir, f"notice_{i:06d}.eml")
+        with open(path, 'wb') as f:
+            f.write(
+                build_message(rng, i, lectures_per_email, html_ratio,
+                              attachment_ratio, attachment_bytes,
+                              filler_paragraphs))
+        paths.append(path)
+
+    return paths
+
+
+def build_newsletter_html(rows: int = 500, seed: int = 42) -> str:
+    rng = random.Random(seed)
+    base = datetime(2025, 12, 1)
+    lectures = [_lecture(rng, base) for _ in range(rows)]
+    return _html_body(lectures, '本报告面向全校师生开放。' * 20)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='生成用于基准测试的合成EML语料')
+    parser.add_argument('-o', '--output', default='bench_corpus', help='输出目录')
+    parser.add_argument('-n', '--count', type=int, default=1000, help='邮件数量')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--lectures', type=int, default=1, help='每封邮件的讲座数')
+    parser.add_argument('--html-ratio', type=float, default=0.6, help='包含HTML正文的比例')
+    parser.add_argument('--attachment-ratio',
+                        type=float,
+                        default=0.2,
+                        help='带附件邮件的比例')
+    parser.add_argument('--attachment-kb',
+                        type=int,
+                        default=2048,
+                        help='附件大小（KB）')
+
+    args = parser.parse_args()
+    paths = generate_corpus(args.output, args.count, args.seed, args.lectures,
+                            args.html_ratio, args.attachment_ratio,
+                            args.attachment_kb * 1024)
+    print(f"已生成 {len(paths)} 个EML文件: {args.output}")
@@ -0,0 +1,109 @@
+import json
+import random
+import threading
+from typing import Dict, List, Optional
+
+FAULT_KINDS = ('429', '5xx', 'timeout', 'slow_first_byte', 'truncated',
+               'garbled', 'reset')
+
+
+class FaultRule:
+
+    def __init__(self,
+                 kind: str,
+                 probability: float = 1.0,
+                 start: Optional[float] = None,
+                 end: Optional[float] = None,
+                 requests: Optional[List[int]] = None,
+                 every: Optional[int] = None,
+                 status: int = 503,
+                 retry_after: Optional[float] = None,
+                 delay: float = 0.0):
+        if kind not in FAULT_KINDS:
+            raise ValueError(f"未知故障类型: {kind}，支持: {', '.join(FAULT_KINDS)}")
+        self.kind = kind
+        self.probability = probability
+        self.start = start
+        self.end = end
+        self.requests = requests
+        self.every = every
+        self.status = status
+        self.retry_after = retry_after
+        self.delay = delay
+
+    def applies(self, request_index: int, elapsed: float,
+                rng: random.Random) -> bool:
+        if self.start is not None and elapsed < self.start:
+            return False
+        if self.end is not None and elapsed >= self.end:
+            return False
+        if self.requests is not None:
+            first, last = self.requests
+            if not first <= request_index <= last:
+                return False
+        if self.every and request_index % self.every != 0:
+            return False
+        return rng.random() < self.probability
+
+    def to_dict(self) -> Dict:
+        return {k: v for k, v in self.__dict__.items() if v is not None}
+
+
+class FaultSchedule:
+
+    def __init__(self, rules: Optional[List[FaultRule]] = None, seed: int = 0):
+        self.rules = rules or []
+        self.seed = seed
+        self._lock = threading.Lock()
+
+    def pick(self, request_index: int, elapsed: float) -> Optional[FaultRule]:
+        rng = random.Random(self.seed * 1000003 + request_index)
+        for rule in self.rules:
+            if rule.applies(request_index, elapsed, rng):
+                return rule
+        return None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'FaultSchedule':
+        rules = [FaultRule(**rule) for rule in data.get('faults', [])]
+        return cls(rules, data.get('seed', 0))
+
+    @classmethod
+    def from_file(cls, path: str) -> 'FaultSchedule':
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith(('.yaml', '.yml')):
+                import yaml
+                data = yaml.safe_load(f) or {}
+            else:
+                data = json.load(f)
+        return cls.from_dict(data)
+
+    @classmethod
+    def from_specs(cls, specs: List[str], seed: int = 0) -> 'FaultSchedule':
+        rules = []
+        for spec in specs:
+            kind, _, rest = spec.partition(':')
+            kwargs = {}
+            if rest:
+                for item in rest.split(','):
+                    key, sep, value = item.partition('=')
+                    if not sep:
+                        key, value = 'probability', item
+                    kwargs[key] = _parse_value(key, value)
+            rules.append(FaultRule(kind, **kwargs))
+        return cls(rules, seed)
+
+    def to_dict(self) -> Dict:
+        return {
+            'seed': self.seed,
+            'faults': [rule.to_dict() for rule in self.rules]
+        }
+
+
+def _parse_value(key: str, value: str):
+    if key == 'requests':
+        first, _, last = value.partition('-')
+        return [int(first), int(last or first)]
+    if key in ('every', 'status'):
+        return int(value)
+    return float(value)
@@ -0,0 +1,144 @@
+import contextlib
+import io
+import json
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.corpus import build_message
+from benchmarks.faults import FaultSchedule
+from benchmarks.mock_llm_server import MockLLMServer, point_api_configs_at
+
+
+def load_emails(count: int,
+                corpus_dir: Optional[str] = None,
+                seed: int = 42) -> List[Dict]:
+    from eml_parser import parse_eml_bytes
+
+    if corpus_dir:
+        from mail_sources import iter_email_records
+        records = []
+        for record in iter_email_records(corpus_dir,
+                                         parse_options={'lazy': True}):
+            records.append(record)
+            if len(records) >= count:
+                break
+        return records
+
+    rng = random.Random(seed)
+    return [
+        parse_eml_bytes(build_message(rng, i, attachment_ratio=0),
+                        f"synthetic/notice_{i:06d}.eml",
+                        lazy=True) for i in range(count)
+    ]
+
+
+def run_load_test(emails: List[Dict],
+                  server: MockLLMServer,
+                  api_name: str,
+                  concurrency: int,
+                  timeout: Optional[float] = None,
+                  quiet: bool = True) -> Dict:
+    from extractor import extract_training_info_batch
+
+    point_api_configs_at(server, [api_name], concurrency)
+    if timeout:
+        import config
+        config.API_CONFIGS[api_name]['timeout'] = timeout
+
+    server.reset_stats()
+    output = io.StringIO() if quiet else None
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+        results = extract_training_info_batch(emails, api_name)
+    elapsed = time.perf_counter() - start
+
+    failed_files = {
+        r.get('file_name')
+        for r in results if not r.get('training_name')
+    }
+    stats = server.stats()
+    return {
+        'api': api_name,
+        'max_concurrency': concurrency,
+        'emails': len(emails),
+        'records': len(results),
+        'failed_emails': len(failed_files),
+        'wall_seconds': round(elapsed, 3),
+        'emails_per_second': round(len(emails) / elapsed, 2)
+        if elapsed > 0 else None,
+        'server': stats
+    }
+
+
+def print_report(rows: List[Dict]):
+    print()
+    print(f"{'并发':>4} {'邮件/秒':>8} {'失败':>5} {'请求数':>7} {'浪费重试':>8} "
+          f"{'p50(s)':>8} {'p95(s)':>8} {'p99(s)':>8}  故障")
+    for row in rows:
+        server = row['server']
+        latency = server['email_latency']
+        print(f"{row['max_concurrency']:>4} {row['emails_per_second'] or 0:>10.2f} "
+              f"{row['failed_emails']:>6} {server['requests']:>9} "
+              f"{server['wasted_requests']:>10} "
+              f"{latency['p50'] or 0:>8.3f} {latency['p95'] or 0:>8.3f} "
+              f"{latency['p99'] or 0:>8.3f}  {server['faults']}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='对本地故障注入LLM服务运行 extract_training_info_batch 负载测试')
+    parser.add_argument('-n', '--emails', type=int, default=200, help='邮件数量')
+    parser.add_argument('--corpus', help='使用已有EML目录/归档代替合成邮件')
+    parser.add_argument('--api', default='zai-plan', help='模拟的API提供商')
+    parser.add_argument('--concurrency',
+                        default='1,5,10',
+                        help='逗号分隔的并发级别（默认: 1,5,10）')
+    parser.add_argument('--latency', type=float, default=0.3, help='模拟延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.2, help='随机附加延迟上限（秒）')
+    parser.add_argument('--timeout', type=float, default=10, help='客户端请求超时（秒）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--faults', help='故障计划文件（YAML/JSON）')
+    parser.add_argument('--fault',
+                        action='append',
+                        help='故障规则，如 "429:0.1,retry_after=1"，可多次指定')
+    parser.add_argument('-o', '--output', help='结果JSON输出路径')
+    parser.add_argument('-v', '--verbose', action='store_true', help='显示提取过程输出')
+
+    args = parser.parse_args()
+
+    if args.faults:
+        schedule = FaultSchedule.from_file(args.faults)
+    else:
+        schedule = FaultSchedule.from_specs(args.fault or [], args.seed)
+
+    emails = load_emails(args.emails, args.corpus)
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+
+    rows = []
+    with MockLLMServer(latency=args.latency,
+                       jitter=args.jitter,
+                       seed=args.seed,
+                       fault_schedule=schedule) as server:
+        for level in levels:
+            print(f"运行负载测试: 并发 {level}，{len(emails)} 封邮件...")
+            rows.append(
+                run_load_test(emails, server, args.api, level, args.timeout,
+                              not args.verbose))
+
+    print_report(rows)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'fault_schedule': schedule.to_dict(),
+                'runs': rows
+            },
+                      f,
+                      ensure_ascii=False,
+                      indent=2)
+        print(f"\n结果已保存: {args.output}")
@@ -0,0 +1,582 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import config
+from budget import estimate_tokens
+from benchmarks.faults import FaultRule, FaultSchedule
+from validation import normalize_lecture, parse_time
+
+_TITLE_RE = re.compile(r'报告\d+：(.+)')
+_TIME_RE = re.compile(
+    r'时间：(\d{4})年(\d{2})月(\d{2})日 (\d{2}:\d{2})-(\d{2}:\d{2})')
+_LOCATION_RE = re.compile(r'地点：(.+)')
+_SUBJECT_RE = re.compile(r'邮件主题：(.+)')
+CACHE_BLOCK_CHARS = 256
+
+_REPAIR_MARKER = '上一次的回答：\n'
+_OBJECT_RE = re.compile(r'\{[^{}]*\}')
+_DAY_FIRST_RE = re.compile(r'^(\d{2})/(\d{2})/(\d{4}) (\d{2}:\d{2})$')
+
+_EMAIL_SECTION_RE = re.compile(r'^=== 邮件 (\d+) ===$', re.MULTILINE)
+_ROW_RE = re.compile(r'^(\d{4})-(\d{2})-(\d{2}) (\d{2}:\d{2}) \S (\d{2}:\d{2}) \| '
+                     r'([^|\n]+?) \| [^|\n]+? \| ([^|\n]+)$', re.MULTILINE)
+
+
+def canned_extraction(prompt: str) -> List[Dict]:
+    sections = _EMAIL_SECTION_RE.split(prompt)
+    if len(sections) > 1:
+        lectures = []
+        for index, section in zip(sections[1::2], sections[2::2]):
+            for lecture in canned_extraction(section):
+                lecture['email_index'] = int(index)
+                lectures.append(lecture)
+        return lectures
+
+    titles = _TITLE_RE.findall(prompt)
+    times = _TIME_RE.findall(prompt)
+    locations = _LOCATION_RE.findall(prompt)
+
+    if not titles:
+        rows = _ROW_RE.findall(prompt)
+        titles = [row[5] for row in rows]
+        times = [row[:5] for row in rows]
+        locations = [row[6] for row in rows]
+
+    if not titles:
+        subject = _SUBJECT_RE.search(prompt)
+        titles = [subject.group(1).strip() if subject else '学术报告']
+
+    lectures = []
+    for i, title in enumerate(titles):
+        start = end = None
+        duration = None
+        if i < len(times):
+            y, m, d, t1, t2 = times[i]
+            start = f"{y}-{m}-{d} {t1}"
+            end = f"{y}-{m}-{d} {t2}"
+            h1, m1 = map(int, t1.split(':'))
+            h2, m2 = map(int, t2.split(':'))
+            duration = round(((h2 * 60 + m2) - (h1 * 60 + m1)) / 60, 2)
+        lectures.append({
+            'training_name': title.strip(),
+            'start_time': start,
+            'end_time': end,
+            'duration_hours': duration,
+            'location': locations[i].strip() if i < len(locations) else None,
+            'purpose': '了解该领域的研究进展与方法',
+            'content': '介绍相关理论、方法及典型应用案例'
+        })
+    return lectures
+
+
+def canned_repair(prompt: str) -> List[Dict]:
+    previous = prompt.split(_REPAIR_MARKER, 1)[1]
+    try:
+        lectures = json.loads(previous)
+    except json.JSONDecodeError:
+        lectures = []
+        for match in _OBJECT_RE.findall(previous):
+            try:
+                lectures.append(json.loads(match))
+            except json.JSONDecodeError:
+                continue
+    if isinstance(lectures, dict):
+        lectures = [lectures]
+
+    repaired = []
+    for lecture in lectures:
+        if not isinstance(lecture, dict):
+            continue
+        lecture = dict(lecture)
+        for field in ('start_time', 'end_time'):
+            value = lecture.get(field)
+            if isinstance(value, str):
+                lecture[field] = _DAY_FIRST_RE.sub(r'\3-\2-\1 \4', value)
+        normalize_lecture(lecture)
+        for field in ('start_time', 'end_time'):
+            if parse_time(lecture.get(field)) is None:
+                lecture[field] = None
+        repaired.append(lecture)
+    return repaired
+
+
+def degrade_lecture(lecture: Dict) -> Dict:
+    lecture = dict(lecture)
+    if lecture.get('start_time'):
+        lecture['start_time'] = lecture['start_time'].replace(' ', 'T') + ':00'
+    if lecture.get('end_time'):
+        date, clock = lecture['end_time'].split(' ', 1)
+        year, month, day = date.split('-')
+        lecture['end_time'] = f"{day}/{month}/{year} {clock}"
+    if lecture.get('duration_hours') is not None:
+        lecture['duration_hours'] = f"{lecture['duration_hours']}小时"
+    return lecture
+
+
+def _request_prompt(payload: Dict) -> str:
+    texts = []
+    system = payload.get('system')
+    if isinstance(system, str):
+        texts.append(system)
+    elif isinstance(system, list):
+        texts.extend(block.get('text', '') for block in system)
+    instruction = payload.get('systemInstruction') or payload.get(
+        'system_instruction')
+    if instruction:
+        texts.extend(p.get('text', '') for p in instruction.get('parts', []))
+    for msg in payload.get('messages', []):
+        content = msg.get('content')
+        if isinstance(content, list):
+            texts.extend(block.get('text', '') for block in content)
+        else:
+            texts.append(content or '')
+    for item in payload.get('contents', []):
+        texts.extend(p.get('text', '') for p in item.get('parts', []))
+    return '\n'.join(texts)
+
+
+def _user_prompt(payload: Dict) -> str:
+    for msg in reversed(payload.get('messages', [])):
+        if msg.get('role') == 'user':
+            content = msg.get('content')
+            if isinstance(content, list):
+                return '\n'.join(b.get('text', '') for b in content)
+            return content or ''
+    contents = payload.get('contents', [])
+    if contents:
+        return '\n'.join(p.get('text', '') for p in contents[-1]['parts'])
+    return ''
+
+
+def _max_output_tokens(payload: Dict) -> Optional[int]:
+    limit = payload.get('max_tokens')
+    if limit is None:
+        limit = (payload.get('generationConfig') or {}).get('maxOutputTokens')
+    return int(limit) if limit else None
+
+
+def build_provider_response(api_type: str,
+                            model: str,
+                            text: str,
+                            prompt_tokens: int,
+                            completion_tokens: int,
+                            cached_tokens: int = 0) -> Dict:
+    if api_type == 'gemini':
+        return {
+            'candidates': [{
+                'content': {
+                    'role': 'model',
+                    'parts': [{
+                        'text': text
+                    }]
+                },
+                'finishReason': 'STOP'
+            }],
+            'usageMetadata': {
+                'promptTokenCount': prompt_tokens,
+                'candidatesTokenCount': completion_tokens,
+                'cachedContentTokenCount': cached_tokens,
+                'totalTokenCount': prompt_tokens + completion_tokens
+            },
+            'modelVersion': model
+        }
+    if api_type == 'anthropic':
+        return {
+            'id': 'msg_mock',
+            'type': 'message',
+            'role': 'assistant',
+            'model': model,
+            'content': [{
+                'type': 'text',
+                'text': text
+            }],
+            'stop_reason': 'end_turn',
+            'usage': {
+                'input_tokens': prompt_tokens - cached_tokens,
+                'cache_read_input_tokens': cached_tokens,
+                'output_tokens': completion_tokens
+            }
+        }
+    return {
+        'id': 'chatcmpl-mock',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{
+            'index': 0,
+            'message': {
+                'role': 'assistant',
+                'content': text
+            },
+            'finish_reason': 'stop'
+        }],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'prompt_tokens_details': {
+                'cached_tokens': cached_tokens
+            }
+        }
+    }
+
+
+def _api_type_for_path(path: str) -> str:
+    if ':generateContent' in path:
+        return 'gemini'
+    if path.rstrip('/').endswith('/messages'):
+        return 'anthropic'
+    return 'openai'
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body, headers: Optional[Dict] = None):
+        data = body if isinstance(body, bytes) else json.dumps(
+            body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server: MockLLMServer = self.server.mock
+        length = int(self.headers.get('Content-Length', 0))
+        raw = self.rfile.read(length)
+        try:
+            payload = json.loads(raw or b'{}')
+        except json.JSONDecodeError:
+            self._send_json(400, {'error': {'message': 'invalid json'}})
+            return
+
+        api_type = _api_type_for_path(self.path)
+        model = payload.get('model') or self.path.split('/models/')[-1].split(
+            ':')[0]
+        server.handle_request(self, api_type, model, payload)
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+class MockLLMServer:
+
+    def __init__(self,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 tokens_per_second: float = 0.0,
+                 seed: int = 0,
+                 fault_schedule: Optional[FaultSchedule] = None,
+                 weak_models: Optional[Dict[str, float]] = None):
+        self.latency = latency
+        self.weak_models = weak_models or {}
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.fault_schedule = fault_schedule or FaultSchedule()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        self.reset_stats()
+
+        self._httpd = ThreadingHTTPServer((host, port), _MockHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread = None
+
+    def reset_stats(self):
+        with self._lock:
+            self._started_at = time.monotonic()
+            self.request_count = 0
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+            self.cached_tokens = 0
+            self.prefix_hashes = set()
+            self.fault_counts: Dict[str, int] = {}
+            self.request_latencies: List[float] = []
+            self.prompts: Dict[str, Dict] = {}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_for(self, api_type: str) -> str:
+        if api_type == 'anthropic':
+            return self.base_url
+        return f"{self.base_url}/v1"
+
+    def start(self) -> 'MockLLMServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> 'MockLLMServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _delay(self) -> float:
+        with self._lock:
+            jitter = self._rng.uniform(0, self.jitter) if self.jitter else 0
+        return self.latency + jitter
+
+    def _begin(self, prompt_key: str) -> tuple:
+        now = time.monotonic()
+        with self._lock:
+            index = self.request_count
+            self.request_count += 1
+            entry = self.prompts.setdefault(prompt_key, {
+                'first_seen': now,
+                'attempts': 0,
+                'succeeded': False
+            })
+            entry['attempts'] += 1
+            return index, now - self._started_at
+
+    def _finish(self,
+                prompt_key: str,
+                started: float,
+                fault: Optional[FaultRule],
+                prompt_tokens: int = 0,
+                completion_tokens: int = 0,
+                cached_tokens: int = 0):
+        now = time.monotonic()
+        succeeded = fault is None or fault.kind == 'slow_first_byte'
+        with self._lock:
+            self.request_latencies.append(now - started)
+            entry = self.prompts[prompt_key]
+            entry['last_done'] = now
+            if fault is not None:
+                self.fault_counts[fault.kind] = self.fault_counts.get(
+                    fault.kind, 0) + 1
+            if succeeded:
+                entry['succeeded'] = True
+                self.prompt_tokens += prompt_tokens
+                self.completion_tokens += completion_tokens
+                self.cached_tokens += cached_tokens
+
+    def _weak_answer(self, model: str) -> bool:
+        rate = self.weak_models.get(model, 0)
+        if not rate:
+            return False
+        with self._lock:
+            return self._rng.random() < rate
+
+    def _cached_prefix_tokens(self, prompt: str) -> int:
+        cached = 0
+        hasher = hashlib.sha1()
+        with self._lock:
+            for end in range(CACHE_BLOCK_CHARS, len(prompt) + 1,
+                             CACHE_BLOCK_CHARS):
+                hasher.update(prompt[end - CACHE_BLOCK_CHARS:end].encode(
+                    'utf-8'))
+                digest = hasher.copy().digest()
+                if digest in self.prefix_hashes:
+                    cached = end
+                else:
+                    self.prefix_hashes.add(digest)
+        return estimate_tokens(prompt[:cached])
+
+    def handle_request(self, handler: _MockHandler, api_type: str,
+                       model: str, payload: Dict):
+        started = time.monotonic()
+        user_prompt = _user_prompt(payload)
+        prompt_key = hashlib.sha1(user_prompt.encode('utf-8')).hexdigest()
+        index, elapsed = self._begin(prompt_key)
+        fault = self.fault_schedule.pick(index, elapsed)
+
+        if fault and fault.kind in ('429', '5xx'):
+            if fault.delay:
+                time.sleep(fault.delay)
+            status = 429 if fault.kind == '429' else fault.status
+            headers = {}
+            if fault.retry_after is not None:
+                headers['Retry-After'] = fault.retry_after
+            self._finish(prompt_key, started, fault)
+            handler._send_json(
+                status, {'error': {
+                    'message': f'injected {fault.kind}',
+                    'code': status
+                }}, headers)
+            return
+
+        if fault and fault.kind in ('timeout', 'reset'):
+            if fault.kind == 'timeout':
+                time.sleep(fault.delay or 300)
+            self._finish(prompt_key, started, fault)
+            handler.close_connection = True
+            return
+
+        if fault and fault.kind == 'slow_first_byte':
+            time.sleep(fault.delay)
+
+        prompt = _request_prompt(payload)
+        if _REPAIR_MARKER in user_prompt:
+            lectures = canned_repair(user_prompt)
+        else:
+            lectures = canned_extraction(user_prompt)
+        if self._weak_answer(model):
+            lectures = [degrade_lecture(l) for l in lectures]
+        text = json.dumps(lectures, ensure_ascii=False, indent=2)
+        if fault and fault.kind == 'garbled':
+            text = '好的，以下是提取结果：\n[{"training_name": "' + text[20:len(text) // 2]
+        max_tokens = _max_output_tokens(payload)
+        if max_tokens and estimate_tokens(text) > max_tokens:
+            text = text[:len(text) * max_tokens // estimate_tokens(text)]
+
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(text)
+        cached_tokens = self._cached_prefix_tokens(prompt)
+
+        delay = self._delay()
+        if self.tokens_per_second:
+            delay += completion_tokens / self.tokens_per_second
+        if delay > 0:
+            time.sleep(delay)
+
+        body = json.dumps(build_provider_response(api_type, model, text,
+                                                  prompt_tokens,
+                                                  completion_tokens,
+                                                  cached_tokens),
+                          ensure_ascii=False).encode('utf-8')
+        if fault and fault.kind == 'truncated':
+            body = body[:len(body) // 2]
+
+        self._finish(prompt_key, started, fault, prompt_tokens,
+                     completion_tokens, cached_tokens)
+        handler._send_json(200, body)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            prompts = list(self.prompts.values())
+            latencies = list(self.request_latencies)
+            requests = self.request_count
+            faults = dict(self.fault_counts)
+
+        email_latencies = [
+            p['last_done'] - p['first_seen'] for p in prompts
+            if 'last_done' in p
+        ]
+        return {
+            'requests': requests,
+            'unique_prompts': len(prompts),
+            'succeeded_prompts': sum(1 for p in prompts if p['succeeded']),
+            'wasted_requests': requests - len(prompts),
+            'faults': faults,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'cached_tokens': self.cached_tokens,
+            'request_latency': _latency_summary(latencies),
+            'email_latency': _latency_summary(email_latencies)
+        }
+
+
+def _latency_summary(values: List[float]) -> Dict:
+    summary = {'count': len(values)}
+    for pct in (50, 95, 99):
+        value = percentile(values, pct)
+        summary[f'p{pct}'] = round(value, 4) if value is not None else None
+    summary['max'] = round(max(values), 4) if values else None
+    return summary
+
+
+def point_api_configs_at(server: MockLLMServer,
+                         api_names: Optional[List[str]] = None,
+                         max_concurrency: Optional[int] = None):
+    for name in api_names or list(config.API_CONFIGS.keys()):
+        api_config = config.API_CONFIGS[name]
+        api_config['url'] = server.url_for(api_config['type'])
+        api_config['api_key'] = api_config['api_key'] or 'mock-key'
+        if max_concurrency:
+            api_config['max_concurrency'] = max_concurrency
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='本地模拟LLM服务（OpenAI/ZAI/Gemini兼容），支持故障注入')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help='固定延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='随机附加延迟上限（秒）')
+    parser.add_argument('--tokens-per-second',
+                        type=float,
+                        default=0.0,
+                        help='模拟输出速度（token/秒，0 表示不按输出长度增加延迟）')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--faults', help='故障计划文件（YAML/JSON）')
+    parser.add_argument(
+        '--fault',
+        action='append',
+        help='故障规则，如 "429:0.2,retry_after=2" 或 "5xx:1,requests=100-150,status=502"')
+    parser.add_argument(
+        '--weak-model',
+        action='append',
+        help='以给定概率返回格式错误字段的模型，如 "glm-4.5-air=0.3"，用于测试分级提取')
+
+    args = parser.parse_args()
+    if args.faults:
+        schedule = FaultSchedule.from_file(args.faults)
+    else:
+        schedule = FaultSchedule.from_specs(args.fault or [], args.seed)
+
+    server = MockLLMServer(args.host,
+                           args.port,
+                           args.latency,
+                           args.jitter,
+                           tokens_per_second=args.tokens_per_second,
+                           seed=args.seed,
+                           fault_schedule=schedule,
+                           weak_models={
+                               name: float(rate)
+                               for name, rate in (
+                                   spec.split('=', 1)
+                                   for spec in args.weak_model or [])
+                           })
+    print(f"模拟LLM服务已启动: {server.base_url}")
+    print(f"  OpenAI/ZAI: {server.url_for('openai')}")
+    print(f"  Gemini:     {server.url_for('gemini')}")
+    if schedule.rules:
+        print(f"  故障计划:   {json.dumps(schedule.to_dict(), ensure_ascii=False)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats(), ensure_ascii=False, indent=2))
@@ -0,0 +1,303 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.corpus import build_newsletter_html, generate_corpus
+from benchmarks.mock_llm_server import (MockLLMServer, canned_extraction,
+                                        point_api_configs_at)
+from benchmarks.startup import bench_startup
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True,
+                              text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def _measure(fn: Callable[[], int], repeat: int = 3) -> Dict:
+    timings = []
+    items = 0
+    for _ in range(max(1, repeat)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            items = fn()
+            timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    return {
+        'items': items,
+        'repeat': len(timings),
+        'best_seconds': round(best, 6),
+        'mean_seconds': round(sum(timings) / len(timings), 6),
+        'items_per_second': round(items / best, 2) if best > 0 else None
+    }
+
+
+def bench_iter_eml_files(corpus_dir: str, repeat: int) -> Dict:
+    from main import iter_eml_files
+    return _measure(lambda: sum(1 for _ in iter_eml_files(corpus_dir)),
+                    repeat)
+
+
+def bench_parse_eml_file(paths: List[str], repeat: int) -> Dict:
+    from eml_parser import parse_eml_file
+
+    total_bytes = sum(os.path.getsize(p) for p in paths)
+    results = {}
+    for mode, lazy in (('eager', False), ('lazy', True)):
+
+        def run():
+            for path in paths:
+                parse_eml_file(path, lazy=lazy)
+            return len(paths)
+
+        stats = _measure(run, repeat)
+        stats['mb_per_second'] = round(
+            total_bytes / 1e6 / stats['best_seconds'], 2)
+        results[mode] = stats
+    results['corpus_mb'] = round(total_bytes / 1e6, 2)
+    return results
+
+
+def bench_html_to_text(rows: int, repeat: int) -> Dict:
+    from eml_parser import html_to_text
+
+    html = build_newsletter_html(rows)
+
+    def run():
+        for _ in range(10):
+            html_to_text(html)
+        return 10
+
+    stats = _measure(run, repeat)
+    stats['html_kb'] = round(len(html.encode('utf-8')) / 1024, 1)
+    stats['mb_per_second'] = round(
+        len(html.encode('utf-8')) * 10 / 1e6 / stats['best_seconds'], 2)
+    return stats
+
+
+def bench_extract_batch(paths: List[str], api_name: str, latency: float,
+                        concurrency: int, repeat: int) -> Dict:
+    from eml_parser import parse_eml_file
+    from extractor import extract_training_info_batch
+
+    parsed = [parse_eml_file(p, lazy=True) for p in paths]
+    with MockLLMServer(latency=latency) as server:
+        point_api_configs_at(server, [api_name], concurrency)
+        failures = []
+
+        def run():
+            results = extract_training_info_batch(parsed, api_name)
+            failures.append(sum(1 for r in results if not r.get('training_name')))
+            return len(parsed)
+
+        stats = _measure(run, repeat)
+        stats['requests'] = server.request_count
+    stats.update({
+        'api': api_name,
+        'mock_latency_seconds': latency,
+        'max_concurrency': concurrency,
+        'failed_records': failures[-1] if failures else None
+    })
+    return stats
+
+
+def _fake_results(count: int) -> List[Dict]:
+    rng = random.Random(0)
+    prompt = '\n'.join(f"报告{i}：讲座{i}\n时间：2025年12月{1 + i % 28:02d}日 14:00-16:00\n地点：F512"
+                       for i in range(1, 4))
+    lectures = canned_extraction(prompt)
+    results = []
+    for i in range(count):
+        record = dict(rng.choice(lectures))
+        record['file_name'] = f"notice_{i:06d}.eml"
+        results.append(record)
+    return results
+
+
+def bench_save_outputs(rows: int, work_dir: str, repeat: int) -> Dict:
+    from main import save_to_csv, save_to_excel
+
+    results = _fake_results(rows)
+    xlsx_path = os.path.join(work_dir, 'bench_result.xlsx')
+    csv_path = os.path.join(work_dir, 'bench_result.csv')
+    return {
+        'save_to_excel':
+        _measure(lambda: (save_to_excel(results, xlsx_path), rows)[1],
+                 repeat),
+        'save_to_csv':
+        _measure(lambda: (save_to_csv(results, csv_path), rows)[1], repeat)
+    }
+
+
+def bench_merge_excel(files: int, rows_per_file: int, work_dir: str,
+                      repeat: int) -> Dict:
+    from main import save_to_excel
+    from merge_excel import merge_excel_files
+
+    input_dir = os.path.join(work_dir, 'merge_input')
+    os.makedirs(input_dir, exist_ok=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(files):
+            save_to_excel(_fake_results(rows_per_file),
+                          os.path.join(input_dir, f"result{i:03d}.xlsx"))
+
+    output = os.path.join(work_dir, 'merged.xlsx')
+    stats = _measure(
+        lambda: (merge_excel_files(input_dir, output), files * rows_per_file)[
+            1], repeat)
+    stats['files'] = files
+    return stats
+
+
+def run_benchmarks(emails: int = 300,
+                   attachment_ratio: float = 0.2,
+                   attachment_kb: int = 1024,
+                   latency: float = 0.05,
+                   concurrency: int = 8,
+                   api_name: str = 'zai-plan',
+                   llm_emails: int = 100,
+                   excel_rows: int = 5000,
+                   repeat: int = 3,
+                   corpus_dir: Optional[str] = None,
+                   only: Optional[List[str]] = None) -> Dict:
+    work_dir = tempfile.mkdtemp(prefix='eml_bench_')
+    try:
+        if not corpus_dir:
+            corpus_dir = os.path.join(work_dir, 'corpus')
+            print(f"生成合成语料: {emails} 封邮件...")
+            generate_corpus(corpus_dir,
+                            emails,
+                            attachment_ratio=attachment_ratio,
+                            attachment_bytes=attachment_kb * 1024)
+
+        from main import iter_eml_files
+        paths = list(iter_eml_files(corpus_dir))
+
+        benchmarks = {
+            'iter_eml_files':
+            lambda: bench_iter_eml_files(corpus_dir, repeat),
+            'parse_eml_file':
+            lambda: bench_parse_eml_file(paths, repeat),
+            'html_to_text':
+            lambda: bench_html_to_text(500, repeat),
+            'extract_training_info_batch':
+            lambda: bench_extract_batch(paths[:llm_emails], api_name, latency,
+                                        concurrency, 1),
+            'save_outputs':
+            lambda: bench_save_outputs(excel_rows, work_dir, repeat),
+            'merge_excel_files':
+            lambda: bench_merge_excel(10, excel_rows // 10, work_dir, repeat),
+            'startup':
+            lambda: bench_startup(repeat)
+        }
+
+        results = {}
+        for name, bench in benchmarks.items():
+            if only and name not in only:
+                continue
+            print(f"运行: {name}")
+            results[name] = bench()
+
+        return {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'git_commit': _git_commit(),
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'params': {
+                    'emails': len(paths),
+                    'attachment_ratio': attachment_ratio,
+                    'attachment_kb': attachment_kb,
+                    'mock_latency_seconds': latency,
+                    'max_concurrency': concurrency,
+                    'llm_emails': min(llm_emails, len(paths)),
+                    'excel_rows': excel_rows,
+                    'repeat': repeat
+                }
+            },
+            'results': results
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _flatten(results: Dict, prefix: str = '') -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif key in ('items_per_second', 'mb_per_second',
+                     'median_ms') and value:
+            flat[name] = value
+    return flat
+
+
+def compare_reports(baseline: Dict, current: Dict):
+    old = _flatten(baseline.get('results', {}))
+    new = _flatten(current.get('results', {}))
+
+    print(f"\n对比基线: {baseline.get('meta', {}).get('git_commit', '?')} -> "
+          f"{current.get('meta', {}).get('git_commit', '?')}")
+    for name in sorted(set(old) & set(new)):
+        ratio = new[name] / old[name] if old[name] else 0
+        print(f"  {name:<55} {old[name]:>12.2f} -> {new[name]:>12.2f}  x{ratio:.2f}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='EML提取工具基准测试')
+    parser.add_argument('-o',
+                        '--output',
+                        default='bench_results.json',
+                        help='结果JSON输出路径（默认: bench_results.json）')
+    parser.add_argument('--corpus', help='使用已有语料目录，不生成合成语料')
+    parser.add_argument('--emails', type=int, default=300, help='合成邮件数量')
+    parser.add_argument('--attachment-ratio', type=float, default=0.2)
+    parser.add_argument('--attachment-kb', type=int, default=1024)
+    parser.add_argument('--latency',
+                        type=float,
+                        default=0.05,
+                        help='模拟LLM服务延迟（秒）')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--api', default='zai-plan', help='模拟的API提供商')
+    parser.add_argument('--llm-emails', type=int, default=100)
+    parser.add_argument('--excel-rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', action='append', help='只运行指定基准，可多次指定')
+    parser.add_argument('--compare', help='与之前的结果JSON对比')
+
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.emails, args.attachment_ratio,
+                            args.attachment_kb, args.latency,
+                            args.concurrency, args.api, args.llm_emails,
+                            args.excel_rows, args.repeat, args.corpus,
+                            args.only)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {args.output}")
+    print(json.dumps(report['results'], ensure_ascii=False, indent=2))
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare_reports(json.load(f), report)
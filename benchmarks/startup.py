@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence
+
+from benchmarks.corpus import generate_corpus
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('openpyxl', 'numpy', 'requests', 'multiprocessing', 'pypdf',
+                 'sqlite3', 'ctypes')
+DEFAULT_REPEAT = 5
+
+
+def _run(args: Sequence[str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args],
+                          cwd=REPO_DIR,
+                          capture_output=True,
+                          text=True,
+                          timeout=120)
+
+
+def imported_modules(args: Sequence[str]) -> Dict[str, float]:
+    result = _run(['-X', 'importtime', *args])
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].strip()
+        modules[name] = max(modules.get(name, 0), int(fields[1]) / 1000)
+    return modules
+
+
+def heavy_modules(modules: Dict[str, float]) -> List[str]:
+    return sorted(name for name in HEAVY_MODULES if name in modules)
+
+
+def time_command(args: Sequence[str], repeat: int) -> Dict:
+    _run(args)
+    timings = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = _run(args)
+        timings.append((time.perf_counter() - start) * 1000)
+        if result.returncode:
+            raise RuntimeError(f"命令失败 ({result.returncode}): "
+                               f"{' '.join(args)}\n{result.stderr[-2000:]}")
+    return {
+        'repeat': len(timings),
+        'best_ms': round(min(timings), 1),
+        'median_ms': round(statistics.median(timings), 1)
+    }
+
+
+def scenarios(work_dir: str) -> Dict[str, List[str]]:
+    corpus_dir = os.path.join(work_dir, 'corpus')
+    generate_corpus(corpus_dir, 3, attachment_ratio=0, subdirs=1)
+    missing_config = os.path.join(work_dir, 'missing.yaml')
+    return {
+        'import_main': ['-c', 'import main'],
+        'main_help': ['main.py', '--help'],
+        'dry_run_csv': [
+            'main.py', '-c', missing_config, '-i', corpus_dir, '-o',
+            os.path.join(work_dir, 'result.csv'), '--dry-run'
+        ],
+        'merge_excel_help': ['merge_excel.py', '--help'],
+        'split_by_duplicate_help': ['split_by_duplicate.py', '--help']
+    }
+
+
+def bench_startup(repeat: int = DEFAULT_REPEAT,
+                  only: Optional[Sequence[str]] = None) -> Dict:
+    work_dir = tempfile.mkdtemp(prefix='eml_startup_')
+    try:
+        results = {}
+        for name, args in scenarios(work_dir).items():
+            if only and name not in only:
+                continue
+            modules = imported_modules(args)
+            stats = time_command(args, repeat)
+            stats['modules'] = len(modules)
+            stats['heavy_modules'] = heavy_modules(modules)
+            stats['slowest_imports'] = {
+                module: round(ms, 1)
+                for module, ms in sorted(modules.items(),
+                                         key=lambda item: item[1],
+                                         reverse=True)[:5]
+            }
+            results[name] = stats
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def check_regressions(results: Dict, max_ms: Optional[float] = None) -> List[str]:
+    problems = []
+    for name, stats in results.items():
+        if stats['heavy_modules']:
+            problems.append(f"{name}: 启动时导入了 {', '.join(stats['heavy_modules'])}")
+        if max_ms is not None and stats['median_ms'] > max_ms:
+            problems.append(f"{name}: 中位耗时 {stats['median_ms']}ms 超过 {max_ms}ms")
+    return problems
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='命令行启动耗时与导入模块基准测试')
+    parser.add_argument('--repeat',
+                        type=int,
+                        default=DEFAULT_REPEAT,
+                        help=f'每个场景运行次数（默认: {DEFAULT_REPEAT}）')
+    parser.add_argument('--only', action='append', help='只运行指定场景，可多次指定')
+    parser.add_argument('--max-ms',
+                        type=float,
+                        help='任一场景中位耗时超过该毫秒数时以非零状态退出')
+    parser.add_argument('-o', '--output', help='结果JSON输出路径')
+
+    args = parser.parse_args()
+
+    results = bench_startup(args.repeat, args.only)
+    for name, stats in results.items():
+        print(f"{name:<26} 最快 {stats['best_ms']:>7.1f}ms  中位 "
+              f"{stats['median_ms']:>7.1f}ms  模块 {stats['modules']:>4}  "
+              f"重量级: {', '.join(stats['heavy_modules']) or '无'}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.output}")
+
+    problems = check_regressions(results, args.max_ms)
+    for problem in problems:
+        print(f"回归: {problem}")
+    sys.exit(1 if problems else 0)
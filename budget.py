@@ -0,0 +1,215 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import (API_CONFIGS, PRICE_CURRENCY, PRICE_UNIT_TOKENS,
+                    get_cached_input_price, get_max_concurrency, get_prices)
+from metrics import metrics
+
+DEFAULT_OUTPUT_TOKENS_PER_EMAIL = 300
+DEFAULT_SECONDS_PER_REQUEST = 15.0
+DEFAULT_SOFT_LIMIT = 0.8
+
+BUDGET_OK = 'ok'
+BUDGET_THROTTLE = 'throttle'
+BUDGET_STOP = 'stop'
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    cjk = 0
+    for ch in text:
+        if '　' <= ch <= '鿿' or '＀' <= ch <= '￯':
+            cjk += 1
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def estimate_cost(api_name: str,
+                  prompt_tokens: int,
+                  completion_tokens: int,
+                  cached_tokens: int = 0,
+                  model: Optional[str] = None) -> float:
+    input_price, output_price = get_prices(api_name, model)
+    cached_tokens = min(cached_tokens, prompt_tokens)
+    return ((prompt_tokens - cached_tokens) * input_price +
+            cached_tokens * get_cached_input_price(api_name, model) +
+            completion_tokens * output_price) / PRICE_UNIT_TOKENS
+
+
+def spent_so_far() -> Dict[str, float]:
+    tokens = 0
+    cost = 0.0
+    for (provider, model), usage in metrics.token_usage().items():
+        prompt = usage['prompt_tokens']
+        completion = usage['completion_tokens']
+        tokens += prompt + completion
+        cost += estimate_cost(provider, prompt, completion,
+                              usage['cached_tokens'], model)
+    return {'tokens': tokens, 'cost': cost}
+
+
+class Budget:
+
+    def __init__(self,
+                 max_tokens: Optional[int] = None,
+                 max_cost: Optional[float] = None,
+                 soft_limit: float = DEFAULT_SOFT_LIMIT,
+                 output_tokens_per_email: int = DEFAULT_OUTPUT_TOKENS_PER_EMAIL):
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.soft_limit = soft_limit
+        self.output_tokens_per_email = output_tokens_per_email
+        self._lock = threading.Lock()
+        self._reserved_tokens = 0
+        self._reserved_cost = 0.0
+        self._announced = set()
+
+    @classmethod
+    def from_config(cls, budget_config: Optional[Dict[str, Any]]
+                    ) -> Optional['Budget']:
+        if not budget_config:
+            return None
+        budget = cls(budget_config.get('max_tokens'),
+                     budget_config.get('max_cost'),
+                     budget_config.get('soft_limit', DEFAULT_SOFT_LIMIT),
+                     budget_config.get('output_tokens_per_email',
+                                       DEFAULT_OUTPUT_TOKENS_PER_EMAIL))
+        return budget if budget.enabled else None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_tokens or self.max_cost)
+
+    def estimate(self, api_name: str, prompt: str) -> Dict[str, float]:
+        prompt_tokens = estimate_tokens(prompt)
+        return {
+            'tokens':
+            prompt_tokens + self.output_tokens_per_email,
+            'cost':
+            estimate_cost(api_name, prompt_tokens,
+                          self.output_tokens_per_email)
+        }
+
+    def reserve(self, estimate: Dict[str, float]):
+        with self._lock:
+            self._reserved_tokens += estimate['tokens']
+            self._reserved_cost += estimate['cost']
+
+    def release(self, estimate: Dict[str, float]):
+        with self._lock:
+            self._reserved_tokens -= estimate['tokens']
+            self._reserved_cost -= estimate['cost']
+
+    def usage_ratio(self, spent: Optional[Dict[str, float]] = None) -> float:
+        if spent is None:
+            spent = spent_so_far()
+        with self._lock:
+            tokens = spent['tokens'] + self._reserved_tokens
+            cost = spent['cost'] + self._reserved_cost
+
+        ratios = []
+        if self.max_tokens:
+            ratios.append(tokens / self.max_tokens)
+        if self.max_cost:
+            ratios.append(cost / self.max_cost)
+        return max(ratios) if ratios else 0.0
+
+    def state(self) -> str:
+        spent = spent_so_far()
+        ratio = self.usage_ratio(spent)
+        if ratio >= 1:
+            state = BUDGET_STOP
+        elif self.soft_limit and ratio >= self.soft_limit:
+            state = BUDGET_THROTTLE
+        else:
+            state = BUDGET_OK
+
+        if state != BUDGET_OK and state not in self._announced:
+            self._announced.add(state)
+            metrics.event('budget',
+                          state=state,
+                          tokens=spent['tokens'],
+                          cost=round(spent['cost'], 4))
+            if state == BUDGET_STOP:
+                print(f"\n  预算已用尽（{ratio:.0%}），停止提交新的邮件")
+            else:
+                print(f"\n  预算已使用 {ratio:.0%}，降低并发继续处理")
+        return state
+
+    def describe(self) -> str:
+        parts = []
+        if self.max_tokens:
+            parts.append(f"最多 {self.max_tokens} tokens")
+        if self.max_cost:
+            parts.append(f"最多 {self.max_cost} {PRICE_CURRENCY}")
+        return '，'.join(parts)
+
+
+def load_observed_throughput(metrics_path: Optional[str]) -> Optional[float]:
+    if not metrics_path or not os.path.exists(metrics_path):
+        return None
+    try:
+        with open(metrics_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    emails = sum(c['value'] for c in report.get('counters', [])
+                 if c.get('name') == 'emails_total')
+    wall = report.get('wall_seconds') or 0
+    if emails and wall:
+        return emails / wall
+    return None
+
+
+def estimate_run(prompts: Iterable[Dict[str, Any]],
+                 api_name: str,
+                 output_tokens_per_email: int = DEFAULT_OUTPUT_TOKENS_PER_EMAIL,
+                 observed_throughput: Optional[float] = None,
+                 seconds_per_request: float = DEFAULT_SECONDS_PER_REQUEST
+                 ) -> Dict[str, Any]:
+    rows: List[Dict[str, Any]] = []
+    for item in prompts:
+        prompt_tokens = estimate_tokens(item['prompt'])
+        rows.append({
+            'file_name': item.get('file_name', ''),
+            'prompt_tokens': prompt_tokens,
+            'cost': estimate_cost(api_name, prompt_tokens,
+                                  output_tokens_per_email)
+        })
+
+    emails = len(rows)
+    prompt_tokens = sum(r['prompt_tokens'] for r in rows)
+    completion_tokens = emails * output_tokens_per_email
+    concurrency = get_max_concurrency(api_name)
+
+    if observed_throughput:
+        duration = emails / observed_throughput
+        duration_basis = 'observed'
+    else:
+        duration = emails * seconds_per_request / max(1, concurrency)
+        duration_basis = 'assumed'
+
+    ordered = sorted(r['prompt_tokens'] for r in rows)
+    return {
+        'api': api_name,
+        'model': API_CONFIGS.get(api_name, {}).get('model'),
+        'emails': emails,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'prompt_tokens_per_email': {
+            'min': ordered[0] if ordered else 0,
+            'mean': round(prompt_tokens / emails, 1) if emails else 0,
+            'max': ordered[-1] if ordered else 0
+        },
+        'cost': round(
+            estimate_cost(api_name, prompt_tokens, completion_tokens), 4),
+        'currency': PRICE_CURRENCY,
+        'duration_seconds': round(duration, 1),
+        'duration_basis': duration_basis,
+        'max_concurrency': concurrency,
+        'largest': sorted(rows, key=lambda r: r['prompt_tokens'],
+                          reverse=True)[:5]
+    }
@@ -0,0 +1,348 @@
+import random
+import time
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import yaml
+
+from budget import Budget, spent_so_far
+from config import API_CONFIGS, get_max_concurrency
+from extractor import BUDGET_EXHAUSTED_ERROR, extract_training_info_batch
+from lecture_index import lecture_key
+from live_config import set_max_concurrency
+from metrics import metrics
+
+DEFAULT_SAMPLE_SIZE = 30
+DEFAULT_LEVELS = (1, 2, 4, 8)
+SIZE_BUCKETS = (1000, 4000, 16000)
+MAX_ERROR_RATE = 0.05
+THROUGHPUT_MARGIN = 0.1
+AGREEMENT_MARGIN = 0.1
+
+Candidate = Tuple[str, str]
+
+
+def stratum(email_data: Dict) -> Tuple[int, str]:
+    size = len(email_data.get('body') or '')
+    return bisect_right(SIZE_BUCKETS, size), email_data.get('charset',
+                                                            'unknown')
+
+
+def stratified_sample(records: Iterable[Dict],
+                      size: int = DEFAULT_SAMPLE_SIZE,
+                      seed: int = 0) -> Tuple[List[Dict], Dict[Tuple, int]]:
+    rng = random.Random(seed)
+    reservoirs: Dict[Tuple, List[Dict]] = {}
+    counts: Dict[Tuple, int] = {}
+
+    for record in records:
+        if record.get('error'):
+            continue
+        key = stratum(record)
+        seen = counts[key] = counts.get(key, 0) + 1
+        reservoir = reservoirs.setdefault(key, [])
+        if len(reservoir) < size:
+            reservoir.append(record)
+        else:
+            slot = rng.randrange(seen)
+            if slot < size:
+                reservoir[slot] = record
+
+    total = sum(counts.values())
+    if not total:
+        return [], counts
+
+    quotas = {key: size * count / total for key, count in counts.items()}
+    allocated = {
+        key: min(len(reservoirs[key]), max(1, int(quota)))
+        for key, quota in quotas.items()
+    }
+    remaining = size - sum(allocated.values())
+    for key in sorted(quotas,
+                      key=lambda k: quotas[k] - int(quotas[k]),
+                      reverse=True):
+        if remaining <= 0:
+            break
+        if allocated[key] < len(reservoirs[key]):
+            allocated[key] += 1
+            remaining -= 1
+
+    sample = []
+    for key in sorted(allocated):
+        sample.extend(rng.sample(reservoirs[key], allocated[key]))
+    return sample, counts
+
+
+def describe_stratum(key: Tuple[int, str]) -> str:
+    bucket, charset = key
+    low = SIZE_BUCKETS[bucket - 1] if bucket else 0
+    high = SIZE_BUCKETS[bucket] if bucket < len(SIZE_BUCKETS) else None
+    size = f"{low}-{high}" if high else f">{low}"
+    return f"{size}字符/{charset}"
+
+
+def candidates(apis: Optional[Sequence[str]] = None) -> List[Candidate]:
+    result = []
+    for api_name, api_config in API_CONFIGS.items():
+        if apis and api_name not in apis:
+            continue
+        if not api_config.get('api_key'):
+            continue
+        for model in dict.fromkeys(
+            (api_config['model'], api_config.get('fast_model'))):
+            if model:
+                result.append((api_name, model))
+    return result
+
+
+def _email_id(record: Dict) -> Tuple[str, str]:
+    return record.get('file_path', ''), record.get('file_name', '')
+
+
+def _histogram(name: str, **labels) -> Dict[str, Any]:
+    for histogram in metrics.snapshot()['histograms']:
+        if histogram['name'] == name and all(
+                histogram['labels'].get(k) == v for k, v in labels.items()):
+            return histogram
+    return {}
+
+
+def run_trial(sample: List[Dict],
+              api_name: str,
+              model: str,
+              level: int,
+              budget: Optional[Budget] = None) -> Dict[str, Any]:
+    original_model = API_CONFIGS[api_name]['model']
+    original_limit = get_max_concurrency(api_name)
+    API_CONFIGS[api_name]['model'] = model
+    set_max_concurrency(api_name, level)
+    metrics.reset()
+    start = time.perf_counter()
+    try:
+        results = extract_training_info_batch(sample, api_name, budget=budget)
+    finally:
+        API_CONFIGS[api_name]['model'] = original_model
+        set_max_concurrency(api_name, original_limit)
+    wall = time.perf_counter() - start
+    spent = spent_so_far()
+
+    keys: Dict[Tuple[str, str], Set[str]] = {
+        _email_id(record): set()
+        for record in sample
+    }
+    succeeded = set()
+    for lecture in results:
+        email = _email_id(lecture)
+        key = lecture_key(lecture)
+        if key is not None:
+            keys.setdefault(email, set()).add(key)
+            succeeded.add(email)
+
+    latency = _histogram('llm_request_seconds', provider=api_name, model=model)
+    emails = len(sample)
+    return {
+        'api': api_name,
+        'model': model,
+        'max_concurrency': level,
+        'emails': emails,
+        'wall_seconds': round(wall, 3),
+        'emails_per_second': round(emails / wall, 3) if wall else None,
+        'p50': latency.get('p50'),
+        'p95': latency.get('p95'),
+        'error_rate': round(1 - len(succeeded) / emails, 3) if emails else 0,
+        'rate_limited': int(metrics.counter_value('llm_rate_limited_total')),
+        'retries': int(metrics.counter_value('llm_retries_total')),
+        'tokens': spent['tokens'],
+        'cost': round(spent['cost'], 6),
+        'budget_exhausted': any(
+            lecture.get('error') == BUDGET_EXHAUSTED_ERROR
+            for lecture in results),
+        'keys': keys
+    }
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def agreement_scores(trials: List[Dict[str, Any]]) -> Dict[Candidate, float]:
+    reference: Dict[Candidate, Dict] = {}
+    for trial in sorted(trials, key=lambda t: t['max_concurrency']):
+        reference.setdefault((trial['api'], trial['model']), trial['keys'])
+    if not reference:
+        return {}
+
+    if len(reference) == 1:
+        candidate, keys = next(iter(reference.items()))
+        repeats = [t['keys'] for t in trials if t['keys'] is not keys]
+        if not repeats:
+            return {candidate: 1.0}
+        scores = [
+            _jaccard(keys[email], other.get(email, set()))
+            for other in repeats for email in keys
+        ]
+        return {candidate: round(sum(scores) / len(scores), 3)}
+
+    emails = set()
+    for keys in reference.values():
+        emails.update(keys)
+    consensus = {}
+    for email in emails:
+        votes: Dict[str, int] = {}
+        for keys in reference.values():
+            for key in keys.get(email, ()):
+                votes[key] = votes.get(key, 0) + 1
+        consensus[email] = {
+            key
+            for key, count in votes.items() if count * 2 >= len(reference)
+        }
+
+    return {
+        candidate: round(
+            sum(
+                _jaccard(keys.get(email, set()), consensus[email])
+                for email in emails) / len(emails), 3)
+        for candidate, keys in reference.items()
+    }
+
+
+def _best_level(trials: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    best = None
+    for trial in sorted(trials, key=lambda t: t['max_concurrency']):
+        if trial['error_rate'] > MAX_ERROR_RATE or trial['rate_limited']:
+            continue
+        if best is None or (trial['emails_per_second'] or 0) > (
+                best['emails_per_second'] or 0) * (1 + THROUGHPUT_MARGIN):
+            best = trial
+    return best
+
+
+def recommend(trials: List[Dict[str, Any]],
+              agreement: Dict[Candidate, float]) -> Optional[Dict[str, Any]]:
+    by_candidate: Dict[Candidate, List[Dict[str, Any]]] = {}
+    for trial in trials:
+        by_candidate.setdefault((trial['api'], trial['model']),
+                                []).append(trial)
+
+    best = {
+        candidate: level
+        for candidate, level in ((c, _best_level(t))
+                                 for c, t in by_candidate.items())
+        if level is not None
+    }
+    if not best:
+        return None
+
+    top = max(agreement.get(c, 0) for c in best)
+    qualified = [
+        c for c in best if agreement.get(c, 0) >= top - AGREEMENT_MARGIN
+    ]
+    fastest = max(best[c]['emails_per_second'] or 0 for c in qualified)
+    fast_enough = [
+        c for c in qualified if (best[c]['emails_per_second'] or 0) *
+        (1 + THROUGHPUT_MARGIN) >= fastest
+    ]
+    choice = min(fast_enough,
+                 key=lambda c: (best[c]['cost'],
+                                -(best[c]['emails_per_second'] or 0)))
+    return dict(best[choice], agreement=agreement.get(choice))
+
+
+def _remaining_budget(budget: Optional[Budget], trials: List[Dict[str, Any]]):
+    if budget is None:
+        return None
+    tokens = sum(t['tokens'] for t in trials)
+    cost = sum(t['cost'] for t in trials)
+    remaining = Budget(
+        budget.max_tokens - tokens if budget.max_tokens else None,
+        budget.max_cost - cost if budget.max_cost else None, 0,
+        budget.output_tokens_per_email)
+    if (remaining.max_tokens is not None and remaining.max_tokens <= 0) or (
+            remaining.max_cost is not None and remaining.max_cost <= 0):
+        print("\n预算已用尽，停止校准")
+        return False
+    return remaining
+
+
+def calibrate(records: Iterable[Dict],
+              sample_size: int = DEFAULT_SAMPLE_SIZE,
+              levels: Sequence[int] = DEFAULT_LEVELS,
+              apis: Optional[Sequence[str]] = None,
+              budget: Optional[Budget] = None,
+              seed: int = 0) -> Dict[str, Any]:
+    sample, strata = stratified_sample(records, sample_size, seed)
+    print(f"抽样 {len(sample)} 封邮件（共 {sum(strata.values())} 封，"
+          f"{len(strata)} 个分层）:")
+    for key in sorted(strata):
+        taken = sum(1 for record in sample if stratum(record) == key)
+        print(f"  {describe_stratum(key):<24} {strata[key]:>8} 封，抽取 {taken}")
+
+    trials = []
+    exhausted = False
+    for api_name, model in candidates(apis):
+        for level in sorted(set(levels)):
+            remaining = _remaining_budget(budget, trials)
+            if remaining is False:
+                exhausted = True
+                break
+            print(f"\n[{api_name} / {model}] 并发 {level} ...")
+            trial = run_trial(sample, api_name, model, level, remaining)
+            if trial['budget_exhausted']:
+                print("  预算在本轮中用尽，结果不完整，停止校准")
+                exhausted = True
+                break
+            trials.append(trial)
+            print(f"  {trial['emails_per_second'] or 0:.2f} 封/秒，"
+                  f"p50 {trial['p50']}s，p95 {trial['p95']}s，"
+                  f"失败率 {trial['error_rate']:.0%}，429 {trial['rate_limited']} 次")
+            if trial['error_rate'] >= 1:
+                print("  全部失败，跳过该模型")
+                break
+            if trial['rate_limited'] or trial['error_rate'] > MAX_ERROR_RATE:
+                print("  出现限流或失败，不再尝试更高并发")
+                break
+        if exhausted:
+            break
+
+    agreement = agreement_scores(trials)
+    return {
+        'sample': len(sample),
+        'strata': {
+            describe_stratum(key): count
+            for key, count in sorted(strata.items())
+        },
+        'trials': [{k: v
+                    for k, v in trial.items() if k != 'keys'}
+                   for trial in trials],
+        'agreement': {
+            f"{api_name}/{model}": score
+            for (api_name, model), score in agreement.items()
+        },
+        'recommendation': {
+            k: v
+            for k, v in (recommend(trials, agreement) or {}).items()
+            if k != 'keys'
+        } or None
+    }
+
+
+def write_recommended_config(path: str, base_config: Dict[str, Any],
+                             report: Dict[str, Any]):
+    choice = report['recommendation']
+    config = dict(base_config)
+    config.update({
+        'api_provider': choice['api'],
+        'model': choice['model'],
+        'max_concurrency': choice['max_concurrency']
+    })
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"# 由 main.py --calibrate 生成（{datetime.now():%Y-%m-%d %H:%M}），"
+                f"抽样 {report['sample']} 封邮件\n")
+        f.write(f"# {choice['api']}/{choice['model']} 并发 "
+                f"{choice['max_concurrency']}: {choice['emails_per_second']} 封/秒，"
+                f"p95 {choice['p95']}s，失败率 {choice['error_rate']:.0%}，"
+                f"一致性 {choice['agreement']}\n")
+        yaml.safe_dump(config, f, allow_unicode=True, sort_keys=False)
@@ -0,0 +1,152 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Sequence
+
+CHUNK_THRESHOLD_CHARS = 6000
+CHUNK_CHARS = 3000
+CHUNK_OVERLAP_CHARS = 300
+
+_HEADING_RE = re.compile(
+    r'^\s*(?:(?:报告|讲座|专题|Talk|Lecture|Seminar)\s*\d+\s*[:：]|'
+    r'第\s*[一二三四五六七八九十百\d]+\s*[讲场期个]|'
+    r'[一二三四五六七八九十]+\s*[、.．]|'
+    r'\d{1,2}\s*[、．)）]|\d{1,2}\.\s|[（(]\s*\d{1,2}\s*[)）]|【|'
+    r'(?:报告|讲座)?(?:题目|主题)\s*[:：]|(?:Title|Topic)\s*[:：])',
+    re.IGNORECASE)
+_DATE_RE = re.compile(
+    r'^\s*(?:\d{4}\s*[-/.年]\s*\d{1,2}\s*[-/.月]\s*\d{1,2}|'
+    r'\d{1,2}\s*月\s*\d{1,2}\s*日|(?:时间|日期|Date|Time)\s*[:：])',
+    re.IGNORECASE)
+_BLANK_RE = re.compile(r'\n[ \t]*\n')
+_NAME_STRIP_RE = re.compile(r'[\W_]+')
+
+
+def _line_starts(text: str) -> List[int]:
+    starts = [0]
+    position = text.find('\n')
+    while position != -1:
+        starts.append(position + 1)
+        position = text.find('\n', position + 1)
+    return starts
+
+
+def _boundaries(text: str, starts: Sequence[int]) -> List[List[int]]:
+    headings, dates = [], []
+    for offset in starts:
+        end = text.find('\n', offset)
+        line = text[offset:end if end != -1 else len(text)]
+        if _HEADING_RE.match(line):
+            headings.append(offset)
+        elif _DATE_RE.match(line):
+            dates.append(offset)
+    paragraphs = [match.end() for match in _BLANK_RE.finditer(text)]
+    return [headings, dates, paragraphs, list(starts)]
+
+
+def _last_in(offsets: Sequence[int], low: int, high: int) -> Optional[int]:
+    index = bisect_right(offsets, high) - 1
+    if index >= 0 and offsets[index] > low:
+        return offsets[index]
+    return None
+
+
+def _first_in(offsets: Sequence[int], low: int, high: int) -> Optional[int]:
+    index = bisect_left(offsets, low)
+    if index < len(offsets) and offsets[index] < high:
+        return offsets[index]
+    return None
+
+
+def split_body(body: str,
+               max_chars: int = CHUNK_CHARS,
+               overlap: int = CHUNK_OVERLAP_CHARS) -> List[str]:
+    if len(body) <= max_chars:
+        return [body]
+
+    starts = _line_starts(body)
+    tiers = _boundaries(body, starts)
+
+    chunks = []
+    start = 0
+    while len(body) - start > max_chars:
+        limit = start + max_chars
+        cut = None
+        for offsets in tiers:
+            cut = _last_in(offsets, start + max_chars // 2, limit)
+            if cut is not None:
+                break
+        if cut is None:
+            cut = limit
+        chunks.append(body[start:cut])
+
+        next_start = None
+        for offsets in tiers:
+            next_start = _first_in(offsets, max(start + 1, cut - overlap),
+                                   cut)
+            if next_start is not None:
+                break
+        start = cut if next_start is None else next_start
+    chunks.append(body[start:])
+    return chunks
+
+
+def split_email(email_data: Dict,
+                threshold: int = CHUNK_THRESHOLD_CHARS,
+                max_chars: int = CHUNK_CHARS,
+                overlap: int = CHUNK_OVERLAP_CHARS) -> List[Dict]:
+    body = email_data.get('body') or ''
+    if len(body) <= threshold:
+        return [email_data]
+
+    chunks = split_body(body, max_chars, overlap)
+    if len(chunks) == 1:
+        return [email_data]
+    result = []
+    for i, chunk in enumerate(chunks, start=1):
+        chunk_data = dict(email_data, body=chunk, chunk=f"{i}/{len(chunks)}")
+        if i > 1:
+            chunk_data.pop('attachment_text', None)
+        result.append(chunk_data)
+    return result
+
+
+def name_key(lecture: Dict) -> str:
+    name = lecture.get('training_name')
+    if not isinstance(name, str):
+        return ''
+    return _NAME_STRIP_RE.sub('', name.casefold())
+
+
+def _empty(value) -> bool:
+    return value is None or value == ''
+
+
+def merge_chunk_lectures(parts: Sequence[List[Dict]]) -> List[Dict]:
+    merged: List[Dict] = []
+    by_name: Dict[str, List[Dict]] = {}
+    errors: List[Dict] = []
+
+    for lectures in parts:
+        for lecture in lectures:
+            key = name_key(lecture)
+            if not key:
+                if lecture.get('error'):
+                    errors.append(lecture)
+                else:
+                    merged.append(lecture)
+                continue
+
+            for existing in by_name.setdefault(key, []):
+                a, b = existing.get('start_time'), lecture.get('start_time')
+                if _empty(a) or _empty(b) or a == b:
+                    for field, value in lecture.items():
+                        if _empty(existing.get(field)) and not _empty(value):
+                            existing[field] = value
+                    break
+            else:
+                by_name[key].append(lecture)
+                merged.append(lecture)
+
+    if not merged:
+        return errors[:1]
+    return merged + errors
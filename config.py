@@ -1,13 +1,31 @@
 import os
-from dotenv import load_dotenv
+from typing import Optional
 
-load_dotenv()
 
-ZAI_PLAN_API_URL = "https://open.bigmodel.cn/api/coding/paas/v4"
-ZAI_API_URL = "https://open.bigmodel.cn/api/paas/v4/"
-OPENAI_API_URL = "https://api.openai.com/v1"
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1"
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta"
+def find_env_file() -> Optional[str]:
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, '.env')
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+ENV_FILE = find_env_file()
+if ENV_FILE:
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
+
+ZAI_PLAN_API_URL = os.getenv("ZAI_PLAN_API_URL",
+                             "https://open.bigmodel.cn/api/coding/paas/v4")
+ZAI_API_URL = os.getenv("ZAI_API_URL", "https://open.bigmodel.cn/api/paas/v4/")
+OPENAI_API_URL = os.getenv("OPENAI_API_URL", "https://api.openai.com/v1")
+DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1")
+GEMINI_API_URL = os.getenv("GEMINI_API_URL",
+                           "https://generativelanguage.googleapis.com/v1beta")
 
 ZAI_API_KEY = os.getenv("ZAI_API_KEY", "")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
@@ -20,35 +38,54 @@ API_CONFIGS = {
         "api_key": ZAI_API_KEY,
         "model": "glm-4.5",
         "type": "zai",
-        "max_concurrency": 5
+        "max_concurrency": 5,
+        "fast_model": "glm-4.5-air",
+        "input_price": 0.0,
+        "output_price": 0.0,
+        "cached_input_price": 0.0
     },
     "zai": {
         "url": ZAI_API_URL,
         "api_key": ZAI_API_KEY,
         "model": "glm-4.5",
         "type": "zai",
-        "max_concurrency": 5
+        "max_concurrency": 5,
+        "fast_model": "glm-4.5-air",
+        "input_price": 0.6,
+        "output_price": 2.2,
+        "cached_input_price": 0.11
     },
     "openai": {
         "url": OPENAI_API_URL,
         "api_key": OPENAI_API_KEY,
         "model": "gpt-4o",
         "type": "openai",
-        "max_concurrency": 5
+        "max_concurrency": 5,
+        "fast_model": "gpt-4o-mini",
+        "input_price": 2.5,
+        "output_price": 10.0,
+        "cached_input_price": 1.25
     },
     "deepseek": {
         "url": DEEPSEEK_API_URL,
         "api_key": DEEPSEEK_API_KEY,
         "model": "deepseek-chat",
         "type": "openai",
-        "max_concurrency": 5
+        "max_concurrency": 5,
+        "input_price": 0.28,
+        "output_price": 0.42,
+        "cached_input_price": 0.028
     },
     "gemini": {
         "url": GEMINI_API_URL,
         "api_key": GEMINI_API_KEY,
         "model": "gemini-3-flash",
         "type": "gemini",
-        "max_concurrency": 5
+        "max_concurrency": 5,
+        "fast_model": "gemini-2.5-flash-lite",
+        "input_price": 0.3,
+        "output_price": 2.5,
+        "cached_input_price": 0.03
     }
 }
 
@@ -60,6 +97,27 @@ REQUEST_TIMEOUT = 120
 
 DEFAULT_MAX_CONCURRENCY = 3
 
+MODEL_PRICES = {
+    "glm-4.5-air": {
+        "input_price": 0.2,
+        "output_price": 1.1,
+        "cached_input_price": 0.03
+    },
+    "gpt-4o-mini": {
+        "input_price": 0.15,
+        "output_price": 0.6,
+        "cached_input_price": 0.075
+    },
+    "gemini-2.5-flash-lite": {
+        "input_price": 0.1,
+        "output_price": 0.4,
+        "cached_input_price": 0.01
+    }
+}
+
+PRICE_UNIT_TOKENS = 1000000
+PRICE_CURRENCY = "USD"
+
 
 def get_available_apis():
     return list(API_CONFIGS.keys())
@@ -70,3 +128,29 @@ def get_max_concurrency(api_name: str) -> int:
         return API_CONFIGS[api_name].get("max_concurrency",
                                          DEFAULT_MAX_CONCURRENCY)
     return DEFAULT_MAX_CONCURRENCY
+
+
+def _price_config(api_name: str, model: Optional[str] = None) -> dict:
+    api_config = API_CONFIGS.get(api_name, {})
+    if model and model != api_config.get("model") and model in MODEL_PRICES:
+        if api_config.get("input_price") == 0 and api_config.get(
+                "output_price") == 0:
+            return api_config
+        return MODEL_PRICES[model]
+    return api_config
+
+
+def get_prices(api_name: str, model: Optional[str] = None) -> tuple:
+    price_config = _price_config(api_name, model)
+    return (price_config.get("input_price", 0.0),
+            price_config.get("output_price", 0.0))
+
+
+def get_cached_input_price(api_name: str, model: Optional[str] = None) -> float:
+    price_config = _price_config(api_name, model)
+    return price_config.get("cached_input_price",
+                            price_config.get("input_price", 0.0))
+
+
+def get_fast_model(api_name: str) -> Optional[str]:
+    return API_CONFIGS.get(api_name, {}).get("fast_model")
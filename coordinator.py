@@ -0,0 +1,194 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from dotenv import dotenv_values
+
+from attachments import default_cache_path
+from config import get_available_apis
+from config_loader import ConfigLoader
+from lecture_index import default_index_path
+from main import load_jsonl, print_summary, save_results
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'main.py')
+
+
+def part_path(work_dir: str, index: int, count: int) -> str:
+    return os.path.join(work_dir, f"part-{index:03d}-of-{count:03d}.jsonl")
+
+
+def worker_command(index: int,
+                   count: int,
+                   input_path: str,
+                   part: str,
+                   config_path: str,
+                   api: Optional[str] = None,
+                   extra_args: Optional[List[str]] = None,
+                   output_file: Optional[str] = None) -> List[str]:
+    part_base = os.path.splitext(part)[0]
+    command = [
+        sys.executable, MAIN_SCRIPT, '-c', config_path, '-i', input_path,
+        '-o', part, '--shard', f"{index}/{count}", '--metrics-json',
+        f"{part_base}.metrics.json", '--metrics-prom', f"{part_base}.prom"
+    ]
+    if output_file:
+        command += ['--index-label', os.path.basename(output_file)]
+        if not _configured(config_path, 'lecture_index'):
+            command += ['--lecture-index', default_index_path(output_file)]
+        if not _configured(config_path, 'attachment_cache'):
+            command += ['--attachment-cache', default_cache_path(output_file)]
+    if api:
+        command += ['--api', api]
+    return command + list(extra_args or [])
+
+
+def _configured(config_path: str, key: str) -> bool:
+    return os.path.exists(config_path) and bool(
+        ConfigLoader(config_path).get(key))
+
+
+def worker_env(env_file: Optional[str]) -> Dict[str, str]:
+    env = dict(os.environ)
+    if env_file:
+        env.update({k: v for k, v in dotenv_values(env_file).items() if v})
+    return env
+
+
+def merge_parts(parts: List[str]) -> List[dict]:
+    results = []
+    for part in parts:
+        if os.path.exists(part):
+            results.extend(load_jsonl(part))
+    results.sort(key=lambda r: r['seq']
+                 if r.get('seq') is not None else float('inf'))
+    return results
+
+
+def run_shards(input_path: str,
+               output_file: str,
+               count: int,
+               config_path: str = 'config.yaml',
+               apis: Optional[List[str]] = None,
+               env_files: Optional[List[str]] = None,
+               work_dir: Optional[str] = None,
+               extra_args: Optional[List[str]] = None) -> bool:
+    work_dir = work_dir or f"{os.path.splitext(output_file)[0]}.shards"
+    os.makedirs(work_dir, exist_ok=True)
+
+    workers = []
+    for index in range(count):
+        part = part_path(work_dir, index, count)
+        if os.path.exists(part):
+            os.remove(part)
+        api = apis[index % len(apis)] if apis else None
+        env_file = env_files[index % len(env_files)] if env_files else None
+        log_path = os.path.join(work_dir, f"shard-{index:03d}.log")
+        log = open(log_path, 'w', encoding='utf-8')
+        process = subprocess.Popen(worker_command(index, count, input_path,
+                                                  part, config_path, api,
+                                                  extra_args, output_file),
+                                   stdout=log,
+                                   stderr=subprocess.STDOUT,
+                                   env=worker_env(env_file))
+        workers.append({
+            'index': index,
+            'part': part,
+            'log': log,
+            'log_path': log_path,
+            'process': process,
+            'started': time.monotonic()
+        })
+        print(f"  分片 {index}/{count} 已启动 (pid {process.pid}"
+              f"{'，API ' + api if api else ''}"
+              f"{'，' + env_file if env_file else ''})，日志: {log_path}")
+
+    failed = []
+    running = list(workers)
+    while running:
+        time.sleep(0.5)
+        for worker in list(running):
+            code = worker['process'].poll()
+            if code is None:
+                continue
+            running.remove(worker)
+            worker['log'].close()
+            elapsed = time.monotonic() - worker['started']
+            if code == 0:
+                print(f"  分片 {worker['index']}/{count} 完成，用时 {elapsed:.1f} 秒")
+            else:
+                failed.append(worker)
+                print(f"  分片 {worker['index']}/{count} 失败（退出码 {code}），"
+                      f"详见 {worker['log_path']}")
+
+    if failed:
+        print(f"\n错误: {len(failed)} 个分片失败，未生成合并结果；修复后可重新运行")
+        return False
+
+    results = merge_parts([w['part'] for w in workers])
+    save_results(results, output_file)
+    print_summary(results)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='启动多个分片进程并行处理，并按发现顺序合并结果',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python coordinator.py -n 4 -i messages_package -o output/result.xlsx
+  python coordinator.py -n 2 --api zai-plan --api deepseek -o output/result.csv
+  python coordinator.py -n 2 --env-file .env.a --env-file .env.b -- --lazy-parse
+        """)
+    parser.add_argument('-n',
+                        '--shards',
+                        type=int,
+                        required=True,
+                        help='分片（工作进程）数')
+    parser.add_argument('-c',
+                        '--config',
+                        default='config.yaml',
+                        help='配置文件路径（默认: config.yaml）')
+    parser.add_argument('-i', '--input', help='输入路径（覆盖配置文件）')
+    parser.add_argument('-o', '--output', help='合并后的输出文件（覆盖配置文件）')
+    parser.add_argument('--api',
+                        action='append',
+                        choices=get_available_apis(),
+                        help='各分片使用的API提供商，可多次指定，按分片轮流分配')
+    parser.add_argument('--env-file',
+                        action='append',
+                        help='各分片使用的 .env 文件（如不同的API密钥），可多次指定，按分片轮流分配')
+    parser.add_argument('--work-dir', help='分片输出和日志目录（默认: <输出文件名>.shards）')
+    parser.add_argument('extra',
+                        nargs=argparse.REMAINDER,
+                        help='"--" 之后的参数原样传给每个 main.py 进程')
+    args = parser.parse_args()
+
+    input_path = args.input
+    output_file = args.output
+    if os.path.exists(args.config):
+        config_loader = ConfigLoader(args.config)
+        input_path = input_path or config_loader.get_input_dir()
+        output_file = output_file or config_loader.get_output_file()
+
+    if not input_path or not output_file:
+        print("错误: 未指定输入路径或输出文件，请通过 -i/-o 参数或配置文件指定")
+        sys.exit(1)
+    if args.shards < 1:
+        print("错误: 分片数必须大于 0")
+        sys.exit(1)
+
+    extra = args.extra[1:] if args.extra[:1] == ['--'] else args.extra
+
+    print(f"启动 {args.shards} 个分片处理 {input_path}")
+    ok = run_shards(input_path, output_file, args.shards, args.config,
+                    args.api, args.env_file, args.work_dir, extra)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
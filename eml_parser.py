@@ -1,10 +1,35 @@
 import email
+import io
 import os
+from email.feedparser import BytesFeedParser
 from email.header import decode_header
 from email.message import Message
-from typing import Dict, Optional
+from email.parser import BytesHeaderParser
+from email.policy import compat32
+from html import unescape
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional
 import re
 
+DEFAULT_MAX_PAYLOAD_BYTES = 256 * 1024
+DEFAULT_MAX_ATTACHMENT_BYTES = 10 * 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+ATTACHMENT_SUFFIXES = {'.pdf': 'pdf', '.docx': 'docx', '.xlsx': 'xlsx'}
+ATTACHMENT_CONTENT_TYPES = {
+    'application/pdf': 'pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
+    'docx',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'xlsx'
+}
+
+_TIME_RE = re.compile(
+    r'\d{1,2}\s*[:：]\s*\d{2}|\d{1,2}\s*[点時时]|[上下]午|晚上'
+    r'|\d{1,2}\s*(?:am|pm)\b', re.IGNORECASE)
+_PLACE_RE = re.compile(
+    r'地点|地址|会议室|报告厅|讲堂|教室|礼堂|线上|腾讯会议|zoom|会议号'
+    r'|(?<![A-Za-z0-9])[A-F]\d{2,4}(?!\d)|venue|location|room(?![a-z])',
+    re.IGNORECASE)
+
 
 def decode_header_value(header_value: str) -> str:
     if not header_value:
@@ -26,109 +51,485 @@ def decode_header_value(header_value: str) -> str:
     return "".join(decoded_parts)
 
 
+def _is_body_part(part: Message) -> bool:
+    return "attachment" not in str(part.get("Content-Disposition", ""))
+
+
+def _decode_part(part: Message) -> Optional[str]:
+    payload = part.get_payload(decode=True)
+    if not payload:
+        return None
+
+    charset = part.get_content_charset() or 'utf-8'
+    try:
+        return payload.decode(charset)
+    except (UnicodeDecodeError, LookupError):
+        return payload.decode('utf-8', errors='ignore')
+
+
+def attachment_kind(part: Message) -> Optional[str]:
+    filename = decode_header_value(part.get_filename() or '')
+    suffix = os.path.splitext(filename)[1].lower()
+    return ATTACHMENT_SUFFIXES.get(suffix) or ATTACHMENT_CONTENT_TYPES.get(
+        part.get_content_type())
+
+
+def get_attachments(message: Message) -> List[Dict]:
+    attachments = []
+    for part in message.walk():
+        if part.is_multipart():
+            continue
+        kind = attachment_kind(part)
+        if kind is None:
+            continue
+        data = part.get_payload(decode=True)
+        if not data:
+            continue
+        name = decode_header_value(part.get_filename() or '')
+        attachments.append({
+            'name': name or f"附件.{kind}",
+            'kind': kind,
+            'data': data
+        })
+    return attachments
+
+
+def has_schedule_details(text: Optional[str]) -> bool:
+    if not text:
+        return False
+    return _TIME_RE.search(text) is not None and _PLACE_RE.search(
+        text) is not None
+
+
+def get_body_charset(message: Message) -> str:
+    for part in message.walk():
+        if part.get_content_maintype() == 'text' and _is_body_part(part):
+            return (part.get_content_charset() or 'unknown').lower()
+    return 'unknown'
+
+
 def get_email_body(message: Message) -> Optional[str]:
-    body = None
-
-    if message.is_multipart():
-        for part in message.walk():
-            content_type = part.get_content_type()
-            content_disposition = str(part.get("Content-Disposition", ""))
-
-            if content_type == "text/plain" and "attachment" not in content_disposition:
-                charset = part.get_content_charset() or 'utf-8'
-                payload = part.get_payload(decode=True)
-                if payload:
-                    try:
-                        body = payload.decode(charset)
-                        break
-                    except (UnicodeDecodeError, LookupError):
-                        try:
-                            body = payload.decode('utf-8', errors='ignore')
-                            break
-                        except:
-                            pass
-
-        if body is None:
-            for part in message.walk():
-                content_type = part.get_content_type()
-                content_disposition = str(part.get("Content-Disposition", ""))
-
-                if content_type == "text/html" and "attachment" not in content_disposition:
-                    charset = part.get_content_charset() or 'utf-8'
-                    payload = part.get_payload(decode=True)
-                    if payload:
-                        try:
-                            html_body = payload.decode(charset)
-                            body = html_to_text(html_body)
-                            break
-                        except (UnicodeDecodeError, LookupError):
-                            try:
-                                html_body = payload.decode('utf-8',
-                                                           errors='ignore')
-                                body = html_to_text(html_body)
-                                break
-                            except:
-                                pass
-    else:
-        content_type = message.get_content_type()
-        payload = message.get_payload(decode=True)
-
-        if payload:
-            charset = message.get_content_charset() or 'utf-8'
-            try:
-                body = payload.decode(charset)
-            except (UnicodeDecodeError, LookupError):
-                try:
-                    body = payload.decode('utf-8', errors='ignore')
-                except:
-                    pass
+    if not message.is_multipart():
+        return _decode_part(message)
+
+    html_parts = []
+    for part in message.walk():
+        content_type = part.get_content_type()
+        if content_type not in ("text/plain", "text/html"):
+            continue
+        if not _is_body_part(part):
+            continue
+
+        if content_type == "text/plain":
+            body = _decode_part(part)
+            if body:
+                return body
+        else:
+            html_parts.append(part)
+
+    for part in html_parts:
+        html_body = _decode_part(part)
+        if html_body:
+            return html_to_text(html_body)
 
-    return body
+    return None
+
+
+_VOID_TAGS = frozenset({
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr'
+})
+_BLOCK_TAGS = frozenset({
+    'address', 'article', 'aside', 'blockquote', 'body', 'caption',
+    'center', 'dd', 'div', 'dl', 'dt', 'fieldset', 'figcaption', 'figure',
+    'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr',
+    'html', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table',
+    'tbody', 'tfoot', 'thead', 'tr', 'ul'
+})
+_SKIP_TAGS = frozenset(
+    {'head', 'noscript', 'template', 'svg', 'object', 'iframe'})
+
+_TABLE_SECTIONS = frozenset({'table', 'tbody', 'thead', 'tfoot'})
+_IMPLIED_END = {
+    'p': (_BLOCK_TAGS | {'td', 'th'}, _BLOCK_TAGS - {'p'} | {'td', 'th'},
+          frozenset()),
+    'li': ({'li'}, {'ul', 'ol', 'menu'}, {'ul', 'ol', 'menu'}),
+    'dt': ({'dt', 'dd'}, {'dl'}, {'dl'}),
+    'dd': ({'dt', 'dd'}, {'dl'}, {'dl'}),
+    'tr': ({'tr'} | _TABLE_SECTIONS - {'table'}, _TABLE_SECTIONS, {'table'}),
+    'td': ({'td', 'th', 'tr'}, _TABLE_SECTIONS | {'tr'}, {'table'}),
+    'th': ({'td', 'th', 'tr'}, _TABLE_SECTIONS | {'tr'}, {'table'})
+}
+_CELL_MARK = '\x00'
+
+
+def _tag_names_pattern(names: Iterable[str]) -> str:
+    groups: Dict[str, List[str]] = {}
+    for name in sorted(names, reverse=True):
+        groups.setdefault(name[0], []).append(name[1:])
+    pattern = '|'.join(
+        first + ('(?:' + '|'.join(rest) + ')' if rest != [''] else '')
+        for first, rest in sorted(groups.items()))
+    return f'(?i:{pattern})'
+
+
+_IGNORED_RE = re.compile(
+    r'<(?:(' + _tag_names_pattern({'script', 'style', 'title', 'textarea'}) +
+    r')\b[^>]*>.*?(?:</(?i:\1)\s*>|$)'
+    r'|(' + _tag_names_pattern(_SKIP_TAGS) + r')\b[^>]*>.*?</(?i:\2)\s*>'
+    r'|!--.*?(?:-->|$)|[!?][^>]*>)', re.DOTALL)
+_HIDDEN_MARKERS = ('hidden', 'none')
+_HIDDEN_MARKER_RE = re.compile('|'.join(_HIDDEN_MARKERS), re.IGNORECASE)
+_HIDDEN_ATTR_RE = re.compile(
+    r'(?:^|\s)hidden(?:\s|=|/|$)'
+    r'|aria-hidden\s*=\s*["\']?true'
+    r'|display\s*:\s*none|visibility\s*:\s*hidden', re.IGNORECASE)
+_OPEN_TAG_RE = re.compile(r'<([a-zA-Z][a-zA-Z0-9:-]*)([^>]*)>')
+_IMG_RE = re.compile(r'<(?i:img)(?=[\s/>])([^>]*)>')
+_IMG_ALT_RE = re.compile(r'\balt\s*=\s*(?:"([^"]*)"|\'([^\']*)\')',
+                         re.IGNORECASE)
+_LIST_ITEM_RE = re.compile(r'<(?i:li)(?=[\s/>])[^>]*>')
+_CELL_RE = re.compile(r'<(?i:t[dh])(?=[\s/>])[^>]*>')
+_BREAK_RE = re.compile(r'</?(?:' + _tag_names_pattern(_BLOCK_TAGS | {'br'}) +
+                       r')(?=[\s/>])[^>]*>')
+_TAG_RE = re.compile(r'</?[a-zA-Z][^>]*>')
+_END_SCANNERS: Dict[str, 're.Pattern'] = {}
+
+
+def _end_scanner(tag: str) -> 're.Pattern':
+    scanner = _END_SCANNERS.get(tag)
+    if scanner is None:
+        names = {tag}
+        for group in _IMPLIED_END.get(tag, ()):
+            names |= group
+        scanner = _END_SCANNERS[tag] = re.compile(
+            r'<(/?)(' + '|'.join(sorted(names, reverse=True)) +
+            r')(?=[\s/>])', re.IGNORECASE)
+    return scanner
+
+
+def _hidden_end(html: str, tag: str, pos: int) -> Optional[int]:
+    open_enders, close_enders, containers = _IMPLIED_END.get(
+        tag, ((), (), ()))
+    level = 1
+    nested = 0
+    for match in _end_scanner(tag).finditer(html, pos):
+        closing, name = match.groups()
+        name = name.lower()
+        if not nested and name in (close_enders if closing else open_enders):
+            return match.start()
+        if name in containers:
+            nested += -1 if closing else 1
+        elif name == tag:
+            level += -1 if closing else 1
+            if level == 0:
+                end = html.find('>', match.end())
+                return len(html) if end == -1 else end + 1
+    return len(html) if tag in _IMPLIED_END else None
+
+
+def _marker_positions(html: str) -> Iterator[int]:
+    lowered = html.lower()
+    if len(lowered) != len(html):
+        for match in _HIDDEN_MARKER_RE.finditer(html):
+            yield match.start()
+        return
+    for marker in _HIDDEN_MARKERS:
+        pos = lowered.find(marker)
+        while pos != -1:
+            yield pos
+            pos = lowered.find(marker, pos + len(marker))
+
+
+def _hidden_candidates(html: str) -> List[int]:
+    starts = set()
+    for pos in _marker_positions(html):
+        start = html.rfind('<', 0, pos)
+        if start != -1 and html.find('>', start, pos) == -1:
+            starts.add(start)
+    return sorted(starts)
+
+
+def _drop_hidden(html: str) -> str:
+    parts = []
+    pos = 0
+    for start in _hidden_candidates(html):
+        match = _OPEN_TAG_RE.match(html, start)
+        if start < pos or match is None:
+            continue
+        tag, attrs = match.groups()
+        if not _HIDDEN_ATTR_RE.search(attrs):
+            continue
+        tag = tag.lower()
+        if tag in _VOID_TAGS or attrs.endswith('/'):
+            resume = match.end()
+        else:
+            resume = _hidden_end(html, tag, match.end())
+        if resume is not None:
+            parts.append(html[pos:start])
+            if tag in _BLOCK_TAGS:
+                parts.append('\n')
+            pos = resume
+    if not parts:
+        return html
+    parts.append(html[pos:])
+    return ''.join(parts)
+
+
+def _image_alt(match: 're.Match') -> str:
+    alt = _IMG_ALT_RE.search(match.group(1))
+    return (alt.group(1) or alt.group(2) or '') if alt else ''
 
 
 def html_to_text(html: str) -> str:
-    import re
-
-    html = re.sub(r'<script[^>]*>.*?</script>',
-                  '',
-                  html,
-                  flags=re.DOTALL | re.IGNORECASE)
-    html = re.sub(r'<style[^>]*>.*?</style>',
-                  '',
-                  html,
-                  flags=re.DOTALL | re.IGNORECASE)
-    html = re.sub(r'<[^>]+>', ' ', html)
-    html = re.sub(r'&nbsp;', ' ', html)
-    html = re.sub(r'&lt;', '<', html)
-    html = re.sub(r'&gt;', '>', html)
-    html = re.sub(r'&amp;', '&', html)
-    html = re.sub(r'&quot;', '"', html)
-    html = re.sub(r'&#39;', "'", html)
-    html = re.sub(r'\s+', ' ', html)
-
-    return html.strip()
-
-
-def parse_eml_file(file_path: str) -> Dict[str, str]:
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"EML文件不存在: {file_path}")
+    if _CELL_MARK in html:
+        html = html.replace(_CELL_MARK, '')
+    html = _IGNORED_RE.sub('', html)
+    html = _drop_hidden(html)
+    if '<img' in html or '<IMG' in html:
+        html = _IMG_RE.sub(_image_alt, html)
+    html = _LIST_ITEM_RE.sub('\n- ', html)
+    html = _CELL_RE.sub(_CELL_MARK, html)
+    html = _BREAK_RE.sub('\n', html)
+    html = _TAG_RE.sub('', html)
+    if '&' in html:
+        html = unescape(html.replace('&nbsp;', ' '))
 
-    with open(file_path, 'rb') as f:
-        message = email.message_from_bytes(f.read())
+    lines = []
+    for line in html.split('\n'):
+        if _CELL_MARK in line:
+            cells = [' '.join(cell.split()) for cell in line.split(_CELL_MARK)]
+            if not cells[0]:
+                del cells[0]
+            line = ' | '.join(cells)
+        else:
+            line = ' '.join(line.split())
+        if line and line != '-':
+            lines.append(line)
+
+    return '\n'.join(lines)
+
+
+def _is_boundary(line: bytes, boundary: bytes) -> bool:
+    return line.startswith(boundary) and not line[len(boundary):].strip(b'-')
+
+
+class _PayloadFilter:
+
+    def __init__(self,
+                 max_payload_bytes: int,
+                 max_attachment_bytes: Optional[int] = None):
+        self.max_payload_bytes = max_payload_bytes
+        self.max_attachment_bytes = max_attachment_bytes
+        self.part_limit = max_payload_bytes
+        self.boundaries: List[bytes] = []
+        self.in_headers = True
+        self.header_lines: List[bytes] = []
+        self.keep_body = True
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+        self.dropped = False
+
+    def _start_body(self):
+        headers = BytesHeaderParser(policy=compat32).parsebytes(b''.join(
+            self.header_lines))
+        self.header_lines = []
+        content_type = headers.get_content_type()
+
+        if content_type.startswith('multipart/'):
+            boundary = headers.get_param('boundary')
+            if boundary:
+                self.boundaries.append(b'--' + str(boundary).encode(
+                    'ascii', errors='ignore'))
+            self.keep_body = True
+        elif content_type == 'message/rfc822':
+            self.in_headers = True
+            return
+        else:
+            self.keep_body = content_type.startswith(
+                'text/') and _is_body_part(headers)
+            self.part_limit = self.max_payload_bytes
+            if self.max_attachment_bytes and attachment_kind(headers):
+                self.part_limit = max(self.max_payload_bytes,
+                                      self.max_attachment_bytes * 4 // 3 + 4096)
+
+        self.in_headers = False
+        self.pending = []
+        self.pending_size = 0
+        self.dropped = False
+
+    def _end_part(self) -> List[bytes]:
+        lines = self.pending if not self.dropped else []
+        self.pending = []
+        self.pending_size = 0
+        self.dropped = False
+        return lines
+
+    def feed_line(self, line: bytes) -> List[bytes]:
+        if self.in_headers:
+            self.header_lines.append(line)
+            if line in (b'\n', b'\r\n'):
+                self._start_body()
+            return [line]
+
+        if self.boundaries and line.startswith(b'--'):
+            stripped = line.rstrip(b'\r\n')
+            for level in range(len(self.boundaries) - 1, -1, -1):
+                boundary = self.boundaries[level]
+                if stripped == boundary + b'--':
+                    out = self._end_part()
+                    del self.boundaries[level:]
+                    self.keep_body = True
+                    out.append(line)
+                    return out
+                if _is_boundary(stripped, boundary):
+                    out = self._end_part()
+                    del self.boundaries[level + 1:]
+                    self.in_headers = True
+                    out.append(line)
+                    return out
+
+        if self.keep_body:
+            return [line]
+
+        if not self.dropped:
+            self.pending.append(line)
+            self.pending_size += len(line)
+            if self.pending_size > self.part_limit:
+                self.pending = []
+                self.pending_size = 0
+                self.dropped = True
+        return []
+
+    def close(self) -> List[bytes]:
+        return self._end_part()
+
+
+def _iter_filtered_lines(fp: BinaryIO,
+                         payload_filter: _PayloadFilter) -> Iterator[bytes]:
+    buf = b''
+    pos = 0
+    eof = False
 
+    while True:
+        if payload_filter.dropped and not buf.startswith(b'--', pos):
+            idx = buf.find(b'\n--', pos)
+            if idx != -1:
+                pos = idx + 1
+                continue
+            if eof:
+                break
+            last_nl = buf.rfind(b'\n', pos)
+            buf = buf[last_nl + 1 if last_nl != -1 else pos:]
+            pos = 0
+        else:
+            nl = buf.find(b'\n', pos)
+            if nl != -1:
+                line = buf[pos:nl + 1]
+                pos = nl + 1
+                yield from payload_filter.feed_line(line)
+                continue
+            if eof:
+                if pos < len(buf):
+                    yield from payload_filter.feed_line(buf[pos:])
+                break
+            buf = buf[pos:]
+            pos = 0
+
+        chunk = fp.read(READ_CHUNK_SIZE)
+        if chunk:
+            buf += chunk
+        else:
+            eof = True
+
+    yield from payload_filter.close()
+
+
+def parse_eml_stream(fp: BinaryIO,
+                     file_path: str,
+                     file_name: Optional[str] = None,
+                     max_payload_bytes: int = DEFAULT_MAX_PAYLOAD_BYTES,
+                     attachments: bool = False,
+                     max_attachment_bytes: int = DEFAULT_MAX_ATTACHMENT_BYTES
+                     ) -> Dict[str, str]:
+    payload_filter = _PayloadFilter(
+        max_payload_bytes, max_attachment_bytes if attachments else None)
+    parser = BytesFeedParser(policy=compat32)
+
+    chunk = []
+    chunk_size = 0
+    for line in _iter_filtered_lines(fp, payload_filter):
+        chunk.append(line)
+        chunk_size += len(line)
+        if chunk_size >= READ_CHUNK_SIZE:
+            parser.feed(b''.join(chunk))
+            chunk = []
+            chunk_size = 0
+
+    if chunk:
+        parser.feed(b''.join(chunk))
+
+    return _message_to_record(parser.close(), file_path, file_name,
+                              attachments)
+
+
+def parse_eml_bytes(data: bytes,
+                    file_path: str,
+                    file_name: Optional[str] = None,
+                    lazy: bool = False,
+                    max_payload_bytes: int = DEFAULT_MAX_PAYLOAD_BYTES,
+                    attachments: bool = False,
+                    max_attachment_bytes: int = DEFAULT_MAX_ATTACHMENT_BYTES
+                    ) -> Dict[str, str]:
+    if lazy:
+        return parse_eml_stream(io.BytesIO(data), file_path, file_name,
+                                max_payload_bytes, attachments,
+                                max_attachment_bytes)
+
+    message = email.message_from_bytes(data)
+    return _message_to_record(message, file_path, file_name, attachments)
+
+
+def _message_to_record(message: Message,
+                       file_path: str,
+                       file_name: Optional[str] = None,
+                       attachments: bool = False) -> Dict[str, str]:
     subject = decode_header_value(message.get('Subject', ''))
     from_addr = decode_header_value(message.get('From', ''))
     date_str = message.get('Date', '')
     body = get_email_body(message)
 
-    return {
+    record = {
         'file_path': file_path,
-        'file_name': os.path.basename(file_path),
+        'file_name': file_name or os.path.basename(file_path),
         'subject': subject,
         'from': from_addr,
         'date': date_str,
-        'body': body or ''
+        'body': body or '',
+        'charset': get_body_charset(message)
     }
+    if attachments:
+        record['attachments'] = get_attachments(message)
+    return record
+
+
+def parse_eml_file(file_path: str,
+                   lazy: bool = False,
+                   max_payload_bytes: int = DEFAULT_MAX_PAYLOAD_BYTES,
+                   attachments: bool = False,
+                   max_attachment_bytes: int = DEFAULT_MAX_ATTACHMENT_BYTES
+                   ) -> Dict[str, str]:
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"EML文件不存在: {file_path}")
+
+    with open(file_path, 'rb') as f:
+        if lazy:
+            return parse_eml_stream(f,
+                                    file_path,
+                                    max_payload_bytes=max_payload_bytes,
+                                    attachments=attachments,
+                                    max_attachment_bytes=max_attachment_bytes)
+        return parse_eml_bytes(f.read(), file_path, attachments=attachments)
 
 
 def extract_email_text_from_subject(subject: str) -> str:
@@ -1,10 +1,23 @@
+import hashlib
 import json
 import traceback
 import time
-from typing import Dict, Optional, List
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Dict, Iterable, Optional, List, Sequence
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from budget import BUDGET_STOP, BUDGET_THROTTLE
+from chunking import merge_chunk_lectures, split_email
+from lecture_index import lecture_index
+from live_config import live_config
 from llm_client import LLMClient
-from config import get_max_concurrency, MAX_RETRIES
+from response_log import ReplayMiss
+from scheduler import DEFAULT_LOOKAHEAD, ProgressTracker, iter_largest_first
+from config import (API_CONFIGS, get_fast_model, get_max_concurrency,
+                    MAX_RETRIES)
+from metrics import metrics
+from records import LECTURE_FIELDS, LectureRecord
+from validation import (Problem, is_repairable, normalize_lecture,
+                        validate_lectures)
 
 SYSTEM_PROMPT = """你是一个专业的学术报告信息提取助手。请从邮件内容中准确提取所有学术报告或培训的信息。
 
@@ -54,187 +67,551 @@ SYSTEM_PROMPT = """你是一个专业的学术报告信息提取助手。请从
 ]"""
 
 
-def create_extraction_prompt(email_data: Dict[str, str]) -> str:
-    prompt_parts = [
-        "请从以下邮件内容中提取学术报告信息：\n\n",
-    ]
+EXTRACTION_HEADER = "请从以下邮件内容中提取学术报告信息。\n"
+
+EXTRACTION_INSTRUCTION = "**重要**：请提取邮件中的**所有**讲座信息，不要遗漏任何一个。返回JSON数组，每个对象代表一个讲座。必须使用以下字段名：training_name, start_time, end_time, duration_hours, location, purpose, content。时间格式必须是\"yyyy-MM-dd hh:mm\"（空格分隔）。如果邮件中未明确结束时间，end_time必须设置为null。purpose和content需要根据讲座主题进行合理的推断和概括，不要简单地复制标题或使用\"学术讲座\"这种通用回答。只返回JSON数组，不要包含其他文字。"
+
+PACKED_HEADER = "请从以下多封邮件中分别提取学术报告信息，每封邮件以\"=== 邮件 N ===\"开头。\n"
+
+PACKED_INSTRUCTION = "**重要**：请分别提取每封邮件中的**所有**讲座信息，不要遗漏任何一个。返回一个JSON数组，每个对象代表一个讲座，并额外包含email_index字段，值为讲座所属邮件的编号（\"=== 邮件 N ===\"中的N）。其余字段名与格式要求与单封邮件相同：training_name, start_time, end_time, duration_hours, location, purpose, content。只返回JSON数组，不要包含其他文字。"
+
+REPAIR_SYSTEM_PROMPT = "你是JSON格式修复助手。只根据给出的内容修正格式，不要编造信息。只返回JSON数组，不要包含其他文字。"
+
+JSON_REPAIR_INSTRUCTION = "下面是一次讲座信息提取的回答，但它不是合法的JSON。请把它整理为合法的JSON数组，每个对象包含字段：training_name, start_time, end_time, duration_hours, location, purpose, content（打包提取时另含email_index）。时间格式为\"yyyy-MM-dd hh:mm\"，duration_hours为数字，缺失的值设为null。"
+
+FIELD_REPAIR_INSTRUCTION = "下面是一次讲座信息提取的JSON结果，其中部分字段格式不正确。请只修正列出的字段，其余字段保持不变：时间格式为\"yyyy-MM-dd hh:mm\"（空格分隔，不含秒），duration_hours为以小时计的数字，结束时间必须晚于开始时间，无法确定的值设为null。返回修正后的完整JSON数组（长度和顺序与原数组相同），不要包含其他文字。"
+
+MAX_REPAIR_RESPONSE_CHARS = 20000
+
+BUDGET_EXHAUSTED_ERROR = '预算已耗尽，未处理'
+
+PROMPT_DIGEST = hashlib.sha256(''.join(
+    (SYSTEM_PROMPT, EXTRACTION_HEADER, EXTRACTION_INSTRUCTION, PACKED_HEADER,
+     PACKED_INSTRUCTION, FIELD_REPAIR_INSTRUCTION)).encode('utf-8')).hexdigest()
+
+
+def _email_section(email_data: Dict[str, str]) -> List[str]:
+    parts = []
 
     if email_data.get('subject'):
-        prompt_parts.append(f"邮件主题：{email_data['subject']}\n")
+        parts.append(f"邮件主题：{email_data['subject']}\n")
 
     if email_data.get('from'):
-        prompt_parts.append(f"发件人：{email_data['from']}\n")
+        parts.append(f"发件人：{email_data['from']}\n")
 
     if email_data.get('date'):
-        prompt_parts.append(f"邮件日期：{email_data['date']}\n")
+        parts.append(f"邮件日期：{email_data['date']}\n")
 
     if email_data.get('body'):
-        prompt_parts.append(f"\n邮件正文：\n{email_data['body']}\n")
+        if email_data.get('chunk'):
+            parts.append(f"\n邮件正文（较长，分段提取，第 {email_data['chunk']} 段）："
+                         f"\n{email_data['body']}\n")
+        else:
+            parts.append(f"\n邮件正文：\n{email_data['body']}\n")
+
+    if email_data.get('attachment_text'):
+        parts.append("\n附件内容（正文缺少时间或地点，以下为从附件中提取的文本）："
+                     f"\n{email_data['attachment_text']}\n")
+
+    return parts
+
+
+def create_extraction_prompt(email_data: Dict[str, str]) -> str:
+    prompt_parts = [EXTRACTION_HEADER, EXTRACTION_INSTRUCTION, "\n\n"]
+    prompt_parts.extend(_email_section(email_data))
+
+    return "".join(prompt_parts)
+
+
+def create_packed_extraction_prompt(email_data_list: List[Dict[str, str]]) -> str:
+    prompt_parts = [PACKED_HEADER, PACKED_INSTRUCTION, "\n\n"]
+    for i, email_data in enumerate(email_data_list):
+        prompt_parts.append(f"=== 邮件 {i} ===\n")
+        prompt_parts.extend(_email_section(email_data))
+        prompt_parts.append("\n")
+
+    return "".join(prompt_parts)
 
-    prompt_parts.append(
-        "\n**重要**：请提取邮件中的**所有**讲座信息，不要遗漏任何一个。返回JSON数组，每个对象代表一个讲座。必须使用以下字段名：training_name, start_time, end_time, duration_hours, location, purpose, content。时间格式必须是\"yyyy-MM-dd hh:mm\"（空格分隔）。如果邮件中未明确结束时间，end_time必须设置为null。purpose和content需要根据讲座主题进行合理的推断和概括，不要简单地复制标题或使用\"学术讲座\"这种通用回答。只返回JSON数组，不要包含其他文字。"
-    )
 
+def create_json_repair_prompt(response: str) -> str:
+    return "".join([
+        JSON_REPAIR_INSTRUCTION, "\n\n上一次的回答：\n",
+        response[:MAX_REPAIR_RESPONSE_CHARS]
+    ])
+
+
+def create_repair_prompt(lectures: List[LectureRecord],
+                         problems: List[Problem]) -> str:
+    prompt_parts = [FIELD_REPAIR_INSTRUCTION, "\n\n需要修正的字段：\n"]
+    for index, field, reason in problems:
+        value = json.dumps(lectures[index].get(field), ensure_ascii=False)
+        prompt_parts.append(
+            f"- 第{index + 1}个讲座 {field}（当前值 {value}）：{reason}\n")
+
+    answer = [{field: lecture.get(field)
+               for field in LECTURE_FIELDS}
+              for lecture in lectures]
+    prompt_parts.append("\n上一次的回答：\n")
+    prompt_parts.append(json.dumps(answer, ensure_ascii=False, indent=2))
     return "".join(prompt_parts)
 
 
+def _repair_json(client: LLMClient, response: str, api_name: str):
+    try:
+        text = client.chat(
+            [{
+                "role": "user",
+                "content": create_json_repair_prompt(response)
+            }],
+            system=REPAIR_SYSTEM_PROMPT)
+        lectures = client.extract_json(text) or None
+    except Exception as e:
+        print(f"  JSON修复失败: {type(e).__name__}: {e}")
+        lectures = None
+
+    metrics.inc('repair_requests_total',
+                provider=api_name,
+                kind='json',
+                outcome='ok' if lectures is not None else 'failed')
+    return lectures
+
+
+def _repairable_problems(results: List[LectureRecord]) -> List[Problem]:
+    if not results:
+        return []
+    return [(index, field, reason)
+            for index, field, reason in validate_lectures(results)
+            if field != 'error' and is_repairable(results[index], field)]
+
+
+def _normalize_and_repair(client: LLMClient, results: List[LectureRecord],
+                          api_name: str) -> List[LectureRecord]:
+    for result in results:
+        for field in normalize_lecture(result):
+            metrics.inc('normalized_fields_total',
+                        provider=api_name,
+                        field=field)
+
+    problems = _repairable_problems(results)
+    if not problems:
+        return results
+
+    try:
+        text = client.chat(
+            [{
+                "role": "user",
+                "content": create_repair_prompt(results, problems)
+            }],
+            system=REPAIR_SYSTEM_PROMPT)
+        repaired = client.extract_json(text)
+    except Exception as e:
+        print(f"  字段修复失败: {type(e).__name__}: {e}")
+        repaired = None
+
+    if isinstance(repaired, dict):
+        repaired = [repaired]
+    if isinstance(repaired, list) and len(repaired) == len(results):
+        for index, field, _ in problems:
+            item = repaired[index]
+            if isinstance(item, dict) and field in item:
+                results[index][field] = item[field]
+        for result in results:
+            normalize_lecture(result)
+        outcome = 'failed' if _repairable_problems(results) else 'ok'
+    else:
+        outcome = 'failed'
+
+    metrics.inc('repair_requests_total',
+                provider=api_name,
+                kind='fields',
+                outcome=outcome)
+    return results
+
+
 def extract_training_info(email_data: Dict[str, str],
-                          api_name: str = "zai-plan") -> List[Dict[str, str]]:
-    client = LLMClient(api_name)
+                          api_name: str = "zai-plan",
+                          model: Optional[str] = None,
+                          max_attempts: int = MAX_RETRIES) -> List[LectureRecord]:
+    client = LLMClient(api_name, model)
 
-    prompt = create_extraction_prompt(email_data)
+    with metrics.stage('prompt_build'):
+        prompt = create_extraction_prompt(email_data)
 
     messages = [{"role": "user", "content": prompt}]
 
     last_error = None
-    for attempt in range(MAX_RETRIES):
+    for attempt in range(max_attempts):
+        if attempt:
+            metrics.inc('extract_retries_total', provider=api_name)
         try:
             response = client.chat(messages, system=SYSTEM_PROMPT)
 
             lectures = client.extract_json(response)
+            if lectures is None:
+                lectures = _repair_json(client, response, api_name)
 
             results = []
             if isinstance(lectures, list):
                 for lecture in lectures:
-                    results.append({
-                        'training_name':
-                        lecture.get('training_name'),
-                        'start_time':
-                        lecture.get('start_time'),
-                        'end_time':
-                        lecture.get('end_time'),
-                        'duration_hours':
-                        lecture.get('duration_hours'),
-                        'location':
-                        lecture.get('location'),
-                        'purpose':
-                        lecture.get('purpose'),
-                        'content':
-                        lecture.get('content'),
-                        'raw_response':
-                        response
-                    })
+                    results.append(LectureRecord.from_lecture(lecture))
             elif isinstance(lectures, dict):
-                results.append({
-                    'training_name': lectures.get('training_name'),
-                    'start_time': lectures.get('start_time'),
-                    'end_time': lectures.get('end_time'),
-                    'duration_hours': lectures.get('duration_hours'),
-                    'location': lectures.get('location'),
-                    'purpose': lectures.get('purpose'),
-                    'content': lectures.get('content'),
-                    'raw_response': response
-                })
+                results.append(LectureRecord.from_lecture(lectures))
             else:
-                return [{
-                    'training_name': None,
-                    'start_time': None,
-                    'end_time': None,
-                    'duration_hours': None,
-                    'location': None,
-                    'purpose': None,
-                    'content': None,
-                    'error': '无法解析JSON响应',
-                    'raw_response': response
-                }]
-
-            return results
+                return [
+                    LectureRecord.failed('无法解析JSON响应',
+                                         raw_response=response)
+                ]
+
+            return _normalize_and_repair(client, results, api_name)
 
+        except ReplayMiss:
+            raise
         except Exception as e:
             last_error = e
             error_type = type(e).__name__
 
             if error_type == 'HTTPError' and hasattr(
                     e, 'response') and e.response.status_code == 429:
-                if attempt < MAX_RETRIES - 1:
+                if attempt < max_attempts - 1:
                     wait_time = (2**attempt) * 5
                     print(
-                        f"  429错误，等待{wait_time}秒后重试 ({attempt + 1}/{MAX_RETRIES})..."
+                        f"  429错误，等待{wait_time}秒后重试 ({attempt + 1}/{max_attempts})..."
                     )
                     time.sleep(wait_time)
                 else:
                     print(f"  429错误，已达最大重试次数")
-            elif attempt < MAX_RETRIES - 1:
+            elif attempt < max_attempts - 1:
                 wait_time = 2**attempt
                 print(
-                    f"  {error_type}，等待{wait_time}秒后重试 ({attempt + 1}/{MAX_RETRIES})..."
+                    f"  {error_type}，等待{wait_time}秒后重试 ({attempt + 1}/{max_attempts})..."
                 )
                 time.sleep(wait_time)
 
-    return [{
-        'training_name':
-        None,
-        'start_time':
-        None,
-        'end_time':
-        None,
-        'duration_hours':
-        None,
-        'location':
-        None,
-        'purpose':
-        None,
-        'content':
-        None,
-        'error':
-        f"{type(last_error).__name__}: {str(last_error)}"
-        if last_error else "未知错误",
-        'traceback':
-        traceback.format_exc() if last_error else ""
-    }]
-
-
-def _extract_single(email_data: Dict[str, str], api_name: str, index: int,
-                    total: int) -> tuple[int, List[Dict]]:
+    return [
+        LectureRecord.failed(
+            f"{type(last_error).__name__}: {str(last_error)}"
+            if last_error else "未知错误",
+            traceback.format_exc() if last_error else "")
+    ]
+
+
+def extract_training_info_cascade(email_data: Dict[str, str],
+                                  api_name: str = "zai-plan"
+                                  ) -> List[LectureRecord]:
+    fast_model = get_fast_model(api_name)
+    if not fast_model:
+        metrics.inc('cascade_emails_total', provider=api_name, tier='strong')
+        return extract_training_info(email_data, api_name)
+
+    lectures = extract_training_info(email_data, api_name, fast_model, 1)
+    problems = validate_lectures(lectures)
+    if not problems:
+        metrics.inc('cascade_emails_total', provider=api_name, tier='fast')
+        return lectures
+
+    metrics.inc('cascade_escalations_total',
+                provider=api_name,
+                field=problems[0][1])
+    metrics.inc('cascade_emails_total', provider=api_name, tier='strong')
+    return extract_training_info(email_data, api_name)
+
+
+def _tag_source(lectures: List[LectureRecord],
+                email_data: Dict) -> List[LectureRecord]:
+    for lecture in lectures:
+        lecture['file_path'] = email_data.get('file_path', '')
+        lecture['file_name'] = email_data.get('file_name', '')
+        if 'seq' in email_data:
+            lecture['seq'] = email_data['seq']
+    return lectures
+
+
+def _extract_single(email_data: Dict[str, str],
+                    api_name: str,
+                    index: int,
+                    total: Optional[int],
+                    cascade: bool = False) -> tuple[int, List[LectureRecord]]:
+    start = time.perf_counter()
+    extract = extract_training_info_cascade if cascade else extract_training_info
     try:
-        lectures = extract_training_info(email_data, api_name)
-        for lecture in lectures:
-            lecture['file_path'] = email_data.get('file_path', '')
-            lecture['file_name'] = email_data.get('file_name', '')
+        lectures = _tag_source(extract(email_data, api_name), email_data)
+        status = 'ok' if any(l.get('training_name')
+                             for l in lectures) else 'failed'
+        metrics.observe('email_extract_seconds',
+                        time.perf_counter() - start,
+                        provider=api_name)
+        metrics.inc('emails_total', provider=api_name, status=status)
         return index, lectures
     except Exception as e:
-        error_result = [{
-            'training_name': None,
-            'start_time': None,
-            'end_time': None,
-            'duration_hours': None,
-            'location': None,
-            'purpose': None,
-            'content': None,
-            'file_path': email_data.get('file_path', ''),
-            'file_name': email_data.get('file_name', ''),
-            'error': f"{type(e).__name__}: {str(e)}",
-            'traceback': traceback.format_exc()
-        }]
-        return index, error_result
-
-
-def extract_training_info_batch(email_data_list: list,
-                                api_name: str = "zai-plan",
-                                progress_callback=None) -> list:
-    max_concurrency = get_max_concurrency(api_name)
-    total = len(email_data_list)
+        metrics.inc('emails_total', provider=api_name, status='error')
+        error_result = [
+            LectureRecord.failed(f"{type(e).__name__}: {str(e)}",
+                                 traceback.format_exc())
+        ]
+        return index, _tag_source(error_result, email_data)
+
+
+def _extract_chunk(chunk_data: Dict[str, str],
+                   api_name: str,
+                   index: int,
+                   cascade: bool = False) -> tuple[int, List[LectureRecord]]:
+    extract = extract_training_info_cascade if cascade else extract_training_info
+    metrics.inc('email_chunks_total', provider=api_name)
+    try:
+        return index, _tag_source(extract(chunk_data, api_name), chunk_data)
+    except Exception as e:
+        error_result = [
+            LectureRecord.failed(
+                f"第 {chunk_data.get('chunk')} 段提取失败 - "
+                f"{type(e).__name__}: {str(e)}", traceback.format_exc())
+        ]
+        return index, _tag_source(error_result, chunk_data)
+
+
+def _skipped_result(email_data: Dict, reason: str) -> List[LectureRecord]:
+    return _tag_source([LectureRecord.failed(reason)], email_data)
+
+
+def extraction_signature(api_name: str, cascade: bool = False) -> str:
+    model = API_CONFIGS.get(api_name, {}).get('model') or ''
+    fast_model = get_fast_model(api_name) if cascade else None
+    if fast_model:
+        model = f"{fast_model}>{model}"
+    return f"{api_name}/{model}/{PROMPT_DIGEST[:16]}"
+
+
+def _apply_index(email_data: Dict, lectures: List[LectureRecord],
+                 signature: str) -> List[LectureRecord]:
+    if not lecture_index.enabled:
+        return lectures
+    lecture_index.remember(email_data, lectures, signature)
+    kept = []
+    for lecture in lectures:
+        known_from = lecture_index.known_lecture(lecture)
+        if known_from is None:
+            kept.append(lecture)
+            continue
+        metrics.inc('known_lectures_total', action=lecture_index.mode)
+        if lecture_index.mode == 'tag':
+            lecture['known_from'] = known_from
+            kept.append(lecture)
+    return kept
+
+
+def _known_notice_result(email_data: Dict,
+                         api_name: str,
+                         cascade: bool = False
+                         ) -> Optional[List[LectureRecord]]:
+    if not lecture_index.enabled:
+        return None
+    lectures = lecture_index.known_notice(
+        email_data, extraction_signature(api_name, cascade))
+    if lectures is None:
+        return None
+    metrics.inc('known_notices_total',
+                provider=api_name,
+                action=lecture_index.mode)
+    if lecture_index.mode != 'tag':
+        return []
+    return _tag_source(lectures, email_data)
+
+
+def extract_training_info_packed(email_data_list: List[Dict[str, str]],
+                                 api_name: str = "zai-plan"
+                                 ) -> List[List[LectureRecord]]:
+    if len(email_data_list) == 1:
+        return [_extract_single(email_data_list[0], api_name, 0, 1)[1]]
 
-    results = [None] * total
+    client = LLMClient(api_name)
+
+    with metrics.stage('prompt_build'):
+        prompt = create_packed_extraction_prompt(email_data_list)
+
+    messages = [{"role": "user", "content": prompt}]
+    grouped: List[List[LectureRecord]] = [[] for _ in email_data_list]
+
+    metrics.inc('packed_requests_total', provider=api_name)
+    try:
+        response = client.chat(messages, system=SYSTEM_PROMPT)
+        lectures = client.extract_json(response)
+        if lectures is None:
+            lectures = _repair_json(client, response, api_name)
+    except Exception as e:
+        print(f"  打包提取失败，逐封重试: {type(e).__name__}: {e}")
+        response, lectures = None, None
+
+    if isinstance(lectures, dict):
+        lectures = [lectures]
+    for lecture in lectures or []:
+        if not isinstance(lecture, dict):
+            continue
+        try:
+            index = int(lecture.get('email_index'))
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < len(grouped):
+            grouped[index].append(LectureRecord.from_lecture(lecture))
 
-    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
-        future_to_index = {
-            executor.submit(_extract_single, email_data, api_name, i, total): i
-            for i, email_data in enumerate(email_data_list)
-        }
+    results = []
+    for email_data, lectures in zip(email_data_list, grouped):
+        if not lectures:
+            metrics.inc('packed_fallback_total', provider=api_name)
+            results.append(_extract_single(email_data, api_name, 0, None)[1])
+            continue
+        lectures = _normalize_and_repair(client, lectures, api_name)
+        metrics.inc('emails_total', provider=api_name, status='ok')
+        results.append(_tag_source(lectures, email_data))
 
-        for future in as_completed(future_to_index):
-            index, lectures = future.result()
-            results[index] = lectures
+    return results
 
+
+def estimate_prompt_size(email_data: Dict) -> int:
+    return sum(
+        len(email_data.get(key) or '')
+        for key in ('subject', 'from', 'date', 'body', 'attachment_text'))
+
+
+def _counting(items: Iterable[Dict], tracker: ProgressTracker):
+    count = 0
+    for item in items:
+        count += 1
+        yield item
+    tracker.total = count
+
+
+def extract_training_info_batch(email_data_list: Iterable[Dict],
+                                api_name: str = "zai-plan",
+                                progress_callback=None,
+                                budget=None,
+                                lookahead: int = DEFAULT_LOOKAHEAD,
+                                executor: Optional[ThreadPoolExecutor] = None,
+                                cascade: bool = False,
+                                chunk_long: bool = False) -> list:
+
+    if isinstance(email_data_list, Sequence):
+        tracker = ProgressTracker(len(email_data_list))
+        items = email_data_list
+    else:
+        tracker = ProgressTracker()
+        items = _counting(email_data_list, tracker)
+
+    results: Dict[int, List[LectureRecord]] = {}
+    chunked: Dict[int, Dict] = {}
+    budget_exhausted = False
+
+    if executor is None:
+        pool = ThreadPoolExecutor(max_workers=live_config.pool_size(api_name))
+    else:
+        pool = nullcontext(executor)
+
+    with pool as executor:
+        pending = {}
+
+        def collect(block: bool):
+            done, _ = wait(pending,
+                           timeout=None if block else 0,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                email_data, estimate, part, api = pending.pop(future)
+                if budget and estimate:
+                    budget.release(estimate)
+                index, lectures = future.result()
+                if part is not None:
+                    state = chunked[index]
+                    state['parts'][part] = lectures
+                    state['remaining'] -= 1
+                    if state['remaining']:
+                        continue
+                    del chunked[index]
+                    lectures = merge_chunk_lectures(state['parts'])
+                    status = 'ok' if any(l.get('training_name')
+                                         for l in lectures) else 'failed'
+                    metrics.observe('email_extract_seconds',
+                                    time.perf_counter() - state['started'],
+                                    provider=state['api'])
+                    metrics.inc('emails_total',
+                                provider=state['api'],
+                                status=status)
+                tracker.complete(
+                    any(l.get('training_name') for l in lectures))
+                results[index] = _apply_index(
+                    email_data, lectures, extraction_signature(api, cascade))
+                report(email_data)
+
+        def report(email_data: Dict):
             if progress_callback:
-                completed = sum(1 for r in results if r is not None)
-                progress_callback(completed, total,
-                                  email_data_list[index].get('file_name', ''))
+                progress_callback(tracker.completed, tracker.total,
+                                  email_data.get('file_name', ''),
+                                  tracker.eta())
+
+        window = get_max_concurrency(live_config.provider(api_name)) * 2
+        for i, email_data in iter_largest_first(items, estimate_prompt_size,
+                                                lookahead, window):
+            live_config.check()
+            current_api = live_config.provider(api_name)
+            known = _known_notice_result(email_data, current_api, cascade)
+            if known is not None:
+                results[i] = known
+                tracker.submit()
+                tracker.complete()
+                report(email_data)
+                continue
+
+            limit = get_max_concurrency(current_api) * 2
+            if budget and not budget_exhausted:
+                state = budget.state()
+                budget_exhausted = state == BUDGET_STOP
+                if state == BUDGET_THROTTLE:
+                    limit = 1
+            if budget_exhausted:
+                results[i] = _skipped_result(email_data, BUDGET_EXHAUSTED_ERROR)
+                tracker.submit()
+                tracker.complete(False)
+                report(email_data)
+                continue
+
+            parts = split_email(email_data) if chunk_long else [email_data]
+            if len(parts) > 1:
+                metrics.inc('chunked_emails_total', provider=current_api)
+                chunked[i] = {
+                    'parts': [None] * len(parts),
+                    'remaining': len(parts),
+                    'started': time.perf_counter(),
+                    'api': current_api
+                }
+
+            for part, part_data in enumerate(parts):
+                estimate = None
+                if budget:
+                    estimate = budget.estimate(
+                        current_api,
+                        SYSTEM_PROMPT + create_extraction_prompt(part_data))
+
+                while len(pending) >= limit:
+                    collect(True)
+                if pending:
+                    collect(False)
+
+                if budget:
+                    budget.reserve(estimate)
+                if len(parts) > 1:
+                    future = executor.submit(_extract_chunk, part_data,
+                                             current_api, i, cascade)
+                    pending[future] = (email_data, estimate, part,
+                                       current_api)
+                else:
+                    future = executor.submit(_extract_single, email_data,
+                                             current_api, i, tracker.total,
+                                             cascade)
+                    pending[future] = (email_data, estimate, None,
+                                       current_api)
+            tracker.submit()
+
+        while pending:
+            collect(True)
 
     final_results = []
-    for r in results:
-        if r is not None:
-            final_results.extend(r)
+    for index in sorted(results):
+        final_results.extend(results[index])
 
     return final_results
@@ -0,0 +1,129 @@
+import os
+from fnmatch import fnmatchcase
+from typing import Callable, Iterator, Optional, Sequence, Set, Tuple
+
+EML_SUFFIXES = ('.eml', )
+
+
+def _normalize_patterns(patterns: Optional[Sequence[str]]) -> Tuple[str, ...]:
+    if not patterns:
+        return ()
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    return tuple(p.replace('\\', '/').lower() for p in patterns if p)
+
+
+def _matches_any(rel_path: str, name: str, patterns: Tuple[str, ...]) -> bool:
+    for pattern in patterns:
+        target = rel_path if '/' in pattern else name
+        if fnmatchcase(target, pattern):
+            return True
+    return False
+
+
+def path_matches(rel_path: str,
+                 include: Optional[Sequence[str]] = None,
+                 exclude: Optional[Sequence[str]] = None) -> bool:
+    rel_lower = rel_path.replace('\\', '/').lower()
+    name_lower = rel_lower.rsplit('/', 1)[-1]
+    include = _normalize_patterns(include)
+    exclude = _normalize_patterns(exclude)
+    if include and not _matches_any(rel_lower, name_lower, include):
+        return False
+    if exclude and _matches_any(rel_lower, name_lower, exclude):
+        return False
+    return True
+
+
+def _file_key(entry: os.DirEntry) -> Tuple:
+    try:
+        st = entry.stat()
+        if st.st_ino:
+            return (st.st_dev, st.st_ino)
+    except OSError:
+        pass
+    return (os.path.realpath(entry.path), )
+
+
+def _scan_sorted(dir_path: str) -> Iterator[os.DirEntry]:
+    try:
+        with os.scandir(dir_path) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except OSError as e:
+        print(f"  警告: 无法读取目录 {dir_path} - {e}")
+        entries = []
+    return iter(entries)
+
+
+def iter_files(root: str,
+               suffixes: Sequence[str] = EML_SUFFIXES,
+               include: Optional[Sequence[str]] = None,
+               exclude: Optional[Sequence[str]] = None,
+               max_depth: Optional[int] = None,
+               follow_symlinks: bool = True,
+               yield_dir: Optional[Callable[[str], bool]] = None,
+               include_suffixes: Optional[Sequence[str]] = None
+               ) -> Iterator[str]:
+    suffixes = tuple(s.lower() for s in suffixes)
+    include_suffixes = (suffixes if include_suffixes is None else tuple(
+        s.lower() for s in include_suffixes))
+    include = _normalize_patterns(include)
+    exclude = _normalize_patterns(exclude)
+
+    if os.path.isfile(root):
+        if os.path.basename(root).lower().endswith(suffixes):
+            yield root
+        return
+
+    if not os.path.isdir(root):
+        return
+
+    seen_files: Set[Tuple] = set()
+    seen_dirs: Set[str] = {os.path.realpath(root)}
+    stack = [(_scan_sorted(root), '', 0)]
+
+    while stack:
+        entries, rel_dir, depth = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+
+        rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+        rel_lower = rel_path.lower()
+        name_lower = entry.name.lower()
+
+        try:
+            is_dir = entry.is_dir(follow_symlinks=follow_symlinks)
+        except OSError:
+            continue
+
+        if is_dir:
+            if max_depth is not None and depth >= max_depth:
+                continue
+            if exclude and _matches_any(rel_lower, name_lower, exclude):
+                continue
+            real_dir = os.path.realpath(entry.path)
+            if real_dir in seen_dirs:
+                continue
+            seen_dirs.add(real_dir)
+            if yield_dir and yield_dir(entry.path):
+                yield entry.path
+                continue
+            stack.append((_scan_sorted(entry.path), rel_path, depth + 1))
+            continue
+
+        if not name_lower.endswith(suffixes):
+            continue
+        if include and name_lower.endswith(include_suffixes) and \
+                not _matches_any(rel_lower, name_lower, include):
+            continue
+        if exclude and _matches_any(rel_lower, name_lower, exclude):
+            continue
+
+        key = _file_key(entry)
+        if key in seen_files:
+            continue
+        seen_files.add(key)
+
+        yield entry.path
@@ -0,0 +1,284 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from chunking import name_key
+from records import LECTURE_FIELDS, LectureRecord
+
+KNOWN_MODES = ('tag', 'skip', 'off')
+DEFAULT_KNOWN_MODE = 'tag'
+INDEX_FILE_NAME = 'lectures.sqlite'
+BLOOM_ERROR_RATE = 0.01
+BLOOM_MIN_CAPACITY = 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lectures (
+    lecture_key TEXT PRIMARY KEY,
+    training_name TEXT NOT NULL,
+    start_time TEXT,
+    output TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    first_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS notices (
+    subject_key TEXT NOT NULL,
+    body_digest TEXT NOT NULL,
+    lectures TEXT NOT NULL,
+    output TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    extractor TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (subject_key, body_digest)
+);
+"""
+
+_SUBJECT_PREFIX_RE = re.compile(
+    r'^\s*(?:(?:re|fw|fwd|aw|sv)\s*(?:\[\d+\])?|回复|答复|转发)\s*[:：]\s*',
+    re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def default_index_path(output_file: str) -> str:
+    return os.path.join(os.path.dirname(output_file) or '.', INDEX_FILE_NAME)
+
+
+def lecture_key(lecture) -> Optional[str]:
+    name = name_key(lecture)
+    if not name or lecture.get('error'):
+        return None
+    return f"{name}|{lecture.get('start_time') or ''}"
+
+
+def subject_key(subject: Optional[str]) -> str:
+    subject = subject or ''
+    while True:
+        stripped = _SUBJECT_PREFIX_RE.sub('', subject, count=1)
+        if stripped == subject:
+            break
+        subject = stripped
+    return _WHITESPACE_RE.sub('', subject).casefold()
+
+
+def body_digest(body: Optional[str]) -> str:
+    text = _WHITESPACE_RE.sub('', body or '')
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class BloomFilter:
+
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        self.capacity = max(capacity, 1)
+        self.size = max(
+            8,
+            int(-self.capacity * math.log(error_rate) / math.log(2)**2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+
+class LectureIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = None
+        self._bloom: Optional[BloomFilter] = None
+        self._new_lectures: Dict[str, Tuple] = {}
+        self._new_notices: Dict[Tuple[str, str], Tuple] = {}
+        self._visible_before = 0.0
+        self.path: Optional[str] = None
+        self.mode = 'off'
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def open(self, path: str, mode: str = DEFAULT_KNOWN_MODE) -> 'LectureIndex':
+        self.close()
+        if mode not in KNOWN_MODES:
+            raise ValueError(f"未知的已收录讲座处理方式: {mode}")
+        if mode == 'off':
+            return self
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        import sqlite3
+
+        conn = sqlite3.connect(path,
+                               timeout=30,
+                               check_same_thread=False,
+                               isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(_SCHEMA)
+        columns = {
+            row[1]
+            for row in conn.execute('PRAGMA table_info(notices)')
+        }
+        if 'extractor' not in columns:
+            conn.execute("ALTER TABLE notices "
+                         "ADD COLUMN extractor TEXT NOT NULL DEFAULT ''")
+        with self._lock:
+            self._conn = conn
+            self.path = path
+            self.mode = mode
+            self._visible_before = time.time()
+            self._rebuild_bloom()
+        return self
+
+    def _rebuild_bloom(self):
+        count = self._conn.execute('SELECT COUNT(*) FROM notices').fetchone()[0]
+        bloom = BloomFilter(max(BLOOM_MIN_CAPACITY, count * 2))
+        for (key, ) in self._conn.execute('SELECT subject_key FROM notices'):
+            bloom.add(key)
+        self._bloom = bloom
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+            self._bloom = None
+            self._new_lectures.clear()
+            self._new_notices.clear()
+            self.path = None
+            self.mode = 'off'
+
+    def counts(self) -> Tuple[int, int]:
+        with self._lock:
+            if self._conn is None:
+                return 0, 0
+            lectures = self._conn.execute(
+                'SELECT COUNT(*) FROM lectures').fetchone()[0]
+            notices = self._conn.execute(
+                'SELECT COUNT(*) FROM notices').fetchone()[0]
+        return lectures, notices
+
+    def known_notice(self, email_data: Dict,
+                     extractor: str = '') -> Optional[List[LectureRecord]]:
+        if email_data.get('error'):
+            return None
+        subject = subject_key(email_data.get('subject'))
+        with self._lock:
+            if self._conn is None or not subject or subject not in self._bloom:
+                return None
+            row = self._conn.execute(
+                'SELECT lectures, output FROM notices '
+                'WHERE subject_key = ? AND body_digest = ? AND extractor = ? '
+                'AND first_seen < ?',
+                (subject, body_digest(email_data.get('body')), extractor,
+                 self._visible_before)).fetchone()
+        if row is None:
+            return None
+
+        lectures = []
+        for lecture in json.loads(row[0]):
+            record = LectureRecord.from_dict(lecture)
+            record.known_from = row[1]
+            lectures.append(record)
+        return lectures
+
+    def known_lecture(self, lecture: LectureRecord) -> Optional[str]:
+        key = lecture_key(lecture)
+        if key is None:
+            return None
+        with self._lock:
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                'SELECT output FROM lectures '
+                'WHERE lecture_key = ? AND first_seen < ?',
+                (key, self._visible_before)).fetchone()
+        return row[0] if row else None
+
+    def remember(self,
+                 email_data: Dict,
+                 lectures: List[LectureRecord],
+                 extractor: str = ''):
+        if self._conn is None:
+            return
+        keyed = [(lecture_key(l), l) for l in lectures]
+        with self._lock:
+            for key, lecture in keyed:
+                if key is not None and key not in self._new_lectures:
+                    self._new_lectures[key] = (key, lecture['training_name'],
+                                               lecture.get('start_time'),
+                                               email_data.get('file_name', ''))
+
+            subject = subject_key(email_data.get('subject'))
+            if not subject or not keyed or any(key is None
+                                               for key, _ in keyed):
+                return
+            digest = body_digest(email_data.get('body'))
+            self._new_notices.setdefault(
+                (subject, digest),
+                (subject, digest,
+                 json.dumps([{field: l.get(field)
+                              for field in LECTURE_FIELDS}
+                             for _, l in keyed],
+                            ensure_ascii=False), extractor,
+                 email_data.get('file_name', '')))
+
+    def flush(self, output: str) -> Tuple[int, int]:
+        with self._lock:
+            if self._conn is None:
+                return 0, 0
+            lectures = list(self._new_lectures.values())
+            notices = list(self._new_notices.values())
+            self._new_lectures.clear()
+            self._new_notices.clear()
+
+            self._conn.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO lectures VALUES (?, ?, ?, ?, ?, ?)',
+                    [(key, name, start, output, file_name, now)
+                     for key, name, start, file_name in lectures])
+                added_lectures = self._conn.total_changes - before
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    'INSERT INTO notices (subject_key, body_digest, lectures, '
+                    'output, file_name, first_seen, extractor) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (subject_key, body_digest) DO UPDATE SET '
+                    'lectures = excluded.lectures, '
+                    'extractor = excluded.extractor '
+                    'WHERE notices.extractor != excluded.extractor',
+                    [(subject, digest, data, output, file_name, now, extractor)
+                     for subject, digest, data, extractor, file_name
+                     in notices])
+                added_notices = self._conn.total_changes - before
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+            self._visible_before = time.time()
+            for subject, *_ in notices:
+                self._bloom.add(subject)
+            if self._bloom.count > self._bloom.capacity:
+                self._rebuild_bloom()
+        return added_lectures, added_notices
+
+
+lecture_index = LectureIndex()
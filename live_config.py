@@ -0,0 +1,201 @@
+import os
+import signal
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config import API_CONFIGS, get_max_concurrency
+from config_loader import ConfigLoader
+from metrics import metrics
+
+RELOADABLE_KEYS = ('api_provider', 'model', 'max_concurrency')
+MAX_POOL_WORKERS = 64
+CHECK_INTERVAL = 1.0
+
+
+class ConcurrencyLimiter:
+
+    def __init__(self, limit: int):
+        self._cond = threading.Condition()
+        self.limit = limit
+        self.active = 0
+
+    def resize(self, limit: int):
+        with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+    def __enter__(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+
+_limiters: Dict[str, ConcurrencyLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter(api_name: str) -> ConcurrencyLimiter:
+    limit = get_max_concurrency(api_name)
+    with _limiters_lock:
+        current = _limiters.get(api_name)
+        if current is None:
+            current = _limiters[api_name] = ConcurrencyLimiter(limit)
+    if current.limit != limit:
+        current.resize(limit)
+    return current
+
+
+def set_max_concurrency(api_name: str, limit: int):
+    API_CONFIGS[api_name]['max_concurrency'] = limit
+    limiter(api_name)
+
+
+def validate_concurrency(value: Any) -> Optional[str]:
+    if isinstance(value, bool) or not isinstance(
+            value, int) or not 1 <= value <= MAX_POOL_WORKERS:
+        return f"max_concurrency 必须为 1 到 {MAX_POOL_WORKERS} 之间的整数: {value!r}"
+    return None
+
+
+def _reloadable(config: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: config.get(key) for key in RELOADABLE_KEYS}
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class LiveConfig:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loader: Optional[ConfigLoader] = None
+        self._values: Dict[str, Any] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._signalled = False
+        self._previous_handler = None
+        self.api_provider: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._loader is not None
+
+    def attach(self, loader: ConfigLoader, api_provider: str):
+        self._loader = loader
+        self._values = _reloadable(loader.config)
+        self._mtime = _mtime(loader.config_path)
+        self._checked_at = time.monotonic()
+        self.api_provider = api_provider
+        if hasattr(signal, 'SIGHUP') and (threading.current_thread() is
+                                          threading.main_thread()):
+            self._previous_handler = signal.signal(signal.SIGHUP,
+                                                   self._on_signal)
+
+    def detach(self):
+        if self._previous_handler is not None:
+            signal.signal(signal.SIGHUP, self._previous_handler)
+            self._previous_handler = None
+        self._loader = None
+        self.api_provider = None
+
+    def _on_signal(self, signum, frame):
+        self._signalled = True
+
+    def provider(self, default: str) -> str:
+        return self.api_provider if self.enabled else default
+
+    def pool_size(self, api_name: str) -> int:
+        if self.enabled:
+            return MAX_POOL_WORKERS
+        return get_max_concurrency(api_name)
+
+    def check(self) -> bool:
+        if self._loader is None:
+            return False
+        now = time.monotonic()
+        if not self._signalled and now - self._checked_at < CHECK_INTERVAL:
+            return False
+
+        with self._lock:
+            self._checked_at = now
+            signalled, self._signalled = self._signalled, False
+            mtime = _mtime(self._loader.config_path)
+            if not signalled and mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            return self._reload('SIGHUP' if signalled else 'mtime')
+
+    def _reload(self, trigger: str) -> bool:
+        try:
+            self._loader.reload()
+        except Exception as e:
+            metrics.inc('config_reloads_total', status='error')
+            print(f"\n  警告: 重新加载配置文件失败，保持当前设置: {e}")
+            return False
+
+        values = _reloadable(self._loader.config)
+        changed = {
+            key: value
+            for key, value in values.items()
+            if value != self._values.get(key) and value is not None
+        }
+        if not changed:
+            metrics.inc('config_reloads_total', status='unchanged')
+            return False
+
+        provider = changed.get('api_provider', self.api_provider)
+        if 'api_provider' in changed and values['max_concurrency'] is not None:
+            changed['max_concurrency'] = values['max_concurrency']
+        error = self._validate(provider, changed)
+        if error:
+            metrics.inc('config_reloads_total', status='invalid')
+            print(f"\n  警告: 配置文件修改无效，保持当前设置: {error}")
+            return False
+
+        before = {
+            'api_provider': self.api_provider,
+            'model': API_CONFIGS[self.api_provider]['model'],
+            'max_concurrency': get_max_concurrency(self.api_provider)
+        }
+        if 'model' in changed:
+            API_CONFIGS[provider]['model'] = changed['model']
+        if 'max_concurrency' in changed:
+            set_max_concurrency(provider, changed['max_concurrency'])
+        self.api_provider = provider
+        self._values = values
+
+        metrics.inc('config_reloads_total', status='applied')
+        metrics.event('config_reload',
+                      trigger=trigger,
+                      **{key: changed[key]
+                         for key in RELOADABLE_KEYS if key in changed})
+        print(f"\n  配置已重新加载（{trigger}）: " + '，'.join(
+            f"{key} {before[key]} -> {changed[key]}"
+            for key in RELOADABLE_KEYS if key in changed))
+        return True
+
+    def _validate(self, provider: str, changed: Dict[str, Any]) -> Optional[str]:
+        if provider not in API_CONFIGS:
+            return f"不支持的API: {provider}"
+        if 'api_provider' in changed and not API_CONFIGS[provider]['api_key']:
+            return f"未设置API密钥: {provider}_API_KEY"
+        if 'model' in changed and not isinstance(changed['model'], str):
+            return f"model 必须为字符串: {changed['model']!r}"
+        if 'max_concurrency' in changed:
+            return validate_concurrency(changed['max_concurrency'])
+        return None
+
+
+live_config = LiveConfig()
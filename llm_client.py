@@ -1,13 +1,26 @@
 import json
+import threading
 import time
 from typing import Dict, Optional, List
-import requests
 from config import API_CONFIGS, MAX_RETRIES, REQUEST_TIMEOUT
+from live_config import limiter
+from metrics import metrics
+from response_log import ReplayMiss, prompt_hash, response_log
+
+_local = threading.local()
+
+
+def get_session():
+    session = getattr(_local, "session", None)
+    if session is None:
+        import requests
+        session = _local.session = requests.Session()
+    return session
 
 
 class LLMClient:
 
-    def __init__(self, api_name: str = "zai-plan"):
+    def __init__(self, api_name: str = "zai-plan", model: Optional[str] = None):
         if api_name not in API_CONFIGS:
             raise ValueError(
                 f"不支持的API: {api_name}. 支持的API: {list(API_CONFIGS.keys())}")
@@ -15,32 +28,42 @@ class LLMClient:
         self.config = API_CONFIGS[api_name]
         self.api_name = api_name
         self.api_type = self.config["type"]
+        self.model = model or self.config["model"]
+        self.last_usage: Dict[str, int] = {}
 
-        if not self.config["api_key"]:
+        if not self.config["api_key"] and not response_log.replay:
             raise ValueError(f"未设置API密钥: {api_name}_API_KEY")
 
     def _create_anthropic_request(self, messages: List[Dict[str, str]],
                                   **kwargs) -> Dict:
         system_prompt = kwargs.get("system", "")
-        messages_list = []
+        messages_list = [msg for msg in messages if msg["role"] != "system"]
 
-        if system_prompt:
-            messages_list.append({"role": "user", "content": system_prompt})
-
-        for msg in messages:
-            if msg["role"] != "system":
-                messages_list.append(msg)
-
-        return {
-            "model": kwargs.get("model", self.config["model"]),
+        request = {
+            "model": kwargs.get("model", self.model),
             "max_tokens": kwargs.get("max_tokens", 4096),
             "messages": messages_list
         }
+        if system_prompt:
+            request["system"] = [{
+                "type": "text",
+                "text": system_prompt,
+                "cache_control": {
+                    "type": "ephemeral"
+                }
+            }]
+        return request
 
     def _create_openai_request(self, messages: List[Dict[str, str]],
                                **kwargs) -> Dict:
+        system_prompt = kwargs.get("system", "")
+        if system_prompt and not any(msg["role"] == "system"
+                                     for msg in messages):
+            messages = [{"role": "system", "content": system_prompt}
+                        ] + list(messages)
+
         return {
-            "model": kwargs.get("model", self.config["model"]),
+            "model": kwargs.get("model", self.model),
             "messages": messages,
             "max_tokens": kwargs.get("max_tokens", 4096),
             "temperature": kwargs.get("temperature", 0.0)
@@ -54,25 +77,16 @@ class LLMClient:
                                **kwargs) -> Dict:
         contents = []
 
-        system_prompt = kwargs.get("system", "")
-        if system_prompt:
-            contents.append({
-                "role": "user",
-                "parts": [{
-                    "text": system_prompt
-                }]
-            })
-
         for msg in messages:
             if msg["role"] != "system":
                 contents.append({
-                    "role": msg["role"],
+                    "role": "model" if msg["role"] == "assistant" else "user",
                     "parts": [{
                         "text": msg["content"]
                     }]
                 })
 
-        return {
+        request = {
             "contents": contents,
             "generationConfig": {
                 "maxOutputTokens": kwargs.get("max_tokens", 4096),
@@ -80,6 +94,15 @@ class LLMClient:
             }
         }
 
+        system_prompt = kwargs.get("system", "")
+        if system_prompt:
+            request["systemInstruction"] = {
+                "parts": [{
+                    "text": system_prompt
+                }]
+            }
+        return request
+
     def _call_api(self, request_data: Dict) -> Dict:
         headers = {}
 
@@ -106,7 +129,7 @@ class LLMClient:
         url = self.config["url"]
 
         if self.api_type == "gemini":
-            url = f"{url}/models/{self.config['model']}:generateContent?key={self.config['api_key']}"
+            url = f"{url}/models/{request_data.get('model', self.model)}:generateContent?key={self.config['api_key']}"
         elif self.api_type == "openai":
             url = f"{url}/chat/completions"
         elif self.api_type == "zai":
@@ -114,13 +137,66 @@ class LLMClient:
         elif self.api_type == "anthropic":
             url = f"{url}/v1/messages"
 
-        response = requests.post(url,
-                                 headers=headers,
-                                 json=request_data,
-                                 timeout=REQUEST_TIMEOUT)
+        model = request_data.get("model", self.model)
+        with limiter(self.api_name):
+            start = time.perf_counter()
+            status = "error"
+            try:
+                response = get_session().post(url,
+                                              headers=headers,
+                                              json=request_data,
+                                              timeout=self.config.get(
+                                                  "timeout", REQUEST_TIMEOUT))
+                status = str(response.status_code)
+                if response.status_code == 429:
+                    metrics.inc("llm_rate_limited_total",
+                                provider=self.api_name)
+
+                response.raise_for_status()
+                return response.json()
+            finally:
+                elapsed = time.perf_counter() - start
+                metrics.add_stage("http", elapsed)
+                metrics.observe("llm_request_seconds",
+                                elapsed,
+                                provider=self.api_name,
+                                model=model)
+                metrics.inc("llm_requests_total",
+                            provider=self.api_name,
+                            status=status)
+
+    def _parse_usage(self, response: Dict) -> Dict[str, int]:
+        if self.api_type == "gemini":
+            usage = response.get("usageMetadata") or {}
+            return {
+                "prompt_tokens": usage.get("promptTokenCount", 0),
+                "completion_tokens": usage.get("candidatesTokenCount", 0),
+                "cached_tokens": usage.get("cachedContentTokenCount", 0)
+            }
 
-        response.raise_for_status()
-        return response.json()
+        usage = response.get("usage") or {}
+        if self.api_type == "anthropic":
+            return {
+                "prompt_tokens":
+                usage.get("input_tokens", 0) +
+                usage.get("cache_read_input_tokens", 0) +
+                usage.get("cache_creation_input_tokens", 0),
+                "completion_tokens":
+                usage.get("output_tokens", 0),
+                "cached_tokens":
+                usage.get("cache_read_input_tokens", 0)
+            }
+
+        details = usage.get("prompt_tokens_details") or {}
+        return {
+            "prompt_tokens":
+            usage.get("prompt_tokens", 0),
+            "completion_tokens":
+            usage.get("completion_tokens", 0),
+            "cached_tokens":
+            details.get("cached_tokens")
+            or usage.get("prompt_cache_hit_tokens", 0)
+        }
 
     def _parse_response(self, response: Dict) -> str:
         try:
@@ -149,18 +225,32 @@ class LLMClient:
         else:
             raise ValueError(f"不支持的API类型: {self.api_type}")
 
+        model = request_data.get("model", self.model)
+        key = prompt_hash(self.api_name,
+                          request_data) if response_log.enabled else None
+        if response_log.replay:
+            logged = response_log.get(key)
+            if logged is None:
+                metrics.inc("replay_misses_total", provider=self.api_name)
+                raise ReplayMiss(f"响应日志中没有该请求的记录 ({key[:12]})")
+            metrics.inc("replay_hits_total", provider=self.api_name)
+            text, self.last_usage = logged
+            return text
+
         last_error = None
         for attempt in range(MAX_RETRIES):
+            if attempt:
+                metrics.inc("llm_retries_total", provider=self.api_name)
             try:
                 response = self._call_api(request_data)
-                return self._parse_response(response)
-            except requests.exceptions.RequestException as e:
-                last_error = e
-                if attempt < MAX_RETRIES - 1:
-                    wait_time = 2**attempt
-                    time.sleep(wait_time)
-                else:
-                    raise
+                text = self._parse_response(response)
+                self.last_usage = self._parse_usage(response)
+                metrics.record_usage(self.api_name, model,
+                                     **self.last_usage)
+                if key:
+                    response_log.put(key, self.api_name, model, text,
+                                     self.last_usage)
+                return text
             except Exception as e:
                 last_error = e
                 if attempt < MAX_RETRIES - 1:
@@ -172,6 +262,10 @@ class LLMClient:
         raise last_error if last_error else Exception("API调用失败")
 
     def extract_json(self, text: str) -> Optional[Dict]:
+        with metrics.stage("json_extract"):
+            return self._extract_json(text)
+
+    def _extract_json(self, text: str) -> Optional[Dict]:
         import re
 
         json_pattern = r'\[[^\[\]]*(?:\[[^\[\]]*\][^\[\]]*)*\]'
@@ -0,0 +1,286 @@
+import mmap
+import os
+import re
+import tarfile
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from eml_parser import parse_eml_bytes, parse_eml_file
+from file_walker import EML_SUFFIXES, iter_files, path_matches
+from metrics import metrics
+from sharding import Shard, ShardSelector
+
+MBOX_SUFFIXES = ('.mbox', '.mbx')
+ZIP_SUFFIXES = ('.zip', )
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz',
+                '.txz')
+SOURCE_SUFFIXES = EML_SUFFIXES + MBOX_SUFFIXES + ZIP_SUFFIXES + TAR_SUFFIXES
+
+MAILDIR_SUBDIRS = ('cur', 'new', 'tmp')
+
+_MBOXRD_ESCAPE = re.compile(rb'^>(>*From )', re.MULTILINE)
+
+
+def error_record(file_path: str, file_name: str, error: Exception) -> dict:
+    return {
+        'file_path': file_path,
+        'file_name': file_name,
+        'subject': '',
+        'from': '',
+        'date': '',
+        'body': '',
+        'error': str(error)
+    }
+
+
+def is_maildir(path: str) -> bool:
+    return all(
+        os.path.isdir(os.path.join(path, sub)) for sub in MAILDIR_SUBDIRS)
+
+
+def is_mbox_file(path: str) -> bool:
+    if path.lower().endswith(MBOX_SUFFIXES):
+        return True
+    try:
+        with open(path, 'rb') as f:
+            return f.read(5) == b'From '
+    except OSError:
+        return False
+
+
+def build_mbox_index(data) -> List[Tuple[int, int]]:
+    starts = []
+    if data[:5] == b'From ':
+        starts.append(0)
+
+    pos = data.find(b'\nFrom ')
+    while pos != -1:
+        starts.append(pos + 1)
+        pos = data.find(b'\nFrom ', pos + 1)
+
+    ends = starts[1:] + [len(data)]
+    return list(zip(starts, ends))
+
+
+def _mbox_message_bytes(data, start: int, end: int) -> bytes:
+    body_start = data.find(b'\n', start, end)
+    raw = data[body_start + 1:end] if body_start != -1 else b''
+    if b'>From ' in raw:
+        raw = _MBOXRD_ESCAPE.sub(rb'\1', raw)
+    return raw
+
+
+def iter_mbox_messages(path: str) -> Iterator[Tuple[str, str, bytes]]:
+    name = os.path.basename(path)
+    if os.path.getsize(path) == 0:
+        return
+
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start, end in build_mbox_index(mm):
+                yield (f"{path}#{start}", f"{name}#{start}",
+                       _mbox_message_bytes(mm, start, end))
+
+
+def iter_maildir_files(
+        path: str,
+        name: Optional[str] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None) -> Iterator[Tuple[str, str]]:
+    name = name or os.path.basename(os.path.normpath(path))
+    for sub in ('cur', 'new'):
+        sub_dir = os.path.join(path, sub)
+        try:
+            with os.scandir(sub_dir) as it:
+                entries = sorted((e for e in it if e.is_file()),
+                                 key=lambda e: e.name)
+        except OSError as e:
+            print(f"  警告: 无法读取目录 {sub_dir} - {e}")
+            continue
+
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if not path_matches(f"{sub}/{entry.name}", include, exclude):
+                continue
+            unique_name = entry.name.split(':', 1)[0]
+            yield entry.path, f"{name}/{unique_name}"
+
+
+def iter_zip_messages(
+        path: str,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None
+) -> Iterator[Tuple[str, str, bytes]]:
+    name = os.path.basename(path)
+    with zipfile.ZipFile(path) as zf:
+        for info in sorted(zf.infolist(), key=lambda i: i.filename):
+            if info.is_dir():
+                continue
+            member = info.filename
+            if not member.lower().endswith(EML_SUFFIXES):
+                continue
+            if not path_matches(member, include, exclude):
+                continue
+            yield f"{path}/{member}", f"{name}/{member}", zf.read(info)
+
+
+def iter_tar_messages(
+        path: str,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None
+) -> Iterator[Tuple[str, str, bytes]]:
+    name = os.path.basename(path)
+    with tarfile.open(path, 'r|*') as tf:
+        for info in tf:
+            if not info.isfile():
+                continue
+            member = info.name
+            if not member.lower().endswith(EML_SUFFIXES):
+                continue
+            if not path_matches(member, include, exclude):
+                continue
+            f = tf.extractfile(info)
+            if f is None:
+                continue
+            yield f"{path}/{member}", f"{name}/{member}", f.read()
+
+
+def _parse_file(file_path: str, parse_options: Dict[str, Any]) -> dict:
+    with metrics.stage('parse'):
+        return parse_eml_file(file_path, **parse_options)
+
+
+def _with_seq(record: dict, seq: int) -> dict:
+    record['seq'] = seq
+    return record
+
+
+def _records_from_raw(messages: Iterator[Tuple[str, str, bytes]],
+                      parse_options: Dict[str, Any],
+                      selector: ShardSelector) -> Iterator[dict]:
+    for file_path, file_name, raw in metrics.timed_iter(
+            messages, 'discovery'):
+        seq = selector.take(file_path)
+        if seq is None:
+            continue
+        try:
+            with metrics.stage('parse'):
+                record = parse_eml_bytes(raw, file_path, file_name,
+                                         **parse_options)
+            yield _with_seq(record, seq)
+        except Exception as e:
+            print(f"  警告: 解析失败 - {file_name}: {e}")
+            yield _with_seq(error_record(file_path, file_name, e), seq)
+
+
+def _records_from_container(path: str,
+                            parse_options: Dict[str, Any],
+                            selector: ShardSelector,
+                            include: Optional[Sequence[str]] = None,
+                            exclude: Optional[Sequence[str]] = None
+                            ) -> Iterator[dict]:
+    lower = path.lower()
+    try:
+        if lower.endswith(ZIP_SUFFIXES):
+            yield from _records_from_raw(
+                iter_zip_messages(path, include, exclude), parse_options,
+                selector)
+        elif lower.endswith(TAR_SUFFIXES):
+            yield from _records_from_raw(
+                iter_tar_messages(path, include, exclude), parse_options,
+                selector)
+        else:
+            yield from _records_from_raw(iter_mbox_messages(path),
+                                         parse_options, selector)
+    except (OSError, ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+        print(f"  警告: 无法读取归档 {path} - {e}")
+        seq = selector.take(path)
+        if seq is not None:
+            yield _with_seq(error_record(path, os.path.basename(path), e),
+                            seq)
+
+
+def _records_from_maildir(path: str,
+                          parse_options: Dict[str, Any],
+                          selector: ShardSelector,
+                          name: Optional[str] = None,
+                          include: Optional[Sequence[str]] = None,
+                          exclude: Optional[Sequence[str]] = None
+                          ) -> Iterator[dict]:
+    name = name or os.path.basename(os.path.normpath(path))
+    for file_path, file_name in metrics.timed_iter(
+            iter_maildir_files(path, name, include, exclude), 'discovery'):
+        seq = selector.take(file_path, file_name)
+        if seq is None:
+            continue
+        try:
+            record = _parse_file(file_path, parse_options)
+            record['file_name'] = file_name
+            yield _with_seq(record, seq)
+        except Exception as e:
+            print(f"  警告: 解析失败 - {file_name}: {e}")
+            yield _with_seq(error_record(file_path, file_name, e), seq)
+
+    try:
+        with os.scandir(path) as it:
+            folders = sorted((e.name, e.path) for e in it
+                             if e.name.startswith('.') and e.is_dir())
+    except OSError:
+        folders = []
+    for folder_name, folder in folders:
+        if is_maildir(folder):
+            yield from _records_from_maildir(folder, parse_options,
+                                             selector,
+                                             f"{name}/{folder_name}",
+                                             include, exclude)
+
+
+def iter_email_records(input_path: str,
+                       include: Optional[Sequence[str]] = None,
+                       exclude: Optional[Sequence[str]] = None,
+                       max_depth: Optional[int] = None,
+                       parse_options: Optional[Dict[str, Any]] = None,
+                       shard: Optional[Shard] = None) -> Iterator[dict]:
+    parse_options = parse_options or {}
+    selector = ShardSelector(input_path, shard)
+
+    if os.path.isdir(input_path) and is_maildir(input_path):
+        yield from _records_from_maildir(input_path, parse_options, selector,
+                                         include=include,
+                                         exclude=exclude)
+        return
+
+    if os.path.isfile(input_path) and not input_path.lower().endswith(
+            EML_SUFFIXES):
+        if input_path.lower().endswith(ZIP_SUFFIXES + TAR_SUFFIXES) or \
+                is_mbox_file(input_path):
+            yield from _records_from_container(input_path, parse_options,
+                                               selector, include, exclude)
+        return
+
+    paths = iter_files(input_path,
+                       SOURCE_SUFFIXES,
+                       include=include,
+                       exclude=exclude,
+                       max_depth=max_depth,
+                       yield_dir=is_maildir,
+                       include_suffixes=EML_SUFFIXES)
+    for path in metrics.timed_iter(paths, 'discovery'):
+        if os.path.isdir(path):
+            yield from _records_from_maildir(path, parse_options, selector,
+                                             include=include,
+                                             exclude=exclude)
+        elif path.lower().endswith(EML_SUFFIXES):
+            seq = selector.take(path)
+            if seq is None:
+                continue
+            try:
+                yield _with_seq(_parse_file(path, parse_options), seq)
+            except Exception as e:
+                print(f"  警告: 解析失败 - {os.path.basename(path)}: {e}")
+                yield _with_seq(
+                    error_record(path, os.path.basename(path), e), seq)
+        else:
+            yield from _records_from_container(path, parse_options,
+                                               selector, include, exclude)
@@ -2,136 +2,148 @@ import os
 import sys
 import argparse
 import csv
+import json
+import time
 from datetime import datetime
-from typing import List
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
-import glob
-
-from eml_parser import parse_eml_file
-from extractor import extract_training_info_batch
-from config import DEFAULT_API, get_available_apis
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+
+from eml_parser import DEFAULT_MAX_ATTACHMENT_BYTES, parse_eml_file
+from file_walker import EML_SUFFIXES, iter_files
+from mail_sources import error_record, iter_email_records
+from chunking import CHUNK_CHARS, CHUNK_THRESHOLD_CHARS
+from extractor import (LECTURE_FIELDS, SYSTEM_PROMPT,
+                       create_extraction_prompt, extract_training_info_batch)
+from config import (API_CONFIGS, DEFAULT_API, get_available_apis,
+                    get_fast_model, get_max_concurrency)
 from config_loader import ConfigLoader
+from live_config import live_config, set_max_concurrency, validate_concurrency
+from metrics import STAGES, metrics
+from records import LectureRecord
+from response_log import response_log
+from scheduler import format_eta
+from sharding import parse_shard
+
+WATCH_SETTLE_SECONDS = 1.0
+
+
+def iter_eml_files(input_path: str,
+                   include: Optional[List[str]] = None,
+                   exclude: Optional[List[str]] = None,
+                   max_depth: Optional[int] = None) -> Iterator[str]:
+    return iter_files(input_path,
+                      EML_SUFFIXES,
+                      include=include,
+                      exclude=exclude,
+                      max_depth=max_depth)
+
+
+def _parse_or_error(file_path: str, parse_options: Optional[dict] = None) -> dict:
+    try:
+        with metrics.stage('parse'):
+            return parse_eml_file(file_path, **(parse_options or {}))
+    except Exception as e:
+        print(f"  警告: 解析失败 - {os.path.basename(file_path)}: {e}")
+        return error_record(file_path, os.path.basename(file_path), e)
+
+
+def print_progress(current: int,
+                   total: Optional[int],
+                   filename: str,
+                   eta: Optional[float] = None):
+    if not total:
+        print(f"\r[{'?'*20}] {current}/? - {filename[:30]}",
+              end='',
+              flush=True)
+        return
 
-
-def find_eml_files(input_dir: str) -> List[str]:
-    eml_files = []
-
-    if os.path.isfile(input_dir):
-        if input_dir.lower().endswith('.eml'):
-            eml_files.append(input_dir)
-    elif os.path.isdir(input_dir):
-        eml_files.extend(glob.glob(os.path.join(input_dir, '*.eml')))
-        eml_files.extend(
-            glob.glob(os.path.join(input_dir, '**/*.eml'), recursive=True))
-
-    return sorted(eml_files)
-
-
-def parse_all_emls(eml_files: List[str]) -> List[dict]:
-    parsed_data = []
-    total = len(eml_files)
-
-    print(f"\n开始解析 {total} 个EML文件...")
-
-    for i, file_path in enumerate(eml_files):
-        try:
-            print(f"[{i+1}/{total}] 解析: {os.path.basename(file_path)}")
-            data = parse_eml_file(file_path)
-            parsed_data.append(data)
-        except Exception as e:
-            print(f"  警告: 解析失败 - {e}")
-            parsed_data.append({
-                'file_path': file_path,
-                'file_name': os.path.basename(file_path),
-                'subject': '',
-                'from': '',
-                'date': '',
-                'body': '',
-                'error': str(e)
-            })
-
-    print(f"完成！成功解析 {len(parsed_data)} 个文件")
-    return parsed_data
-
-
-def print_progress(current: int, total: int, filename: str):
     percentage = (current / total) * 100
     print(
-        f"\r[{'='*int(percentage/5):<20}] {current}/{total} ({percentage:.1f}%) - {filename[:30]}",
+        f"\r[{'='*int(percentage/5):<20}] {current}/{total} ({percentage:.1f}%) ETA {format_eta(eta)} - {filename[:30]}",
         end='',
         flush=True)
     if current == total:
         print()
 
 
-def save_to_csv(results: List[dict], output_path: str):
+JSONL_FIELDS = ('seq', 'file_name', 'file_path') + LECTURE_FIELDS
+
+OUTPUT_HEADERS = [
+    '文件名', '培训/会议名称', '开始时间', '结束时间', '学时(小时)', '地点', '讲座目的', '讲座内容',
+    '提取状态'
+]
+
+
+def _output_row(result: LectureRecord) -> list:
+    status = '成功' if result.get('training_name') else (
+        '失败: ' + result.get('error', '未知错误'))
+    if result.get('known_from') and result.get('training_name'):
+        status = f"成功（已收录: {result['known_from']}）"
+    return [
+        result.get('file_name', ''),
+        result.get('training_name', ''),
+        result.get('start_time', ''),
+        result.get('end_time', ''),
+        result.get('duration_hours', ''),
+        result.get('location', ''),
+        result.get('purpose', ''),
+        result.get('content', ''),
+        status
+    ]
+
+
+def save_to_csv(results: List[LectureRecord], output_path: str, append: bool = False):
     os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
 
-    fieldnames = [
-        '文件名', '培训/会议名称', '开始时间', '结束时间', '学时(小时)', '地点', '讲座目的', '讲座内容',
-        '提取状态'
-    ]
+    exists = append and os.path.exists(output_path) and os.path.getsize(
+        output_path) > 0
+    mode = 'a' if exists else 'w'
+    encoding = 'utf-8' if exists else 'utf-8-sig'
 
-    with open(output_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
+    with open(output_path, mode, newline='', encoding=encoding) as csvfile:
+        writer = csv.writer(csvfile)
+        if not exists:
+            writer.writerow(OUTPUT_HEADERS)
 
         for result in results:
-            status = '成功' if result.get('training_name') else (
-                '失败: ' + result.get('error', '未知错误'))
-
-            writer.writerow({
-                '文件名': result.get('file_name', ''),
-                '培训/会议名称': result.get('training_name', ''),
-                '开始时间': result.get('start_time', ''),
-                '结束时间': result.get('end_time', ''),
-                '学时(小时)': result.get('duration_hours', ''),
-                '地点': result.get('location', ''),
-                '讲座目的': result.get('purpose', ''),
-                '讲座内容': result.get('content', ''),
-                '提取状态': status
-            })
+            writer.writerow(_output_row(result))
 
     print(f"\nCSV文件已保存: {output_path}")
 
 
-def save_to_excel(results: List[dict], output_path: str):
+def save_to_excel(results: List[LectureRecord], output_path: str, append: bool = False):
+    import openpyxl
+    from openpyxl.styles import Font, Alignment, PatternFill
+
     os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
 
+    if append and os.path.exists(output_path):
+        wb = openpyxl.load_workbook(output_path)
+        ws = wb.active
+        for result in results:
+            ws.append(_output_row(result))
+        wb.save(output_path)
+        print(f"\nExcel文件已追加: {output_path}")
+        return
+
     wb = openpyxl.Workbook()
     ws = wb.active
     ws.title = "学术报告信息"
 
-    headers = [
-        '文件名', '培训/会议名称', '开始时间', '结束时间', '学时(小时)', '地点', '讲座目的', '讲座内容',
-        '提取状态'
-    ]
-
     header_fill = PatternFill(start_color="4472C4",
                               end_color="4472C4",
                               fill_type="solid")
     header_font = Font(bold=True, color="FFFFFF")
 
-    for col, header in enumerate(headers, start=1):
+    for col, header in enumerate(OUTPUT_HEADERS, start=1):
         cell = ws.cell(row=1, column=col, value=header)
         cell.fill = header_fill
         cell.font = header_font
         cell.alignment = Alignment(horizontal='center', vertical='center')
 
-    for row, result in enumerate(results, start=2):
-        status = '成功' if result.get('training_name') else (
-            '失败: ' + result.get('error', '未知错误'))
-
-        ws.cell(row=row, column=1, value=result.get('file_name', ''))
-        ws.cell(row=row, column=2, value=result.get('training_name', ''))
-        ws.cell(row=row, column=3, value=result.get('start_time', ''))
-        ws.cell(row=row, column=4, value=result.get('end_time', ''))
-        ws.cell(row=row, column=5, value=result.get('duration_hours', ''))
-        ws.cell(row=row, column=6, value=result.get('location', ''))
-        ws.cell(row=row, column=7, value=result.get('purpose', ''))
-        ws.cell(row=row, column=8, value=result.get('content', ''))
-        ws.cell(row=row, column=9, value=status)
+    for result in results:
+        ws.append(_output_row(result))
 
     for column in ws.columns:
         max_length = 0
@@ -149,7 +161,42 @@ def save_to_excel(results: List[dict], output_path: str):
     print(f"\nExcel文件已保存: {output_path}")
 
 
-def print_summary(results: List[dict]):
+def save_to_jsonl(results: List[LectureRecord], output_path: str, append: bool = False):
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+    with open(output_path, 'a' if append else 'w', encoding='utf-8') as f:
+        for result in results:
+            row = {key: result.get(key) for key in JSONL_FIELDS}
+            if result.get('error'):
+                row['error'] = result['error']
+            if result.get('known_from'):
+                row['known_from'] = result['known_from']
+            f.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    print(f"\nJSONL文件已保存: {output_path}")
+
+
+def load_jsonl(path: str) -> List[LectureRecord]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [
+            LectureRecord.from_dict(json.loads(line)) for line in f
+            if line.strip()
+        ]
+
+
+OUTPUT_FORMATS = {
+    '.xlsx': save_to_excel,
+    '.csv': save_to_csv,
+    '.jsonl': save_to_jsonl
+}
+
+
+def save_results(results: List[LectureRecord], output_path: str, append: bool = False):
+    output_ext = os.path.splitext(output_path)[1].lower()
+    OUTPUT_FORMATS[output_ext](results, output_path, append)
+
+
+def print_summary(results: List[LectureRecord]):
     total_records = len(results)
     success = sum(1 for r in results if r.get('training_name'))
     failed = total_records - success
@@ -174,7 +221,259 @@ def print_summary(results: List[dict]):
             print(f"  - {fname}: {error}")
 
 
+def print_metrics_summary():
+    snapshot = metrics.snapshot()
+    tokens = metrics.token_totals()
+
+    print("\n" + "=" * 50)
+    print("性能统计")
+    print("=" * 50)
+    print(f"总耗时: {snapshot['wall_seconds']:.1f} 秒")
+    for name in STAGES:
+        stage = snapshot['stages'].get(name)
+        if stage:
+            print(f"  {name:<14} {stage['seconds']:>10.2f} 秒  ({stage['count']} 次)")
+    for histogram in snapshot['histograms']:
+        if histogram['name'] == 'llm_request_seconds':
+            print(f"LLM请求延迟 ({histogram['labels'].get('model', '')}): "
+                  f"p50={histogram['p50']}s p95={histogram['p95']}s "
+                  f"p99={histogram['p99']}s")
+    print(f"LLM请求数: {int(metrics.counter_value('llm_requests_total'))}，"
+          f"重试: {int(metrics.counter_value('llm_retries_total'))}，"
+          f"429: {int(metrics.counter_value('llm_rate_limited_total'))}")
+    fast = int(metrics.counter_value('cascade_emails_total', tier='fast'))
+    strong = int(metrics.counter_value('cascade_emails_total', tier='strong'))
+    if fast or strong:
+        print(f"分级提取: 快速模型通过 {fast} 封，升级到主模型 {strong} 封")
+    hits = int(metrics.counter_value('replay_hits_total'))
+    misses = int(metrics.counter_value('replay_misses_total'))
+    if hits or misses:
+        print(f"回放: 命中 {hits} 次，日志中缺失 {misses} 次")
+    reloads = int(metrics.counter_value('config_reloads_total',
+                                        status='applied'))
+    if reloads:
+        print(f"配置热更新: {reloads} 次，当前 {live_config.api_provider} "
+              f"({API_CONFIGS[live_config.api_provider]['model']}，"
+              f"并发 {get_max_concurrency(live_config.api_provider)})")
+    chunked = int(metrics.counter_value('chunked_emails_total'))
+    if chunked:
+        print(f"长邮件分段: {chunked} 封，共 "
+              f"{int(metrics.counter_value('email_chunks_total'))} 段")
+    notices = int(metrics.counter_value('known_notices_total'))
+    known = int(metrics.counter_value('known_lectures_total'))
+    if notices or known:
+        print(f"已收录: 跳过LLM的通知 {notices} 封，重复讲座 {known} 场")
+    read = sum(
+        int(metrics.counter_value('attachments_total', status=status))
+        for status in ('ok', 'cached'))
+    failed = sum(
+        int(metrics.counter_value('attachments_total', status=status))
+        for status in ('error', 'timeout', 'too_large', 'unsupported'))
+    if read or failed:
+        print(f"附件提取: 补充 {int(metrics.counter_value('attachment_emails_total'))} "
+              f"封邮件，读取 {read} 个附件（缓存 "
+              f"{int(metrics.counter_value('attachments_total', status='cached'))} 个），"
+              f"失败或跳过 {failed} 个")
+    cache_ratio = tokens['cached_tokens'] / tokens['prompt_tokens'] if tokens[
+        'prompt_tokens'] else 0
+    print(f"Token: 输入 {tokens['prompt_tokens']}，输出 {tokens['completion_tokens']}，"
+          f"缓存命中 {tokens['cached_tokens']} ({cache_ratio:.0%})")
+    print("=" * 50)
+
+
+def update_lecture_index(label: str):
+    from lecture_index import lecture_index
+
+    if not lecture_index.enabled:
+        return
+    lectures, notices = lecture_index.flush(label)
+    if lectures or notices:
+        print(f"讲座索引: 新增 {lectures} 场讲座，新增或更新 {notices} 封通知")
+
+
+def write_metrics(json_path: Optional[str], prom_path: Optional[str]):
+    if json_path:
+        metrics.write_json(json_path)
+        print(f"指标报告已保存: {json_path}")
+    if prom_path:
+        metrics.write_prometheus(prom_path)
+        print(f"Prometheus指标已保存: {prom_path}")
+
+
+def run_dry_run(records: Iterable[dict], api_provider: str, budget,
+                metrics_json: Optional[str]):
+    from budget import (DEFAULT_OUTPUT_TOKENS_PER_EMAIL, estimate_run,
+                        load_observed_throughput)
+
+    output_tokens = (budget.output_tokens_per_email
+                     if budget else DEFAULT_OUTPUT_TOKENS_PER_EMAIL)
+    prompts = ({
+        'file_name': record.get('file_name', ''),
+        'prompt': SYSTEM_PROMPT + create_extraction_prompt(record)
+    } for record in records)
+    report = estimate_run(prompts, api_provider, output_tokens,
+                          load_observed_throughput(metrics_json))
+
+    basis = '基于上次运行的实际吞吐量' if report[
+        'duration_basis'] == 'observed' else '基于默认单次请求耗时估算'
+    per_email = report['prompt_tokens_per_email']
+
+    print("\n" + "=" * 50)
+    print("预估（dry-run，未调用API）")
+    print("=" * 50)
+    print(f"API提供商: {report['api']} ({report['model']})")
+    print(f"邮件数: {report['emails']}")
+    print(f"输入token: {report['prompt_tokens']} "
+          f"(每封 最少 {per_email['min']} / 平均 {per_email['mean']} / 最多 {per_email['max']})")
+    print(f"输出token(估计): {report['completion_tokens']}")
+    print(f"预计费用: {report['cost']:.4f} {report['currency']}")
+    print(f"预计耗时: {report['duration_seconds'] / 60:.1f} 分钟（{basis}，并发 {report['max_concurrency']}）")
+    if budget:
+        print(f"预算: {budget.describe()}")
+        if budget.max_tokens and report['prompt_tokens'] + report[
+                'completion_tokens'] > budget.max_tokens:
+            print("警告: 预计token数超出预算，运行将在预算用尽时停止")
+        if budget.max_cost and report['cost'] > budget.max_cost:
+            print("警告: 预计费用超出预算，运行将在预算用尽时停止")
+    if report['largest']:
+        print("输入最大的邮件:")
+        for row in report['largest']:
+            print(f"  - {row['file_name']}: {row['prompt_tokens']} tokens")
+    print("=" * 50)
+
+
+def run_calibration(records: Iterable[dict], config_path: str,
+                    base_config: dict, report_path: str, sample_size: int,
+                    levels: List[int], apis: Optional[List[str]], budget):
+    from calibration import calibrate, candidates, write_recommended_config
+
+    if not candidates(apis):
+        print("错误: 没有可校准的API（未设置API密钥）")
+        sys.exit(1)
+
+    print(f"\n开始校准: 每个模型依次以并发 {levels} 提取同一批抽样邮件")
+    report = calibrate(records, sample_size, levels, apis, budget)
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print("\n" + "=" * 50)
+    print("校准结果")
+    print("=" * 50)
+    print(f"{'API/模型':<32} {'并发':>4} {'封/秒':>8} {'p95(s)':>8} {'失败率':>6} {'429':>4} {'费用':>8}")
+    for trial in report['trials']:
+        print(f"{trial['api'] + '/' + trial['model']:<32} "
+              f"{trial['max_concurrency']:>4} "
+              f"{trial['emails_per_second'] or 0:>8.2f} "
+              f"{trial['p95'] if trial['p95'] is not None else '-':>8} "
+              f"{trial['error_rate']:>6.0%} {trial['rate_limited']:>4} "
+              f"{trial['cost']:>8.4f}")
+    print("提取结果一致性（与各模型多数结果的平均Jaccard相似度）:")
+    for candidate, score in report['agreement'].items():
+        print(f"  {candidate:<32} {score}")
+    print(f"详细报告: {report_path}")
+
+    choice = report['recommendation']
+    if not choice:
+        print("警告: 没有可推荐的组合（失败率过高、被限流或预算不足），未生成推荐配置")
+        print("=" * 50)
+        return
+    write_recommended_config(config_path, base_config, report)
+    print(f"推荐: {choice['api']} / {choice['model']}，并发 "
+          f"{choice['max_concurrency']}（{choice['emails_per_second']} 封/秒）")
+    print(f"推荐配置已保存: {config_path}")
+    print(f"完整运行: python main.py -c {config_path}")
+    print("=" * 50)
+
+
+def run_watch(input_dir: str, output_file: str, api_provider: str,
+              include: Optional[List[str]], exclude: Optional[List[str]],
+              max_depth: Optional[int], parse_options: dict,
+              budget, metrics_json: Optional[str],
+              metrics_prom: Optional[str], poll_interval: float,
+              cascade: bool = False,
+              chunk_long: bool = False):
+    from attachments import attachment_extractor
+    from budget import BUDGET_STOP
+    from watcher import load_processed, mark_processed, open_watcher
+
+    output_base = os.path.splitext(output_file)[0]
+    state_path = f"{output_base}.processed"
+    processed = load_processed(state_path)
+
+    watcher = open_watcher(input_dir, EML_SUFFIXES, include, exclude,
+                           max_depth, poll_interval)
+    pending = [
+        os.path.abspath(p)
+        for p in iter_eml_files(input_dir, include, exclude, max_depth)
+    ]
+
+    print(f"\n监听目录: {input_dir}（{type(watcher).__name__}），按 Ctrl+C 退出")
+    print(f"已处理记录: {state_path}（{len(processed)} 个文件）")
+
+    try:
+        with ThreadPoolExecutor(
+                max_workers=live_config.pool_size(api_provider)) as executor:
+            while True:
+                live_config.check()
+                if not pending:
+                    pending = watcher.poll(poll_interval)
+                    if pending:
+                        time.sleep(WATCH_SETTLE_SECONDS)
+                        pending += watcher.poll(0)
+
+                new_files = [
+                    p for p in dict.fromkeys(
+                        os.path.abspath(p) for p in pending)
+                    if p not in processed
+                ]
+                pending = []
+                if not new_files:
+                    continue
+
+                if budget and budget.state() == BUDGET_STOP:
+                    print("预算已用尽，停止监听")
+                    break
+
+                print(f"\n[{datetime.now():%H:%M:%S}] 发现 {len(new_files)} 个新文件")
+                records = attachment_extractor.iter_records(
+                    _parse_or_error(p, parse_options) for p in new_files)
+                results = extract_training_info_batch(records,
+                                                      api_provider,
+                                                      print_progress,
+                                                      budget,
+                                                      executor=executor,
+                                                      cascade=cascade,
+                                                      chunk_long=chunk_long)
+
+                with metrics.stage('write'):
+                    save_results(results, output_file, append=True)
+                update_lecture_index(os.path.basename(output_file))
+
+                mark_processed(state_path, new_files)
+                processed.update(new_files)
+
+                success = sum(1 for r in results if r.get('training_name'))
+                print(f"本批提取 {len(results)} 条记录，成功 {success} 条")
+                write_metrics(metrics_json, metrics_prom)
+    except KeyboardInterrupt:
+        print("\n已停止监听")
+    finally:
+        watcher.close()
+
+    print_metrics_summary()
+    write_metrics(metrics_json, metrics_prom)
+
+
 def main():
+    from attachments import (DEFAULT_TIMEOUT as DEFAULT_ATTACHMENT_TIMEOUT,
+                             attachment_extractor, default_cache_path)
+    from budget import Budget
+    from calibration import DEFAULT_LEVELS, DEFAULT_SAMPLE_SIZE
+    from lecture_index import (DEFAULT_KNOWN_MODE, KNOWN_MODES,
+                               default_index_path, lecture_index)
+    from watcher import DEFAULT_POLL_INTERVAL
+
     parser = argparse.ArgumentParser(
         description='EML邮件学术报告信息提取工具',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -190,12 +489,101 @@ def main():
                         '--config',
                         default='config.yaml',
                         help='配置文件路径（默认: config.yaml）')
-    parser.add_argument('-i', '--input', help='输入EML文件或目录路径（覆盖配置文件）')
+    parser.add_argument('-i',
+                        '--input',
+                        help='输入EML文件、目录、mbox、Maildir或zip/tar.gz归档（覆盖配置文件）')
     parser.add_argument('-o', '--output', help='输出文件路径（覆盖配置文件）')
     parser.add_argument('--api',
                         choices=get_available_apis(),
                         help='选择LLM API提供商（覆盖配置文件）')
     parser.add_argument('--model', help='指定模型名称（覆盖配置文件）')
+    parser.add_argument('--include',
+                        action='append',
+                        help='只处理匹配该通配符的文件，可多次指定（如 "2025-*/*.eml"）')
+    parser.add_argument('--exclude',
+                        action='append',
+                        help='跳过匹配该通配符的文件或目录，可多次指定')
+    parser.add_argument('--max-depth',
+                        type=int,
+                        help='目录递归最大深度，0 表示只扫描输入目录本身')
+    parser.add_argument('--lazy-parse',
+                        action='store_true',
+                        default=None,
+                        help='流式解析EML，跳过大附件内容以降低内存和解析时间')
+    parser.add_argument('--max-payload-bytes',
+                        type=int,
+                        help='流式解析时非文本部分保留的最大字节数，超过则丢弃')
+    parser.add_argument('--attachments',
+                        action='store_true',
+                        default=None,
+                        help='正文缺少时间或地点时，从PDF/DOCX/XLSX附件中提取文本加入提示词')
+    parser.add_argument('--max-attachment-bytes',
+                        type=int,
+                        help='单个附件的最大字节数，超过则不提取'
+                        f'（默认: {DEFAULT_MAX_ATTACHMENT_BYTES}）')
+    parser.add_argument('--attachment-timeout',
+                        type=float,
+                        help=f'单个附件提取的最长秒数（默认: {DEFAULT_ATTACHMENT_TIMEOUT:g}）')
+    parser.add_argument('--attachment-cache',
+                        help='附件文本缓存路径（默认: 输出目录下的 attachments.sqlite）')
+    parser.add_argument('--cascade',
+                        action='store_true',
+                        default=None,
+                        help='先用较小的快速模型提取，校验不通过时再用主模型重新提取')
+    parser.add_argument('--chunk-long',
+                        action='store_true',
+                        default=None,
+                        help='将正文很长的邮件按讲座边界分段并行提取，合并去重')
+    parser.add_argument('--max-concurrency',
+                        type=int,
+                        help='最大并发请求数（覆盖配置文件和API默认值），运行中可修改配置文件调整')
+    parser.add_argument('--dry-run',
+                        action='store_true',
+                        help='只构建提示词并估算token、费用和耗时，不调用API')
+    parser.add_argument('--calibrate',
+                        nargs='?',
+                        const='',
+                        metavar='CONFIG',
+                        help='抽样校准：对每个已配置API的模型以不同并发提取同一批抽样邮件，'
+                        '写出推荐的配置文件（默认: <配置文件名>.calibrated.yaml）')
+    parser.add_argument('--sample-size',
+                        type=int,
+                        default=DEFAULT_SAMPLE_SIZE,
+                        help=f'校准时抽样的邮件数（默认: {DEFAULT_SAMPLE_SIZE}）')
+    parser.add_argument('--levels',
+                        default=','.join(map(str, DEFAULT_LEVELS)),
+                        help='校准时尝试的并发数，逗号分隔（默认: %(default)s）')
+    parser.add_argument('--max-tokens',
+                        type=int,
+                        help='本次运行的token预算（覆盖配置文件 budget.max_tokens）')
+    parser.add_argument('--max-cost',
+                        type=float,
+                        help='本次运行的费用预算（覆盖配置文件 budget.max_cost）')
+    parser.add_argument('--shard',
+                        help='只处理第 i 个分片（共 N 个，格式 i/N），按文件路径的稳定哈希分配')
+    parser.add_argument('--watch',
+                        action='store_true',
+                        help='持续监听输入目录，只处理新到达的EML文件并追加到输出文件')
+    parser.add_argument('--poll-interval',
+                        type=float,
+                        help=f'监听模式下轮询目录的间隔秒数（默认: {DEFAULT_POLL_INTERVAL}）')
+    parser.add_argument('--response-log',
+                        help='LLM原始响应日志路径（默认: 与输出文件同名的 .responses.sqlite）')
+    parser.add_argument('--replay',
+                        metavar='LOG',
+                        help='从已有的响应日志重建输出，不访问网络')
+    parser.add_argument('--known-lectures',
+                        choices=KNOWN_MODES,
+                        help='已收录讲座的处理方式：tag 标记、skip 从输出中去掉、off 不使用讲座索引'
+                        f'（默认: {DEFAULT_KNOWN_MODE}）')
+    parser.add_argument('--lecture-index',
+                        help='跨运行的讲座索引路径（默认: 输出目录下的 lectures.sqlite）')
+    parser.add_argument('--index-label',
+                        help='写入讲座索引的来源名称（默认: 输出文件名）')
+    parser.add_argument('--metrics-json',
+                        help='运行指标JSON报告路径（默认: 与输出文件同名的 .metrics.json）')
+    parser.add_argument('--metrics-prom',
+                        help='Prometheus textfile 指标路径（默认: 与输出文件同名的 .prom）')
 
     args = parser.parse_args()
 
@@ -214,6 +602,25 @@ def main():
     output_file = args.output
     api_provider = args.api
     model = args.model
+    include = args.include
+    exclude = args.exclude
+    max_depth = args.max_depth
+    lazy_parse = args.lazy_parse
+    cascade = args.cascade
+    chunk_long = args.chunk_long
+    max_payload_bytes = args.max_payload_bytes
+    attachments = args.attachments
+    max_attachment_bytes = args.max_attachment_bytes
+    attachment_timeout = args.attachment_timeout
+    attachment_cache = args.attachment_cache
+    metrics_json = args.metrics_json
+    metrics_prom = args.metrics_prom
+    response_log_path = args.response_log
+    max_concurrency = args.max_concurrency
+    known_lectures = args.known_lectures
+    lecture_index_path = args.lecture_index
+    poll_interval = args.poll_interval
+    budget_config = {}
 
     if config_loader:
         if not input_dir:
@@ -224,6 +631,57 @@ def main():
             api_provider = config_loader.get_api_provider()
         if not model:
             model = config_loader.get_model()
+        if not include:
+            include = config_loader.get('include')
+        if not exclude:
+            exclude = config_loader.get('exclude')
+        if max_depth is None:
+            max_depth = config_loader.get('max_depth')
+        if lazy_parse is None:
+            lazy_parse = config_loader.get('lazy_parse')
+        if cascade is None:
+            cascade = config_loader.get('cascade')
+        if chunk_long is None:
+            chunk_long = config_loader.get('chunk_long')
+        if max_payload_bytes is None:
+            max_payload_bytes = config_loader.get('max_payload_bytes')
+        if attachments is None:
+            attachments = config_loader.get('attachments')
+        if max_attachment_bytes is None:
+            max_attachment_bytes = config_loader.get('max_attachment_bytes')
+        if attachment_timeout is None:
+            attachment_timeout = config_loader.get('attachment_timeout')
+        if not attachment_cache:
+            attachment_cache = config_loader.get('attachment_cache')
+        if not metrics_json:
+            metrics_json = config_loader.get('metrics_json')
+        if not metrics_prom:
+            metrics_prom = config_loader.get('metrics_prom')
+        if not response_log_path:
+            response_log_path = config_loader.get('response_log')
+        if poll_interval is None:
+            poll_interval = config_loader.get('poll_interval')
+        if max_concurrency is None:
+            max_concurrency = config_loader.get('max_concurrency')
+        if not known_lectures:
+            known_lectures = config_loader.get('known_lectures')
+        if not lecture_index_path:
+            lecture_index_path = config_loader.get('lecture_index')
+        budget_config = dict(config_loader.get('budget') or {})
+
+    if args.max_tokens:
+        budget_config['max_tokens'] = args.max_tokens
+    if args.max_cost:
+        budget_config['max_cost'] = args.max_cost
+    budget = Budget.from_config(budget_config)
+
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            print(f"错误: {e}")
+            sys.exit(1)
 
     if not input_dir:
         print("错误: 未指定输入目录，请通过 -i 参数或配置文件指定")
@@ -236,15 +694,96 @@ def main():
     if not api_provider:
         api_provider = DEFAULT_API
 
+    if api_provider not in API_CONFIGS:
+        print(f"错误: 不支持的API: {api_provider}")
+        sys.exit(1)
+    if model:
+        API_CONFIGS[api_provider]['model'] = model
+    if max_concurrency is not None:
+        error = validate_concurrency(max_concurrency)
+        if error:
+            print(f"错误: {error}")
+            sys.exit(1)
+        set_max_concurrency(api_provider, max_concurrency)
+
     if not os.path.exists(input_dir):
         print(f"错误: 输入路径不存在: {input_dir}")
         sys.exit(1)
 
-    output_ext = os.path.splitext(output_file)[1].lower()
-    if output_ext not in ['.xlsx', '.csv']:
-        print("错误: 输出文件必须为 .xlsx 或 .csv 格式")
+    output_base, output_ext = os.path.splitext(output_file)
+    output_ext = output_ext.lower()
+    if output_ext not in OUTPUT_FORMATS:
+        print("错误: 输出文件必须为 .xlsx、.csv 或 .jsonl 格式")
+        sys.exit(1)
+
+    metrics_json = metrics_json or f"{output_base}.metrics.json"
+    metrics_prom = metrics_prom or f"{output_base}.prom"
+    response_log_path = response_log_path or f"{output_base}.responses.sqlite"
+    known_lectures = known_lectures or DEFAULT_KNOWN_MODE
+    lecture_index_path = lecture_index_path or default_index_path(output_file)
+    index_label = args.index_label or os.path.basename(output_file)
+    max_attachment_bytes = max_attachment_bytes or DEFAULT_MAX_ATTACHMENT_BYTES
+    attachment_timeout = attachment_timeout or DEFAULT_ATTACHMENT_TIMEOUT
+    attachment_cache = attachment_cache or default_cache_path(output_file)
+    if known_lectures not in KNOWN_MODES:
+        print(f"错误: known_lectures 必须为 {'、'.join(KNOWN_MODES)} 之一")
         sys.exit(1)
 
+    calibrating = args.calibrate is not None
+    if calibrating:
+        if args.watch or args.dry_run or args.replay or shard:
+            print("错误: --calibrate 不能与 --watch、--dry-run、--replay 或 --shard 同时使用")
+            sys.exit(1)
+        try:
+            levels = sorted({int(level) for level in args.levels.split(',')})
+        except ValueError:
+            print(f"错误: 无效的并发数列表: {args.levels}")
+            sys.exit(1)
+        for level in levels:
+            error = validate_concurrency(level)
+            if error:
+                print(f"错误: {error}")
+                sys.exit(1)
+        if args.sample_size < 1:
+            print("错误: --sample-size 必须大于 0")
+            sys.exit(1)
+
+    if args.replay:
+        if args.watch or args.dry_run:
+            print("错误: --replay 不能与 --watch 或 --dry-run 同时使用")
+            sys.exit(1)
+        import sqlite3
+
+        try:
+            response_log.open(args.replay, replay=True)
+        except (OSError, sqlite3.Error) as e:
+            print(f"错误: 无法打开响应日志: {e}")
+            sys.exit(1)
+        budget = None
+    elif not args.dry_run and not calibrating:
+        import sqlite3
+
+        response_log.open(response_log_path)
+        if config_loader:
+            live_config.attach(config_loader, api_provider)
+        try:
+            lecture_index.open(lecture_index_path, known_lectures)
+        except (OSError, sqlite3.Error) as e:
+            print(f"警告: 无法打开讲座索引，本次不跳过已收录讲座: {e}")
+
+    if attachments:
+        import sqlite3
+
+        try:
+            attachment_extractor.open(attachment_cache,
+                                      max_bytes=max_attachment_bytes,
+                                      timeout=attachment_timeout)
+        except (OSError, sqlite3.Error) as e:
+            print(f"警告: 无法打开附件文本缓存，本次不缓存: {e}")
+            attachment_extractor.open(None,
+                                      max_bytes=max_attachment_bytes,
+                                      timeout=attachment_timeout)
+
     print("=" * 50)
     print("EML邮件学术报告信息提取工具")
     print("=" * 50)
@@ -254,31 +793,118 @@ def main():
     print(f"API提供商: {api_provider}")
     if model:
         print(f"模型: {model}")
+    print(f"最大并发: {get_max_concurrency(api_provider)}")
+    if live_config.enabled:
+        print(f"配置热更新: 修改 {args.config} 中的 api_provider、model、"
+              f"max_concurrency 或发送 SIGHUP（kill -HUP {os.getpid()}）后生效")
+    if budget:
+        print(f"预算: {budget.describe()}")
+    if response_log.replay:
+        print(f"回放: {args.replay}（{response_log.count()} 条响应，不访问网络）")
+    elif response_log.enabled:
+        print(f"响应日志: {response_log_path}")
+    if lecture_index.enabled:
+        lectures, notices = lecture_index.counts()
+        action = '标记' if lecture_index.mode == 'tag' else '从输出中去掉'
+        print(f"讲座索引: {lecture_index_path}（已收录 {lectures} 场讲座、"
+              f"{notices} 封通知，重复项{action}）")
+    if cascade:
+        print(f"分级提取: {get_fast_model(api_provider) or '无快速模型'} -> "
+              f"{API_CONFIGS[api_provider]['model']}")
+    if attachment_extractor.enabled:
+        print(f"附件提取: 正文缺少时间或地点时读取PDF/DOCX/XLSX附件（单个不超过 "
+              f"{max_attachment_bytes} 字节、{attachment_timeout:g} 秒），"
+              f"缓存 {attachment_cache}（{attachment_extractor.count()} 个附件）")
+    if chunk_long:
+        print(f"长邮件分段: 正文超过 {CHUNK_THRESHOLD_CHARS} 字符时按 "
+              f"{CHUNK_CHARS} 字符分段")
+    if shard:
+        print(f"分片: {shard[0]}/{shard[1]}")
     print("=" * 50)
 
-    eml_files = find_eml_files(input_dir)
-
-    if not eml_files:
-        print(f"警告: 未找到EML文件: {input_dir}")
+    parse_options = {'lazy': bool(lazy_parse)}
+    if max_payload_bytes is not None:
+        parse_options['max_payload_bytes'] = max_payload_bytes
+    if attachment_extractor.enabled:
+        parse_options['attachments'] = True
+        parse_options['max_attachment_bytes'] = max_attachment_bytes
+
+    if calibrating:
+        run_calibration(
+            attachment_extractor.iter_records(
+                iter_email_records(input_dir, include, exclude, max_depth,
+                                   parse_options)),
+            args.calibrate or
+            f"{os.path.splitext(args.config)[0]}.calibrated.yaml",
+            config_loader.config if config_loader else {},
+            f"{output_base}.calibration.json", args.sample_size, levels,
+            [args.api] if args.api else None, budget)
+        attachment_extractor.close()
+        return
+
+    if args.watch:
+        if args.dry_run or shard:
+            print("错误: --watch 不能与 --dry-run 或 --shard 同时使用")
+            sys.exit(1)
+        if not os.path.isdir(input_dir):
+            print("错误: 监听模式的输入路径必须是目录")
+            sys.exit(1)
+        run_watch(input_dir, output_file, api_provider, include, exclude,
+                  max_depth, parse_options, budget, metrics_json,
+                  metrics_prom, poll_interval or DEFAULT_POLL_INTERVAL,
+                  bool(cascade), bool(chunk_long))
+        response_log.close()
+        lecture_index.close()
+        attachment_extractor.close()
+        live_config.detach()
+        return
+
+    records = iter_email_records(input_dir, include, exclude, max_depth,
+                                 parse_options, shard)
+    first_record = next(records, None)
+
+    if first_record is None:
+        if shard:
+            print(f"分片 {shard[0]}/{shard[1]} 中没有邮件")
+            save_results([], output_file)
+        else:
+            print(f"警告: 未找到EML文件: {input_dir}")
         sys.exit(0)
 
-    print(f"\n找到 {len(eml_files)} 个EML文件")
+    parsed_data = attachment_extractor.iter_records(
+        itertools.chain([first_record], records))
 
-    parsed_data = parse_all_emls(eml_files)
+    if args.dry_run:
+        run_dry_run(parsed_data, api_provider, budget, metrics_json)
+        attachment_extractor.close()
+        return
 
-    print("\n开始提取学术报告信息...")
-    results = extract_training_info_batch(parsed_data, api_provider,
-                                          print_progress)
+    print("\n开始解析并提取学术报告信息...")
+    results = extract_training_info_batch(parsed_data,
+                                          api_provider,
+                                          print_progress,
+                                          budget,
+                                          cascade=bool(cascade),
+                                          chunk_long=bool(chunk_long))
 
-    if output_ext == '.xlsx':
-        save_to_excel(results, output_file)
-    else:
-        save_to_csv(results, output_file)
+    with metrics.stage('write'):
+        save_results(results, output_file)
+    update_lecture_index(index_label)
 
     print_summary(results)
+    print_metrics_summary()
+    write_metrics(metrics_json, metrics_prom)
+    response_log.close()
+    lecture_index.close()
+    attachment_extractor.close()
+    live_config.detach()
 
     success_count = sum(1 for r in results if r.get('training_name'))
-    if success_count == 0:
+    if not results and known_lectures == 'skip':
+        print("\n所有讲座均已收录，输出为空")
+    elif success_count == 0 and args.replay:
+        print("\n警告: 所有文件提取失败，响应日志中可能没有这些邮件的记录（提示词已改变或输入不同）")
+    elif success_count == 0:
         print("\n警告: 所有文件提取失败，请检查API密钥配置和网络连接")
 
 
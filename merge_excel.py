@@ -1,6 +1,5 @@
 import os
 import glob
-import openpyxl
 from datetime import datetime
 
 
@@ -12,6 +11,8 @@ def merge_excel_files(input_dir: str = "output",
         print(f"警告: 未找到Excel文件在 {input_dir}")
         return
 
+    import openpyxl
+
     print(f"找到 {len(xlsx_files)} 个Excel文件")
 
     all_data = []
@@ -0,0 +1,290 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, float('inf'))
+MAX_SAMPLES = 100000
+
+STAGES = ('discovery', 'parse', 'attachments', 'prompt_build', 'http',
+          'json_extract', 'write')
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _percentile(ordered: List[float], pct: float) -> Optional[float]:
+    if not ordered:
+        return None
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+class Histogram:
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+        self.samples: List[float] = []
+
+    def observe(self, value: float):
+        self.total += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(value)
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        result = {
+            'count': self.count,
+            'sum': round(self.total, 4),
+            'mean': round(self.total / self.count, 4) if self.count else None
+        }
+        for pct in (50, 95, 99):
+            value = _percentile(ordered, pct)
+            result[f'p{pct}'] = round(value, 4) if value is not None else None
+        result['max'] = round(ordered[-1], 4) if ordered else None
+        return result
+
+
+class Metrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self._started_monotonic = time.monotonic()
+            self.stage_seconds: Dict[str, float] = {}
+            self.stage_counts: Dict[str, int] = {}
+            self.counters: Dict[Tuple[str, LabelKey], float] = {}
+            self.histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+            self.tokens: Dict[Tuple[str, str], Dict[str, int]] = {}
+            self.events: List[Dict[str, Any]] = []
+
+    def add_stage(self, name: str, seconds: float, count: int = 1):
+        with self._lock:
+            self.stage_seconds[name] = self.stage_seconds.get(name,
+                                                              0.0) + seconds
+            self.stage_counts[name] = self.stage_counts.get(name, 0) + count
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def timed_iter(self, iterable: Iterable, stage: str) -> Iterator:
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_stage(stage, time.perf_counter() - start, 0)
+                return
+            self.add_stage(stage, time.perf_counter() - start)
+            yield item
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def record_usage(self,
+                     provider: str,
+                     model: str,
+                     prompt_tokens: int = 0,
+                     completion_tokens: int = 0,
+                     cached_tokens: int = 0):
+        with self._lock:
+            usage = self.tokens.setdefault((provider, model), {
+                'prompt_tokens': 0,
+                'completion_tokens': 0,
+                'cached_tokens': 0,
+                'requests': 0
+            })
+            usage['prompt_tokens'] += prompt_tokens or 0
+            usage['completion_tokens'] += completion_tokens or 0
+            usage['cached_tokens'] += cached_tokens or 0
+            usage['requests'] += 1
+
+    def event(self, kind: str, **fields):
+        with self._lock:
+            self.events.append({
+                'time': datetime.now().isoformat(timespec='seconds'),
+                'kind': kind,
+                **fields
+            })
+
+    def counter_value(self, name: str, **labels) -> float:
+        wanted = set(_label_key(labels))
+        with self._lock:
+            return sum(v for (n, key), v in self.counters.items()
+                       if n == name and wanted.issubset(key))
+
+    def token_totals(self) -> Dict[str, int]:
+        with self._lock:
+            totals = {'prompt_tokens': 0, 'completion_tokens': 0,
+                      'cached_tokens': 0, 'requests': 0}
+            for usage in self.tokens.values():
+                for key in totals:
+                    totals[key] += usage[key]
+            return totals
+
+    def token_usage(self) -> Dict[Tuple[str, str], Dict[str, int]]:
+        with self._lock:
+            return {key: dict(usage) for key, usage in self.tokens.items()}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            wall = time.monotonic() - self._started_monotonic
+            return {
+                'started_at':
+                datetime.fromtimestamp(
+                    self.started_at).isoformat(timespec='seconds'),
+                'wall_seconds':
+                round(wall, 3),
+                'stages': {
+                    name: {
+                        'seconds': round(self.stage_seconds[name], 4),
+                        'count': self.stage_counts.get(name, 0)
+                    }
+                    for name in sorted(self.stage_seconds)
+                },
+                'counters': [{
+                    'name': name,
+                    'labels': dict(labels),
+                    'value': value
+                } for (name, labels), value in sorted(self.counters.items())],
+                'histograms': [{
+                    'name': name,
+                    'labels': dict(labels),
+                    **histogram.summary()
+                } for (name, labels), histogram in sorted(
+                    self.histograms.items(), key=lambda item: item[0])],
+                'tokens': [{
+                    'provider': provider,
+                    'model': model,
+                    **usage
+                } for (provider, model), usage in sorted(self.tokens.items())],
+                'events':
+                list(self.events)
+            }
+
+    def write_json(self, path: str, extra: Optional[Dict[str, Any]] = None):
+        report = self.snapshot()
+        if extra:
+            report.update(extra)
+        _atomic_write(path, json.dumps(report, ensure_ascii=False, indent=2))
+
+    def to_prometheus(self, prefix: str = 'eml') -> str:
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_run_wall_seconds Wall-clock duration of the run.",
+            f"# TYPE {prefix}_run_wall_seconds gauge",
+            f"{prefix}_run_wall_seconds {snapshot['wall_seconds']}",
+            f"# HELP {prefix}_stage_seconds_total Time spent per pipeline stage, summed across threads.",
+            f"# TYPE {prefix}_stage_seconds_total counter"
+        ]
+        for name, stage in snapshot['stages'].items():
+            lines.append(
+                f"{prefix}_stage_seconds_total{_labels({'stage': name})} {stage['seconds']}"
+            )
+        lines.append(f"# TYPE {prefix}_stage_items_total counter")
+        for name, stage in snapshot['stages'].items():
+            lines.append(
+                f"{prefix}_stage_items_total{_labels({'stage': name})} {stage['count']}"
+            )
+
+        seen_types = set()
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda i: i[0])
+            tokens = sorted(self.tokens.items())
+
+        for (name, labels), value in counters:
+            metric = f"{prefix}_{name}"
+            if metric not in seen_types:
+                lines.append(f"# TYPE {metric} counter")
+                seen_types.add(metric)
+            lines.append(f"{metric}{_labels(dict(labels))} {value}")
+
+        for (name, labels), histogram in histograms:
+            metric = f"{prefix}_{name}"
+            if metric not in seen_types:
+                lines.append(f"# TYPE {metric} histogram")
+                seen_types.add(metric)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else str(bound)
+                lines.append(
+                    f"{metric}_bucket{_labels({**dict(labels), 'le': le})} {cumulative}"
+                )
+            lines.append(
+                f"{metric}_sum{_labels(dict(labels))} {round(histogram.total, 6)}"
+            )
+            lines.append(
+                f"{metric}_count{_labels(dict(labels))} {histogram.count}")
+
+        lines.append(f"# TYPE {prefix}_tokens_total counter")
+        for (provider, model), usage in tokens:
+            for kind in ('prompt', 'completion', 'cached'):
+                labels = {'provider': provider, 'model': model, 'type': kind}
+                lines.append(
+                    f"{prefix}_tokens_total{_labels(labels)} {usage[kind + '_tokens']}"
+                )
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str):
+        _atomic_write(path, self.to_prometheus())
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ''
+    parts = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+            '\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _atomic_write(path: str, content: str):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+metrics = Metrics()
@@ -0,0 +1,86 @@
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+LECTURE_FIELDS = ('training_name', 'start_time', 'end_time', 'duration_hours',
+                  'location', 'purpose', 'content')
+SOURCE_FIELDS = ('file_path', 'file_name', 'seq', 'known_from')
+DIAGNOSTIC_FIELDS = ('error', 'traceback', 'raw_response')
+
+
+class LectureRecord:
+    __slots__ = LECTURE_FIELDS + SOURCE_FIELDS + DIAGNOSTIC_FIELDS
+
+    def __init__(self, **fields):
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def from_lecture(cls, lecture: Dict[str, Any]) -> 'LectureRecord':
+        record = cls()
+        for field in LECTURE_FIELDS:
+            setattr(record, field, lecture.get(field))
+        return record
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LectureRecord':
+        return cls(**{k: v for k, v in data.items() if k in cls.__slots__})
+
+    @classmethod
+    def failed(cls,
+               error: str,
+               traceback: Optional[str] = None,
+               raw_response: Optional[str] = None) -> 'LectureRecord':
+        record = cls()
+        for field in LECTURE_FIELDS:
+            setattr(record, field, None)
+        record.error = error
+        if traceback is not None:
+            record.traceback = traceback
+        if raw_response is not None:
+            record.raw_response = raw_response
+        return record
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value: Any):
+        try:
+            setattr(self, key, value)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and key in self.__slots__ and hasattr(
+            self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in self.__slots__ \
+            else default
+
+    def keys(self) -> Iterator[str]:
+        return (key for key in self.__slots__ if hasattr(self, key))
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return ((key, getattr(self, key)) for key in self.keys())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, LectureRecord):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = {
+            key: value if key not in ('traceback', 'raw_response') else
+            f"<{len(value or '')} chars>"
+            for key, value in self.items()
+        }
+        return f"LectureRecord({fields!r})"
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    prompt_hash TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    response BLOB NOT NULL,
+    usage TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+class ReplayMiss(LookupError):
+    pass
+
+
+def prompt_hash(provider: str, request_data: Dict[str, Any]) -> str:
+    payload = json.dumps(request_data,
+                         ensure_ascii=False,
+                         sort_keys=True,
+                         separators=(',', ':'))
+    return hashlib.sha256(f"{provider}\n{payload}".encode('utf-8')).hexdigest()
+
+
+class ResponseLog:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = None
+        self.path: Optional[str] = None
+        self.replay = False
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def open(self, path: str, replay: bool = False) -> 'ResponseLog':
+        self.close()
+        if replay and not os.path.exists(path):
+            raise FileNotFoundError(f"响应日志不存在: {path}")
+        if not replay:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        import sqlite3
+
+        conn = sqlite3.connect(path,
+                               check_same_thread=False,
+                               isolation_level=None)
+        if not replay:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(_SCHEMA)
+        with self._lock:
+            self._conn = conn
+            self.path = path
+            self.replay = replay
+        return self
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+            self.path = None
+            self.replay = False
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, int]]]:
+        with self._lock:
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                'SELECT response, usage FROM responses WHERE prompt_hash = ?',
+                (key, )).fetchone()
+        if row is None:
+            return None
+        return zlib.decompress(row[0]).decode('utf-8'), json.loads(row[1])
+
+    def put(self, key: str, provider: str, model: str, response: str,
+            usage: Dict[str, int]):
+        blob = zlib.compress(response.encode('utf-8'), 6)
+        with self._lock:
+            if self._conn is None or self.replay:
+                return
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                (key, provider, model, blob, json.dumps(usage), time.time()))
+
+    def count(self) -> int:
+        with self._lock:
+            if self._conn is None:
+                return 0
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM responses').fetchone()[0]
+
+
+response_log = ResponseLog()
@@ -0,0 +1,84 @@
+import heapq
+import time
+from collections import deque
+from typing import (Any, Callable, Iterable, Iterator, Optional, Sequence,
+                    Tuple)
+
+DEFAULT_LOOKAHEAD = 512
+RATE_WINDOW = 50
+
+
+def iter_largest_first(items: Iterable[Any],
+                       size_key: Callable[[Any], int],
+                       lookahead: int = DEFAULT_LOOKAHEAD,
+                       initial: Optional[int] = None
+                       ) -> Iterator[Tuple[int, Any]]:
+    if isinstance(items, Sequence):
+        order = sorted(range(len(items)),
+                       key=lambda i: (-size_key(items[i]), i))
+        for index in order:
+            yield index, items[index]
+        return
+
+    heap = []
+    threshold = lookahead if initial is None else max(1, min(initial, lookahead))
+    for index, item in enumerate(items):
+        heapq.heappush(heap, (-size_key(item), index, item))
+        if len(heap) >= threshold:
+            _, popped_index, popped = heapq.heappop(heap)
+            yield popped_index, popped
+            if threshold < lookahead:
+                threshold += 1
+
+    while heap:
+        _, popped_index, popped = heapq.heappop(heap)
+        yield popped_index, popped
+
+
+class ProgressTracker:
+
+    def __init__(self, total: Optional[int] = None):
+        self.total = total
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.started_at = time.monotonic()
+        self._recent = deque(maxlen=RATE_WINDOW)
+
+    def submit(self):
+        self.submitted += 1
+
+    def complete(self, succeeded: bool = True):
+        self.completed += 1
+        if not succeeded:
+            self.failed += 1
+        self._recent.append(time.monotonic())
+
+    def rate(self) -> Optional[float]:
+        if not self.completed:
+            return None
+        now = time.monotonic()
+        if len(self._recent) >= 2 and now > self._recent[0]:
+            return (len(self._recent) - 1) / (self._recent[-1] -
+                                              self._recent[0] or 1e-9)
+        elapsed = now - self.started_at
+        return self.completed / elapsed if elapsed > 0 else None
+
+    def eta(self) -> Optional[float]:
+        if self.total is None:
+            return None
+        rate = self.rate()
+        if not rate:
+            return None
+        return max(0.0, (self.total - self.completed) / rate)
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return '--:--'
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
@@ -0,0 +1,370 @@
+import argparse
+import base64
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from config import DEFAULT_API, get_available_apis, get_max_concurrency
+from eml_parser import parse_eml_bytes
+from extractor import LECTURE_FIELDS, extract_training_info_packed
+from live_config import set_max_concurrency, validate_concurrency
+from metrics import metrics
+
+DEFAULT_PORT = 8710
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_BATCH_WAIT = 0.05
+DEFAULT_REQUEST_TIMEOUT = 600
+MAX_BODY_BYTES = 50 * 1024 * 1024
+
+EMAIL_FIELDS = ('subject', 'from', 'date', 'body')
+
+
+class ServiceBusy(Exception):
+    pass
+
+
+class _Job:
+
+    def __init__(self, email_data: Dict[str, Any]):
+        self.email_data = email_data
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class ExtractionService:
+
+    def __init__(self,
+                 api_name: str = DEFAULT_API,
+                 max_batch_size: int = 1,
+                 batch_wait: float = DEFAULT_BATCH_WAIT,
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 max_concurrency: Optional[int] = None):
+        self.api_name = api_name
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_wait = batch_wait
+        if max_concurrency is not None:
+            error = validate_concurrency(max_concurrency)
+            if error:
+                raise ValueError(error)
+            set_max_concurrency(api_name, max_concurrency)
+        self.max_concurrency = get_max_concurrency(api_name)
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix='extract')
+        self._slots = threading.Semaphore(self.max_concurrency)
+        self._stopping = threading.Event()
+        self._dispatcher = threading.Thread(target=self._dispatch,
+                                            name='dispatcher',
+                                            daemon=True)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+
+    def start(self) -> 'ExtractionService':
+        self._dispatcher.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        self._dispatcher.join(timeout=5)
+        while True:
+            try:
+                job = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            job.future.set_exception(ServiceBusy('服务已停止'))
+        self.executor.shutdown(wait=True)
+
+    def submit(self, email_data: Dict[str, Any]) -> Future:
+        if self._stopping.is_set():
+            raise ServiceBusy('服务正在停止')
+        job = _Job(email_data)
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            metrics.inc('service_rejected_total', provider=self.api_name)
+            raise ServiceBusy('请求队列已满')
+        return job.future
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = self.in_flight
+            completed = self.completed
+        return {
+            'api': self.api_name,
+            'queued': self.queue.qsize(),
+            'in_flight': in_flight,
+            'completed': completed,
+            'max_concurrency': self.max_concurrency,
+            'max_batch_size': self.max_batch_size
+        }
+
+    def _next_batch(self) -> List[_Job]:
+        try:
+            jobs = [self.queue.get(timeout=0.2)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.batch_wait
+        while len(jobs) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    jobs.append(self.queue.get(timeout=remaining))
+                else:
+                    jobs.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return jobs
+
+    def _dispatch(self):
+        while not self._stopping.is_set():
+            if not self._slots.acquire(timeout=0.2):
+                continue
+            jobs = self._next_batch()
+            if not jobs:
+                self._slots.release()
+                continue
+
+            with self._lock:
+                self.in_flight += len(jobs)
+            for job in jobs:
+                metrics.observe('service_queue_seconds',
+                                time.monotonic() - job.enqueued_at,
+                                provider=self.api_name)
+            self.executor.submit(self._run_batch, jobs)
+
+    def _run_batch(self, jobs: List[_Job]):
+        try:
+            metrics.inc('service_batches_total',
+                        provider=self.api_name,
+                        size=len(jobs))
+            results = extract_training_info_packed(
+                [job.email_data for job in jobs], self.api_name)
+            for job, lectures in zip(jobs, results):
+                job.future.set_result(lectures)
+        except Exception as e:
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_exception(e)
+        finally:
+            with self._lock:
+                self.in_flight -= len(jobs)
+                self.completed += len(jobs)
+            self._slots.release()
+
+
+def lecture_json(lecture: Dict[str, Any]) -> Dict[str, Any]:
+    item = {field: lecture.get(field) for field in LECTURE_FIELDS}
+    if lecture.get('error'):
+        item['error'] = lecture['error']
+    return item
+
+
+def email_from_request(body: bytes, content_type: str,
+                       query: Dict[str, List[str]],
+                       parse_options: Dict[str, Any]) -> Dict[str, Any]:
+    file_name = (query.get('file_name') or ['request.eml'])[0]
+
+    if content_type.startswith('application/json'):
+        payload = json.loads(body or b'{}')
+        if not isinstance(payload, dict):
+            raise ValueError('请求体必须是JSON对象')
+        file_name = payload.get('file_name') or file_name
+        if payload.get('eml'):
+            body = base64.b64decode(payload['eml'])
+        else:
+            email_data = {
+                field: str(payload.get(field) or '')
+                for field in EMAIL_FIELDS
+            }
+            if not email_data['subject'] and not email_data['body']:
+                raise ValueError('缺少 eml 或 subject/body 字段')
+            email_data['file_path'] = file_name
+            email_data['file_name'] = file_name
+            return email_data
+
+    if not body:
+        raise ValueError('请求体为空')
+    with metrics.stage('parse'):
+        return parse_eml_bytes(body, file_name, file_name, **parse_options)
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, data: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status: int, body: Dict[str, Any]):
+        self._send(status,
+                   json.dumps(body, ensure_ascii=False).encode('utf-8'),
+                   'application/json; charset=utf-8')
+
+    def do_GET(self):
+        service: ExtractionService = self.server.service
+        path = urlparse(self.path).path
+        if path == '/health':
+            self._send_json(200, {'status': 'ok', **service.status()})
+        elif path == '/metrics':
+            self._send(200,
+                       metrics.to_prometheus().encode('utf-8'),
+                       'text/plain; version=0.0.4')
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        service: ExtractionService = self.server.service
+        url = urlparse(self.path)
+        if url.path != '/extract':
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {'error': '请求体过大'})
+            self.close_connection = True
+            return
+        body = self.rfile.read(length)
+
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            email_data = email_from_request(
+                body, self.headers.get('Content-Type', ''),
+                parse_qs(url.query), self.server.parse_options)
+            future = service.submit(email_data)
+            lectures = future.result(timeout=self.server.request_timeout)
+            self._send_json(
+                200, {
+                    'file_name': email_data.get('file_name', ''),
+                    'lectures': [lecture_json(l) for l in lectures],
+                    'elapsed_seconds': round(time.perf_counter() - start, 3)
+                })
+        except ServiceBusy as e:
+            status = 'busy'
+            self._send_json(503, {'error': str(e)})
+        except ValueError as e:
+            status = 'bad_request'
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            status = 'error'
+            self._send_json(500, {'error': f"{type(e).__name__}: {e}"})
+        finally:
+            metrics.inc('service_requests_total', status=status)
+            metrics.observe('service_request_seconds',
+                            time.perf_counter() - start)
+
+
+class ExtractionServer:
+
+    def __init__(self,
+                 service: ExtractionService,
+                 host: str = '127.0.0.1',
+                 port: int = DEFAULT_PORT,
+                 parse_options: Optional[Dict[str, Any]] = None,
+                 request_timeout: float = DEFAULT_REQUEST_TIMEOUT):
+        self.service = service
+        self._httpd = ThreadingHTTPServer((host, port), _ServiceHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.service = service
+        self._httpd.parse_options = parse_options or {}
+        self._httpd.request_timeout = request_timeout
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'ExtractionServer':
+        self.service.start()
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.service.start()
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+            self.service.stop()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.service.stop()
+
+    def __enter__(self) -> 'ExtractionServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地学术报告信息提取HTTP服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port',
+                        type=int,
+                        default=DEFAULT_PORT,
+                        help=f'监听端口（默认: {DEFAULT_PORT}）')
+    parser.add_argument('--api',
+                        choices=get_available_apis(),
+                        default=DEFAULT_API,
+                        help='LLM API提供商')
+    parser.add_argument('--batch-size',
+                        type=int,
+                        default=1,
+                        help='每次LLM调用最多打包的邮件数（默认: 1，不打包）')
+    parser.add_argument('--batch-wait',
+                        type=float,
+                        default=DEFAULT_BATCH_WAIT,
+                        help='凑批等待的最长秒数')
+    parser.add_argument('--queue-size',
+                        type=int,
+                        default=DEFAULT_QUEUE_SIZE,
+                        help='请求队列长度，队列满时返回503')
+    parser.add_argument('--concurrency', type=int, help='并发LLM请求数（默认取API配置）')
+    parser.add_argument('--lazy-parse',
+                        action='store_true',
+                        help='流式解析EML，跳过大附件内容')
+    args = parser.parse_args()
+
+    try:
+        service = ExtractionService(args.api, args.batch_size, args.batch_wait,
+                                    args.queue_size, args.concurrency)
+    except ValueError as e:
+        parser.error(str(e))
+    server = ExtractionServer(service, args.host, args.port,
+                              {'lazy': args.lazy_parse})
+    print(f"提取服务已启动: {server.base_url} （API: {args.api}，"
+          f"并发 {service.max_concurrency}，打包 {service.max_batch_size}）")
+    print("  POST /extract  原始EML字节，或JSON {subject, from, date, body} / {eml: base64}")
+    print("  GET  /health   队列状态")
+    print("  GET  /metrics  Prometheus指标")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
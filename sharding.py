@@ -0,0 +1,44 @@
+import hashlib
+import os
+from typing import Optional, Tuple
+
+Shard = Tuple[int, int]
+
+
+def parse_shard(spec: str) -> Shard:
+    try:
+        index, count = (int(part) for part in spec.split('/', 1))
+    except ValueError:
+        raise ValueError(f"分片格式应为 i/N，例如 0/4: {spec}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"分片编号超出范围: {spec}")
+    return index, count
+
+
+def shard_of(key: str, count: int) -> int:
+    digest = hashlib.md5(key.encode('utf-8', 'surrogateescape')).digest()
+    return int.from_bytes(digest[:8], 'big') % count
+
+
+class ShardSelector:
+
+    def __init__(self, root: str, shard: Optional[Shard] = None):
+        if os.path.isfile(root):
+            root = os.path.dirname(root)
+        self.root = root or '.'
+        self.shard = shard
+        self.seq = 0
+
+    def key(self, file_path: str) -> str:
+        return os.path.relpath(file_path, self.root).replace(os.sep, '/')
+
+    def take(self, file_path: str, key: Optional[str] = None) -> Optional[int]:
+        seq = self.seq
+        self.seq += 1
+        if self.shard is None:
+            return seq
+        index, count = self.shard
+        if count > 1 and shard_of(key or self.key(file_path),
+                                  count) != index:
+            return None
+        return seq
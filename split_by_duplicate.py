@@ -1,6 +1,4 @@
 import os
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
 from collections import defaultdict
 
 
@@ -9,6 +7,9 @@ def split_by_duplicate(
         unique_output: str = "output/unique.xlsx",
         duplicate_first_output: str = "output/duplicates_first.xlsx",
         duplicate_second_output: str = "output/duplicates_second.xlsx"):
+    import openpyxl
+    from openpyxl.styles import Font, Alignment, PatternFill
+
     wb = openpyxl.load_workbook(input_file)
     ws = wb.active
 
@@ -0,0 +1,46 @@
+import numpy as np
+
+from analysis import find_overlaps
+
+
+def _pairs(result):
+    return sorted(zip(result[0].tolist(), result[1].tolist()))
+
+
+def _brute_force(start, end, groups):
+    overlap = ((start[:, None] < end[None, :]) & (start[None, :] < end[:, None])
+               & (groups[:, None] == groups[None, :]))
+    i, j = np.nonzero(np.triu(overlap, k=1))
+    later = np.where(start[j] >= start[i], j, i)
+    return sorted(zip(later.tolist(), np.where(later == j, i, j).tolist()))
+
+
+def test_every_conflicting_pair_is_reported():
+    start = np.array([0, 10, 20, 30, 100])
+    end = np.array([60, 50, 40, 35, 110])
+
+    pairs = _pairs(find_overlaps(start, end))
+
+    assert pairs == [(1, 0), (2, 0), (2, 1), (3, 0), (3, 1), (3, 2)]
+
+
+def test_touching_intervals_and_other_groups_do_not_conflict():
+    start = np.array([0, 60, 30, 30])
+    end = np.array([60, 120, 90, 90])
+    groups = np.array([1, 1, 2, 1])
+
+    pairs = _pairs(find_overlaps(start, end, groups, np.array([5, 6, 7, 8])))
+
+    assert pairs == [(6, 8), (8, 5)]
+
+
+def test_matches_all_pairs_reference():
+    rng = np.random.default_rng(7)
+    start = rng.integers(0, 500, 300)
+    end = start + rng.integers(1, 60, 300)
+    groups = rng.integers(0, 4, 300)
+
+    pairs = _pairs(find_overlaps(start, end, groups))
+
+    assert pairs == _brute_force(start, end, groups)
+    assert len(pairs) > 300
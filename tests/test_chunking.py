@@ -0,0 +1,132 @@
+from chunking import merge_chunk_lectures, split_body, split_email
+
+FILLER = '本次报告将介绍相关研究进展与典型应用案例，欢迎感兴趣的师生参加。' * 6
+
+
+def _notice(count):
+    return ''.join(f'报告{i}：题目{i}\n时间：2024年03月{i:02d}日 10:00-11:00\n'
+                   f'地点：F5{i:02d}\n{FILLER}\n\n' for i in range(1, count + 1))
+
+
+def _offsets(body, chunks):
+    offsets = []
+    position = 0
+    for chunk in chunks:
+        position = body.index(chunk, position)
+        offsets.append(position)
+        position += 1
+    return offsets
+
+
+def test_short_body_is_one_chunk():
+    assert split_body('短通知', 100) == ['短通知']
+
+
+def test_chunks_cut_at_headings_and_overlap_at_line_starts():
+    body = _notice(12)
+    chunks = split_body(body, 1200, 200)
+    offsets = _offsets(body, chunks)
+
+    assert len(chunks) > 2
+    assert offsets[0] == 0
+    assert offsets[-1] + len(chunks[-1]) == len(body)
+    for chunk, offset, next_offset in zip(chunks, offsets, offsets[1:]):
+        cut = offset + len(chunk)
+        assert len(chunk) <= 1200
+        assert body[cut:].startswith('报告')
+        assert cut - 200 <= next_offset < cut
+        assert body[next_offset - 1] == '\n'
+
+
+def test_overlap_starts_at_heading_inside_window():
+    head = '报告1：甲\n' + 'x' * 200 + '\n'
+    section = head + '报告2：乙\n' + 'y' * 100 + '\n' + 'w' * 150 + '\n'
+    body = section + 'z' * 700
+    chunks = split_body(body, 600, 300)
+    offsets = _offsets(body, chunks)
+
+    assert chunks[0] == section
+    assert offsets[1] == len(head)
+    assert chunks[1].startswith('报告2：乙')
+
+
+def test_body_without_boundaries_is_cut_at_limit():
+    body = 'a' * 2500
+    chunks = split_body(body, 1000, 200)
+
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
+    assert ''.join(chunks) == body
+
+
+def test_split_email_labels_chunks_and_keeps_attachment_once():
+    email_data = {
+        'subject': '系列讲座',
+        'body': _notice(12),
+        'attachment_text': '附件'
+    }
+    chunks = split_email(email_data, threshold=2000, max_chars=1200,
+                         overlap=200)
+
+    assert [c['chunk'] for c in chunks] == ['1/3', '2/3', '3/3']
+    assert chunks[0]['attachment_text'] == '附件'
+    assert all('attachment_text' not in c for c in chunks[1:])
+    assert all(c['subject'] == '系列讲座' for c in chunks)
+    assert split_email(email_data, threshold=len(email_data['body'])) == [
+        email_data
+    ]
+
+
+def test_merge_dedupes_lecture_repeated_in_overlap():
+    first = [{
+        'training_name': '题目1',
+        'start_time': '2024-03-01 10:00',
+        'location': None
+    }, {
+        'training_name': '题目2',
+        'start_time': '2024-03-02 10:00',
+        'location': None
+    }]
+    second = [{
+        'training_name': '题目 2！',
+        'start_time': '2024-03-02 10:00',
+        'location': 'F502'
+    }, {
+        'training_name': '题目3',
+        'start_time': '2024-03-03 10:00',
+        'location': 'F503'
+    }]
+
+    merged = merge_chunk_lectures([first, second])
+
+    assert [l['training_name'] for l in merged] == ['题目1', '题目2', '题目3']
+    assert merged[1]['location'] == 'F502'
+
+
+def test_merge_matches_missing_start_time_but_keeps_different_sessions():
+    parts = [[{
+        'training_name': 'Deep Learning',
+        'start_time': '2024-03-01 10:00'
+    }, {
+        'training_name': 'Deep Learning',
+        'start_time': '2024-03-08 10:00'
+    }], [{
+        'training_name': 'deep-learning',
+        'start_time': None,
+        'end_time': '2024-03-01 11:00'
+    }]]
+
+    merged = merge_chunk_lectures(parts)
+
+    assert [l['start_time'] for l in merged] == [
+        '2024-03-01 10:00', '2024-03-08 10:00'
+    ]
+    assert merged[0]['end_time'] == '2024-03-01 11:00'
+    assert 'end_time' not in merged[1]
+
+
+def test_merge_keeps_errors_only_when_needed():
+    error = {'training_name': None, 'error': '第 2/2 段提取失败'}
+    lecture = {'training_name': '题目1', 'start_time': None}
+
+    assert merge_chunk_lectures([[error], [error]]) == [error]
+    assert merge_chunk_lectures([[lecture], [error]]) == [lecture, error]
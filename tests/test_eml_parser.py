@@ -0,0 +1,40 @@
+from eml_parser import html_to_text
+
+
+def test_hidden_paragraph_ends_at_next_block():
+    html = ('<p style="display:none">preheader'
+            '<div>Lecture A 10:00 F512</div><p>more')
+    assert html_to_text(html) == 'Lecture A 10:00 F512\nmore'
+
+
+def test_hidden_list_item_ends_at_next_item():
+    html = '<ul><li hidden>x<li>Talk 1<li>Talk 2</ul><p>Venue F512'
+    assert html_to_text(html) == '- Talk 1\n- Talk 2\nVenue F512'
+
+
+def test_hidden_element_with_nested_same_tag():
+    html = '<div style="display:none"><div>x</div>y</div><p>z</p>'
+    assert html_to_text(html) == 'z'
+
+
+def test_unclosed_hidden_inline_element_is_kept():
+    html = '<span style="display:none">inline<p>after'
+    assert html_to_text(html) == 'inline\nafter'
+
+
+def test_table_cells_and_entities():
+    html = ('<table><tr><th>时间</th><th>地点</th></tr>'
+            '<tr><td>10:00&nbsp;&ndash;&nbsp;11:00<td hidden>x<td>A&amp;B'
+            '</table>')
+    assert html_to_text(html) == '时间 | 地点\n10:00 – 11:00 | A&B'
+
+
+def test_mixed_case_tags_are_recognised():
+    html = ('<Style>p{color:red}</Style><Script>alert(1)</Script>'
+            '<Div Style="Display:None">x</Div><Ul><Li>Talk 1<LI>Talk 2</Ul>')
+    assert html_to_text(html) == '- Talk 1\n- Talk 2'
+
+
+def test_removed_hidden_block_keeps_line_break():
+    html = 'a<div style="display:none">x</div>b'
+    assert html_to_text(html) == 'a\nb'
@@ -0,0 +1,113 @@
+import sqlite3
+
+import pytest
+
+from extractor import extraction_signature
+from lecture_index import LectureIndex
+from records import LectureRecord
+
+EMAIL = {
+    'subject': 'Re: 学术报告',
+    'body': '报告1：图神经网络前沿\n时间：2024年03月05日 10:00-11:30',
+    'file_name': 'a.eml'
+}
+
+
+def _lectures(name='图神经网络前沿'):
+    return [
+        LectureRecord.from_lecture({
+            'training_name': name,
+            'start_time': '2024-03-05 10:00'
+        })
+    ]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LectureIndex().open(str(tmp_path / 'lectures.sqlite'))
+    yield index
+    index.close()
+
+
+def _reopen(index):
+    return index.open(index.path, index.mode)
+
+
+def test_known_notice_requires_same_extractor(index):
+    index.remember(EMAIL, _lectures(), 'openai/gpt-4o/abc')
+    index.flush('result_w1.xlsx')
+    _reopen(index)
+
+    known = index.known_notice(EMAIL, 'openai/gpt-4o/abc')
+    assert [l['training_name'] for l in known] == ['图神经网络前沿']
+    assert known[0]['known_from'] == 'result_w1.xlsx'
+    assert index.known_notice(EMAIL, 'openai/gpt-4o-mini/abc') is None
+    assert index.known_notice(EMAIL, 'openai/gpt-4o/def') is None
+
+
+def test_new_extractor_replaces_saved_lectures(index):
+    index.remember(EMAIL, _lectures(), 'zai/glm-4.5/abc')
+    index.flush('result_w1.xlsx')
+    _reopen(index)
+
+    index.remember(EMAIL, _lectures('图神经网络前沿进展'), 'openai/gpt-4o/abc')
+    assert index.flush('result_w2.xlsx') == (1, 1)
+    _reopen(index)
+
+    assert index.known_notice(EMAIL, 'zai/glm-4.5/abc') is None
+    known = index.known_notice(EMAIL, 'openai/gpt-4o/abc')
+    assert [l['training_name'] for l in known] == ['图神经网络前沿进展']
+    assert known[0]['known_from'] == 'result_w1.xlsx'
+
+
+def test_same_extractor_keeps_first_notice(index):
+    index.remember(EMAIL, _lectures(), 'openai/gpt-4o/abc')
+    index.flush('result_w1.xlsx')
+    _reopen(index)
+
+    index.remember(EMAIL, _lectures('其他'), 'openai/gpt-4o/abc')
+    assert index.flush('result_w2.xlsx') == (1, 0)
+    _reopen(index)
+
+    known = index.known_notice(EMAIL, 'openai/gpt-4o/abc')
+    assert [l['training_name'] for l in known] == ['图神经网络前沿']
+
+
+def test_old_index_is_migrated_and_reextracted(tmp_path):
+    path = str(tmp_path / 'lectures.sqlite')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE notices (
+            subject_key TEXT NOT NULL,
+            body_digest TEXT NOT NULL,
+            lectures TEXT NOT NULL,
+            output TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            first_seen REAL NOT NULL,
+            PRIMARY KEY (subject_key, body_digest)
+        );
+    """)
+    conn.close()
+    index = LectureIndex().open(path)
+    try:
+        index.remember(EMAIL, _lectures(), 'openai/gpt-4o/abc')
+        index.flush('result_w1.xlsx')
+        _reopen(index)
+        assert index.known_notice(EMAIL, 'openai/gpt-4o/abc') is not None
+    finally:
+        index.close()
+
+
+def test_extraction_signature_tracks_provider_and_model(monkeypatch):
+    from config import API_CONFIGS
+
+    monkeypatch.setitem(API_CONFIGS['openai'], 'model', 'gpt-4o')
+    monkeypatch.setitem(API_CONFIGS['openai'], 'fast_model', 'gpt-4o-mini')
+    base = extraction_signature('openai')
+
+    assert base.startswith('openai/gpt-4o/')
+    assert extraction_signature('openai', cascade=True).startswith(
+        'openai/gpt-4o-mini>gpt-4o/')
+    assert extraction_signature('deepseek') != base
+    monkeypatch.setitem(API_CONFIGS['openai'], 'model', 'gpt-4.1')
+    assert extraction_signature('openai') != base
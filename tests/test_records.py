@@ -0,0 +1,23 @@
+import pytest
+
+from records import LECTURE_FIELDS, LectureRecord
+
+
+def test_records_compare_like_dicts_and_are_unhashable():
+    record = LectureRecord.from_lecture({'training_name': '报告', 'extra': 1})
+    expected = dict.fromkeys(LECTURE_FIELDS)
+    expected['training_name'] = '报告'
+
+    assert record == expected
+    assert record == LectureRecord.from_dict(expected)
+    with pytest.raises(TypeError):
+        hash(record)
+
+
+def test_raw_response_is_kept_only_on_failures():
+    record = LectureRecord.from_lecture({'training_name': '报告'})
+    failed = LectureRecord.failed('无法解析JSON响应', raw_response='not json')
+
+    assert 'raw_response' not in record
+    assert failed['raw_response'] == 'not json'
+    assert failed.get('training_name') is None
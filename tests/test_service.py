@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import config
+from benchmarks.mock_llm_server import MockLLMServer, point_api_configs_at
+from live_config import set_max_concurrency
+from service import ExtractionServer, ExtractionService
+
+API = 'openai'
+
+EML = ('Subject: =?utf-8?b?5a2m5pyv5oql5ZGK?=\r\n'
+       'From: seminar@example.edu\r\n'
+       'Date: Mon, 4 Mar 2024 09:00:00 +0800\r\n'
+       'Content-Type: text/plain; charset=utf-8\r\n'
+       'Content-Transfer-Encoding: 8bit\r\n'
+       '\r\n'
+       '报告1：图神经网络前沿\r\n'
+       '时间：2024年03月05日 10:00-11:30\r\n'
+       '地点：F512\r\n').encode('utf-8')
+
+
+def _post(url, data, content_type):
+    request = urllib.request.Request(url + '/extract',
+                                     data=data,
+                                     headers={'Content-Type': content_type})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _post_json(url, payload):
+    return _post(url,
+                 json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+                 'application/json')
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def mock_llm():
+    saved = dict(config.API_CONFIGS[API])
+    with MockLLMServer() as server:
+        point_api_configs_at(server, [API])
+        yield server
+    config.API_CONFIGS[API].clear()
+    config.API_CONFIGS[API].update(saved)
+    set_max_concurrency(API, saved.get('max_concurrency',
+                                       config.DEFAULT_MAX_CONCURRENCY))
+
+
+def test_extract_raw_eml(mock_llm):
+    with ExtractionServer(ExtractionService(API), port=0) as server:
+        status, body = _post(server.base_url, EML, 'message/rfc822')
+
+    assert status == 200
+    assert [l['training_name'] for l in body['lectures']] == ['图神经网络前沿']
+    lecture = body['lectures'][0]
+    assert lecture['start_time'] == '2024-03-05 10:00'
+    assert lecture['end_time'] == '2024-03-05 11:30'
+    assert lecture['location'] == 'F512'
+    assert mock_llm.stats()['requests'] == 1
+
+
+def test_extract_json_fields(mock_llm):
+    with ExtractionServer(ExtractionService(API), port=0) as server:
+        status, body = _post_json(
+            server.base_url, {
+                'file_name': 'seminar.eml',
+                'subject': '学术讲座',
+                'body': '报告1：量子计算导论\n时间：2024年04月01日 14:00-15:00\n地点：A101'
+            })
+
+    assert status == 200
+    assert body['file_name'] == 'seminar.eml'
+    assert [l['training_name'] for l in body['lectures']] == ['量子计算导论']
+    assert body['lectures'][0]['location'] == 'A101'
+
+
+def test_missing_fields_is_bad_request(mock_llm):
+    with ExtractionServer(ExtractionService(API), port=0) as server:
+        status, body = _post_json(server.base_url, {'from': 'a@b.c'})
+
+    assert status == 400
+    assert 'error' in body
+    assert mock_llm.stats()['requests'] == 0
+
+
+def test_requests_are_packed_into_one_batch(mock_llm):
+    titles = ['报告甲', '报告乙', '报告丙']
+    results = {}
+
+    def send(title):
+        results[title] = _post_json(server.base_url, {
+            'subject': title,
+            'body': f'报告1：{title}\n地点：B20{titles.index(title)}'
+        })
+
+    service = ExtractionService(API, max_batch_size=3, batch_wait=2.0)
+    with ExtractionServer(service, port=0) as server:
+        threads = [threading.Thread(target=send, args=(t,)) for t in titles]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+
+    assert mock_llm.stats()['requests'] == 1
+    for i, title in enumerate(titles):
+        status, body = results[title]
+        assert status == 200
+        assert [l['training_name'] for l in body['lectures']] == [title]
+        assert body['lectures'][0]['location'] == f'B20{i}'
+
+
+def test_full_queue_returns_503(mock_llm):
+    mock_llm.latency = 0.5
+    service = ExtractionService(API, queue_size=1, max_concurrency=1)
+    payload = {'subject': '学术报告', 'body': '报告1：排队测试'}
+    results = []
+
+    def send():
+        results.append(_post_json(server.base_url, payload))
+
+    with ExtractionServer(service, port=0) as server:
+        running = threading.Thread(target=send)
+        running.start()
+        _wait_for(lambda: service.status()['in_flight'] == 1)
+        queued = threading.Thread(target=send)
+        queued.start()
+        _wait_for(lambda: service.status()['queued'] == 1)
+
+        status, body = _post_json(server.base_url, payload)
+
+        running.join(timeout=30)
+        queued.join(timeout=30)
+
+    assert status == 503
+    assert body['error'] == '请求队列已满'
+    assert [status for status, _ in results] == [200, 200]
@@ -0,0 +1,122 @@
+import json
+
+from extractor import _normalize_and_repair
+from validation import is_repairable, normalize_lecture, validate_lecture
+
+
+class _RepairClient:
+
+    def __init__(self, repaired):
+        self.repaired = repaired
+        self.prompts = []
+
+    def chat(self, messages, system=None):
+        self.prompts.append(messages[0]['content'])
+        return json.dumps(self.repaired, ensure_ascii=False)
+
+    def extract_json(self, text):
+        return json.loads(text)
+
+
+def _lecture(**fields):
+    lecture = {
+        'training_name': '学术报告',
+        'start_time': '2024-03-05 10:00',
+        'end_time': '2024-03-05 11:30',
+        'duration_hours': 1.5,
+        'location': 'F512'
+    }
+    lecture.update(fields)
+    return lecture
+
+
+def test_loose_formats_are_normalized():
+    lecture = _lecture(training_name=' 学术报告 ',
+                       start_time='2024-03-05T10:00:00+08:00',
+                       end_time='11:30',
+                       duration_hours='90分钟')
+
+    changed = normalize_lecture(lecture)
+
+    assert changed == [
+        'training_name', 'start_time', 'end_time', 'duration_hours'
+    ]
+    assert lecture == _lecture()
+    assert validate_lecture(lecture) == []
+
+
+def test_chinese_date_and_wrong_duration():
+    lecture = _lecture(start_time='2024年3月5日 10点',
+                       end_time='2024年3月5日 12:00',
+                       duration_hours='3小时')
+
+    normalize_lecture(lecture)
+
+    assert lecture['start_time'] == '2024-03-05 10:00'
+    assert lecture['end_time'] == '2024-03-05 12:00'
+    assert lecture['duration_hours'] == 2.0
+
+
+def test_day_first_date_is_left_for_repair():
+    lecture = _lecture(end_time='05/03/2024 11:30', duration_hours=None)
+
+    assert normalize_lecture(lecture) == []
+    assert lecture['end_time'] == '05/03/2024 11:30'
+    assert lecture['duration_hours'] is None
+    assert validate_lecture(lecture, 2) == [
+        (2, 'end_time', '结束时间格式不是 yyyy-MM-dd hh:mm')
+    ]
+    assert is_repairable(lecture, 'end_time')
+
+
+def test_end_before_start_is_reported_without_duration():
+    lecture = _lecture(end_time='2024-03-05 09:00', duration_hours=None)
+
+    normalize_lecture(lecture)
+
+    assert lecture['duration_hours'] is None
+    assert validate_lecture(lecture) == [(0, 'end_time', '结束时间早于开始时间')]
+    assert is_repairable(lecture, 'end_time')
+
+
+def test_repair_fixes_only_reported_fields():
+    results = [
+        _lecture(end_time='05/03/2024 11:30', duration_hours=None),
+        _lecture(training_name='第二场',
+                 start_time='2024-03-06 14:00',
+                 end_time='2024-03-06 13:00',
+                 duration_hours=None)
+    ]
+    client = _RepairClient([
+        _lecture(training_name='被改写', end_time='2024-03-05 11:30'),
+        _lecture(start_time='2024-03-06 14:00', end_time='2024-03-06 16:00')
+    ])
+
+    repaired = _normalize_and_repair(client, results, 'openai')
+
+    assert len(client.prompts) == 1
+    assert '05/03/2024 11:30' in client.prompts[0]
+    assert repaired[0]['training_name'] == '学术报告'
+    assert repaired[0]['end_time'] == '2024-03-05 11:30'
+    assert repaired[0]['duration_hours'] == 1.5
+    assert repaired[1]['training_name'] == '第二场'
+    assert repaired[1]['end_time'] == '2024-03-06 16:00'
+    assert repaired[1]['duration_hours'] == 2.0
+
+
+def test_repair_with_wrong_length_keeps_original():
+    results = [_lecture(end_time='2024-03-05 09:00')]
+    client = _RepairClient([])
+
+    repaired = _normalize_and_repair(client, results, 'openai')
+
+    assert len(client.prompts) == 1
+    assert repaired[0]['end_time'] == '2024-03-05 09:00'
+
+
+def test_valid_lectures_skip_repair():
+    client = _RepairClient([])
+
+    _normalize_and_repair(client, [_lecture(duration_hours='1.5h')], 'openai')
+
+    assert client.prompts == []
@@ -0,0 +1,167 @@
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+TIME_FORMAT = '%Y-%m-%d %H:%M'
+DURATION_TOLERANCE_HOURS = 0.25
+
+_TIME_RE = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}$')
+_LOOSE_TIME_RE = re.compile(
+    r'^(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})\s*日?\s*[T ]?\s*'
+    r'(\d{1,2})\s*[:：点]\s*(\d{2})?\s*分?(?:[:：]\d{2}(?:\.\d+)?)?\s*'
+    r'(?:Z|[+-]\d{2}:?\d{2})?$')
+_CLOCK_RE = re.compile(r'^(\d{1,2})\s*[:：]\s*(\d{2})(?:[:：]\d{2})?$')
+_DURATION_RE = re.compile(
+    r'^(\d+(?:\.\d+)?)\s*(小时|个小时|h|hr|hrs|hour|hours|学时|分钟|min|mins|minutes)?$',
+    re.IGNORECASE)
+_NULL_STRINGS = {'', 'null', 'none', 'n/a', '无', '未知', '未提及'}
+
+Problem = Tuple[int, str, str]
+
+
+def parse_time(value: Any) -> Optional[datetime]:
+    if not isinstance(value, str) or not _TIME_RE.match(value):
+        return None
+    try:
+        return datetime.strptime(value, TIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def normalize_time(value: Any,
+                   reference: Optional[datetime] = None) -> Any:
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    if text.lower() in _NULL_STRINGS:
+        return None
+    if _TIME_RE.match(text):
+        return text
+
+    match = _LOOSE_TIME_RE.match(text)
+    if match:
+        year, month, day, hour, minute = match.groups()
+        try:
+            return datetime(int(year), int(month), int(day), int(hour),
+                            int(minute or 0)).strftime(TIME_FORMAT)
+        except ValueError:
+            return value
+
+    match = _CLOCK_RE.match(text)
+    if match and reference is not None:
+        try:
+            return reference.replace(hour=int(match.group(1)),
+                                     minute=int(match.group(2))).strftime(
+                                         TIME_FORMAT)
+        except ValueError:
+            return value
+    return value
+
+
+def normalize_duration(value: Any) -> Any:
+    if is_number(value) or value is None:
+        return value
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    if text.lower() in _NULL_STRINGS:
+        return None
+    match = _DURATION_RE.match(text)
+    if not match:
+        return value
+    number = float(match.group(1))
+    unit = (match.group(2) or '').lower()
+    if unit in ('分钟', 'min', 'mins', 'minutes'):
+        number /= 60
+    return round(number, 2)
+
+
+def normalize_lecture(lecture: Dict[str, Any]) -> List[str]:
+    changed = []
+
+    name = lecture.get('training_name')
+    if isinstance(name, str) and name != name.strip():
+        lecture['training_name'] = name.strip()
+        changed.append('training_name')
+
+    start_value = normalize_time(lecture.get('start_time'))
+    if start_value != lecture.get('start_time'):
+        lecture['start_time'] = start_value
+        changed.append('start_time')
+    start = parse_time(start_value)
+
+    end_value = normalize_time(lecture.get('end_time'), start)
+    if end_value != lecture.get('end_time'):
+        lecture['end_time'] = end_value
+        changed.append('end_time')
+    end = parse_time(end_value)
+
+    duration = normalize_duration(lecture.get('duration_hours'))
+    if start is not None and end is not None and end > start:
+        expected = round((end - start).total_seconds() / 3600, 2)
+        if not is_number(duration) or abs(
+                expected - duration) > DURATION_TOLERANCE_HOURS:
+            duration = expected
+    if duration != lecture.get('duration_hours'):
+        lecture['duration_hours'] = duration
+        changed.append('duration_hours')
+
+    return changed
+
+
+def is_repairable(lecture: Dict[str, Any], field: str) -> bool:
+    if field == 'end_time' or field == 'duration_hours':
+        return lecture.get(field) is not None
+    if field == 'start_time':
+        value = lecture.get('start_time')
+        return isinstance(value, str) and bool(value.strip())
+    return False
+
+
+def validate_lecture(lecture: Dict[str, Any], index: int = 0) -> List[Problem]:
+    problems = []
+
+    name = lecture.get('training_name')
+    if not isinstance(name, str) or not name.strip():
+        problems.append((index, 'training_name', '名称为空'))
+
+    start = parse_time(lecture.get('start_time'))
+    if start is None:
+        problems.append((index, 'start_time', '开始时间缺失或格式不是 yyyy-MM-dd hh:mm'))
+
+    end = None
+    if lecture.get('end_time') is not None:
+        end = parse_time(lecture.get('end_time'))
+        if end is None:
+            problems.append((index, 'end_time', '结束时间格式不是 yyyy-MM-dd hh:mm'))
+        elif start is not None and end <= start:
+            problems.append((index, 'end_time', '结束时间早于开始时间'))
+
+    duration = lecture.get('duration_hours')
+    if duration is not None:
+        if not is_number(duration) or duration <= 0:
+            problems.append((index, 'duration_hours', '学时不是正数'))
+        elif start is not None and end is not None and end > start:
+            expected = (end - start).total_seconds() / 3600
+            if abs(expected - duration) > DURATION_TOLERANCE_HOURS:
+                problems.append((index, 'duration_hours',
+                                 f'学时与起止时间不符（应为 {expected:g}）'))
+
+    return problems
+
+
+def validate_lectures(lectures: List[Dict[str, Any]]) -> List[Problem]:
+    if not lectures:
+        return [(0, 'training_name', '未提取到讲座')]
+
+    problems = []
+    for index, lecture in enumerate(lectures):
+        if lecture.get('error'):
+            problems.append((index, 'error', lecture['error']))
+            continue
+        problems.extend(validate_lecture(lecture, index))
+    return problems
@@ -0,0 +1,271 @@
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from file_walker import EML_SUFFIXES, iter_files, path_matches
+
+DEFAULT_POLL_INTERVAL = 2.0
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+
+class _PathFilter:
+
+    def __init__(self, root: str, suffixes: Sequence[str],
+                 include: Optional[Sequence[str]],
+                 exclude: Optional[Sequence[str]], max_depth: Optional[int]):
+        self.root = os.path.abspath(root)
+        self.suffixes = tuple(s.lower() for s in suffixes)
+        self.include = include
+        self.exclude = exclude
+        self.max_depth = max_depth
+
+    def rel_path(self, path: str) -> str:
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def depth(self, path: str) -> int:
+        return self.rel_path(path).count('/')
+
+    def accepts_dir(self, path: str) -> bool:
+        if self.max_depth is not None and self.depth(path) >= self.max_depth:
+            return False
+        return path_matches(self.rel_path(path), None, self.exclude)
+
+    def accepts_file(self, path: str) -> bool:
+        if not path.lower().endswith(self.suffixes):
+            return False
+        if self.max_depth is not None and self.depth(path) > self.max_depth:
+            return False
+        return path_matches(self.rel_path(path), self.include, self.exclude)
+
+    def scan(self) -> List[str]:
+        return list(
+            iter_files(self.root, self.suffixes, self.include, self.exclude,
+                       self.max_depth))
+
+
+class PollingWatcher:
+
+    def __init__(self,
+                 root: str,
+                 suffixes: Sequence[str] = EML_SUFFIXES,
+                 include: Optional[Sequence[str]] = None,
+                 exclude: Optional[Sequence[str]] = None,
+                 max_depth: Optional[int] = None,
+                 interval: float = DEFAULT_POLL_INTERVAL):
+        self.filter = _PathFilter(root, suffixes, include, exclude, max_depth)
+        self.interval = interval
+        self.known: Set[str] = set(self.filter.scan())
+        self.settling: Dict[str, Tuple[int, float]] = {}
+        self._last_scan = time.monotonic()
+
+    def _stat(self, path: str) -> Optional[Tuple[int, float]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime
+
+    def poll(self, timeout: Optional[float] = None) -> List[str]:
+        wait = self.interval - (time.monotonic() - self._last_scan)
+        if timeout is not None:
+            wait = min(wait, timeout)
+        if wait > 0:
+            time.sleep(wait)
+        if time.monotonic() - self._last_scan < self.interval:
+            return []
+        self._last_scan = time.monotonic()
+
+        ready = []
+        current = self.filter.scan()
+        for path in current:
+            if path in self.known:
+                continue
+            stat = self._stat(path)
+            if stat is None:
+                continue
+            if self.settling.get(path) == stat:
+                del self.settling[path]
+                self.known.add(path)
+                ready.append(path)
+            else:
+                self.settling[path] = stat
+
+        if len(self.known) > 2 * len(current):
+            self.known.intersection_update(current)
+        return ready
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+
+    def __init__(self,
+                 root: str,
+                 suffixes: Sequence[str] = EML_SUFFIXES,
+                 include: Optional[Sequence[str]] = None,
+                 exclude: Optional[Sequence[str]] = None,
+                 max_depth: Optional[int] = None):
+        self.filter = _PathFilter(root, suffixes, include, exclude, max_depth)
+        self._libc = _load_libc()
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(_errno(), 'inotify_init1 failed')
+        self.watches: Dict[int, str] = {}
+        self._backlog: List[str] = []
+        self._add_tree(self.filter.root, initial=True)
+
+    def _add_watch(self, path: str) -> bool:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path),
+                                          WATCH_MASK)
+        if wd < 0:
+            print(f"  警告: 无法监听目录 {path} - "
+                  f"{os.strerror(_errno())}")
+            return False
+        self.watches[wd] = path
+        return True
+
+    def _add_tree(self, path: str, initial: bool = False):
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            if not self._add_watch(current):
+                continue
+            try:
+                with os.scandir(current) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir() and self.filter.accepts_dir(entry.path):
+                    stack.append(entry.path)
+                elif not initial and entry.is_file() and \
+                        self.filter.accepts_file(entry.path):
+                    self._backlog.append(entry.path)
+
+    def poll(self, timeout: Optional[float] = None) -> List[str]:
+        ready, self._backlog = self._backlog, []
+        if ready:
+            timeout = 0
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return ready
+
+        try:
+            data = os.read(self.fd, _READ_SIZE)
+        except BlockingIOError:
+            return ready
+
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_len].split(b'\0', 1)[0]
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                print("  警告: inotify 事件队列溢出，重新扫描目录")
+                ready.extend(self.filter.scan())
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and \
+                        self.filter.accepts_dir(path):
+                    self._add_tree(path)
+                    ready.extend(self._backlog)
+                    self._backlog = []
+                continue
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and \
+                    self.filter.accepts_file(path):
+                ready.append(path)
+
+        return ready
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def load_processed(state_path: str) -> Set[str]:
+    if not os.path.exists(state_path):
+        return set()
+    with open(state_path, 'r', encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def mark_processed(state_path: str, paths: Sequence[str]):
+    os.makedirs(os.path.dirname(state_path) or '.', exist_ok=True)
+    with open(state_path, 'a', encoding='utf-8') as f:
+        for path in paths:
+            f.write(f"{path}\n")
+
+
+def _errno() -> int:
+    import ctypes
+
+    return ctypes.get_errno()
+
+
+def _load_libc():
+    import ctypes.util
+
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                       use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [
+        ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32
+    ]
+    return libc
+
+
+def inotify_available() -> bool:
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        libc = _load_libc()
+    except OSError:
+        return False
+    return hasattr(libc, 'inotify_init1')
+
+
+def open_watcher(root: str,
+                 suffixes: Sequence[str] = EML_SUFFIXES,
+                 include: Optional[Sequence[str]] = None,
+                 exclude: Optional[Sequence[str]] = None,
+                 max_depth: Optional[int] = None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 use_inotify: Optional[bool] = None):
+    if use_inotify is None:
+        use_inotify = inotify_available()
+    if use_inotify:
+        try:
+            return InotifyWatcher(root, suffixes, include, exclude, max_depth)
+        except OSError as e:
+            print(f"  警告: 无法使用 inotify ({e})，改为轮询")
+    return PollingWatcher(root, suffixes, include, exclude, max_depth,
+                          poll_interval)